@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+资源异常检测基准测试
+服务器数量增加时，numpy整批向量化计算与逐服务器纯Python计算的单轮耗时
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import vps_monitor
+from vps_monitor import AnomalyDetector
+
+
+def build_batch(servers: int, window: int, seed: int = 11):
+    """生成与FleetAnalyzer.collect相同形状的输入"""
+    rng = random.Random(seed)
+    names, times, cpu, memory, limits = [], [], [], [], []
+    for n in range(servers):
+        base = rng.uniform(0.2, 0.8) * 4 * 1024 ** 3
+        leak = rng.choice([0, 0, 0, 1]) * rng.uniform(1, 5) * 1024 ** 2
+        names.append(f"server-{n}")
+        times.append(array('d', (1000.0 + i * 2 for i in range(window))))
+        cpu.append(array('f', (rng.uniform(5, 60) for _ in range(window))))
+        memory.append(array('f', (base + leak * i + rng.uniform(-1, 1) * 1024 ** 2 for i in range(window))))
+        limits.append(4.0 * 1024 ** 3)
+    return names, times, cpu, memory, limits
+
+
+def measure(batch, rounds: int) -> float:
+    """返回单轮最好耗时（毫秒）"""
+    detector = AnomalyDetector()
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        detector.analyze(*batch)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="资源异常检测基准测试")
+    parser.add_argument("--servers", default="10,100,1000,5000", help="服务器数量列表")
+    parser.add_argument("--window", type=int, default=120, help="每台服务器的点数")
+    parser.add_argument("--rounds", type=int, default=3, help="轮数（取最好成绩）")
+    args = parser.parse_args()
+
+    numpy = vps_monitor.numpy
+    print(f"{'servers':>8} {'numpy ms':>10} {'python ms':>10}")
+    for count in (int(n) for n in args.servers.split(',')):
+        batch = build_batch(count, args.window)
+        vectorized = measure(batch, args.rounds) if numpy is not None else float('nan')
+        vps_monitor.numpy = None
+        try:
+            looped = measure(batch, args.rounds)
+        finally:
+            vps_monitor.numpy = numpy
+        print(f"{count:>8} {vectorized:>10.1f} {looped:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+JSON编解码基准测试
+对比各可用编解码器解码Wings帧（含类型化消息构建）的速度和内存分配
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vps_monitor import _CODECS
+from bench_dispatch import build_frames
+
+
+def measure(codec, frames: list, rounds: int):
+    """返回(每秒解码帧数, 每帧平均分配字节)"""
+    best = 0.0
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for frame in frames:
+            codec.decode_message(frame)
+        best = max(best, len(frames) / (time.perf_counter() - start))
+
+    sample = frames[:10_000]
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [codec.decode_message(frame) for frame in sample]
+    current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return best, (current - before) / len(sample)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON编解码基准测试")
+    parser.add_argument("--frames", type=int, default=200_000, help="每轮帧数")
+    parser.add_argument("--rounds", type=int, default=3, help="轮数（取最好成绩）")
+    args = parser.parse_args()
+
+    frames = build_frames(args.frames)
+    encode_sample = [json.loads(frame) for frame in frames[:10_000]]
+
+    print(f"{'codec':<10} {'decode frames/s':>16} {'bytes/msg':>10} {'encode msgs/s':>14}")
+    for name, (codec_class, available) in _CODECS.items():
+        if not available():
+            print(f"{name:<10} {'(未安装)':>16}")
+            continue
+        codec = codec_class()
+        rate, per_msg = measure(codec, frames, args.rounds)
+        start = time.perf_counter()
+        for obj in encode_sample:
+            codec.dumps(obj)
+        encode_rate = len(encode_sample) / (time.perf_counter() - start)
+        print(f"{name:<10} {rate:>16,.0f} {per_msg:>10.0f} {encode_rate:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+控制台触发规则基准测试
+对比规则数量增加时，合并多模式匹配器与逐条正则扫描的单行开销
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vps_monitor import ConsoleRule, ConsoleRuleEngine, DEFAULT_CONSOLE_RULES, ahocorasick
+from bench_sshx_extractor import generate_stream
+
+
+def build_rules(count: int, seed: int = 3) -> list:
+    """内置规则加上随机生成的字面量规则"""
+    rng = random.Random(seed)
+    rules = list(DEFAULT_CONSOLE_RULES)
+    words = ["timeout", "refused", "denied", "corrupt", "deadlock", "overflow", "exception", "segfault"]
+    while len(rules) < count:
+        word = f"{rng.choice(words)}-{len(rules)}"
+        rules.append(ConsoleRule(f"rule_{len(rules)}", rf"{word}\b", literals=[word]))
+    return rules[:count]
+
+
+def naive_scan(rules: list):
+    """每条规则单独编译正则，逐条扫描"""
+    compiled = [re.compile(rule.pattern, re.IGNORECASE) for rule in rules]
+
+    def match(line: str) -> list:
+        return [rule for rule, pattern in zip(rules, compiled) if pattern.search(line)]
+    return match
+
+
+def measure(match, stream: list) -> float:
+    """返回每行平均纳秒"""
+    start = time.perf_counter()
+    for line in stream:
+        match(line)
+    return (time.perf_counter() - start) / len(stream) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description="控制台触发规则基准测试")
+    parser.add_argument("--lines", type=int, default=200_000, help="控制台流行数")
+    parser.add_argument("--rules", default="1,3,10,50,200", help="规则数量列表")
+    args = parser.parse_args()
+
+    stream = generate_stream(args.lines, 50)
+    backend = "pyahocorasick" if ahocorasick is not None else "trie regex"
+    print(f"控制台流: {len(stream):,} 行, 预筛实现: {backend}")
+    print(f"{'rules':>6} {'engine ns/line':>16} {'naive ns/line':>15}")
+    for count in (int(n) for n in args.rules.split(',')):
+        rules = build_rules(count)
+        engine = ConsoleRuleEngine(rules)
+        print(f"{count:>6} {measure(engine.match, stream):>16.0f} {measure(naive_scan(rules), stream):>15.0f}")
+
+
+if __name__ == "__main__":
+    main()
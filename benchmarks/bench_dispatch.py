@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+WebSocket消息分发基准测试
+对比旧的"全量解码 + if/elif"处理方式与事件注册表快速路径的每秒处理帧数
+
+旧版处理逻辑不做去重、缓冲、归档、限流和规则预筛，这些功能都加在控制台帧的快速路径上，
+因此同时按阶段列出控制台帧的单帧开销，便于定位分发速度的回退
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vps_monitor import VPSMonitor, VPSConfig, logger
+
+
+def build_frames(count: int, seed: int = 42) -> list:
+    """构造与线上相近的帧分布：绝大部分是普通控制台输出"""
+    rng = random.Random(seed)
+    frames = []
+    for i in range(count):
+        roll = rng.random()
+        if roll < 0.90:
+            line = f"[{i:08d}] INFO worker-{rng.randint(1, 32)} tick processed {rng.randint(0, 10**6)} items"
+            frames.append(json.dumps({"event": "console output", "args": [line]}))
+        elif roll < 0.97:
+            stats = json.dumps({"memory_bytes": rng.randint(10**8, 10**9), "cpu_absolute": rng.random() * 100})
+            frames.append(json.dumps({"event": "stats", "args": [stats]}))
+        elif roll < 0.99:
+            frames.append(json.dumps({"event": "status", "args": ["running"]}))
+        else:
+            frames.append(json.dumps({"event": "install output", "args": ["Installing..."]}))
+    return frames
+
+
+async def legacy_handle(monitor: VPSMonitor, message: str):
+    """旧版处理逻辑：每帧完整解码后遍历if/elif链"""
+    try:
+        data = json.loads(message)
+        event = data.get('event')
+        args = data.get('args', [])
+        logger.info(f"收到WebSocket消息: {event} - {args}")
+        if event == 'auth success':
+            pass
+        elif event == 'send logs':
+            pass
+        elif event == 'send stats':
+            pass
+        elif event == 'status' and args:
+            if args[0] != monitor.current_status:
+                monitor.current_status = args[0]
+        elif event == 'daemon error' and args:
+            pass
+        elif event == 'console output' and args:
+            if 'Link:' in args[0]:
+                monitor.extract_sshx_link(args[0])
+    except json.JSONDecodeError:
+        pass
+
+
+async def run_case(name: str, handler, monitor: VPSMonitor, frames: list, rounds: int) -> float:
+    """运行单个场景，返回每秒处理帧数"""
+    best = 0.0
+    for _ in range(rounds):
+        monitor.current_status = 'running'
+        start = time.perf_counter()
+        for frame in frames:
+            await handler(frame)
+        elapsed = time.perf_counter() - start
+        best = max(best, len(frames) / elapsed)
+    print(f"{name:<12} {best:>14,.0f} frames/s")
+    return best
+
+
+def console_stages(frames: list, rounds: int):
+    """控制台帧快速路径各阶段的单帧开销（纳秒）"""
+    frames = [frame for frame in frames if '"console output"' in frame]
+    monitor = VPSMonitor(VPSConfig())
+    now = monitor.clock.time()
+
+    stages = [
+        ("buffer", lambda frame: monitor.console_buffer.append(frame, now)),
+        ("sshx", monitor.sshx_extractor.wants),
+        ("flood", lambda frame: monitor.flood_control.admit()),
+        ("rules", monitor.rule_engine.wants),
+        ("total", monitor._console_frame_filter),
+    ]
+    for name, stage in stages:
+        best = float('inf')
+        for _ in range(rounds):
+            start = time.perf_counter()
+            for frame in frames:
+                stage(frame)
+            best = min(best, time.perf_counter() - start)
+        print(f"  {name:<10} {best / len(frames) * 1e9:>14,.0f} ns/frame")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="WebSocket消息分发基准测试")
+    parser.add_argument("--frames", type=int, default=200_000, help="每轮帧数")
+    parser.add_argument("--rounds", type=int, default=3, help="轮数（取最好成绩）")
+    args = parser.parse_args()
+
+    # 基准测试只关心分发开销，不写日志
+    logger.setLevel(logging.WARNING)
+
+    frames = build_frames(args.frames)
+    monitor = VPSMonitor(VPSConfig())
+
+    before = await run_case("legacy", lambda f: legacy_handle(monitor, f), monitor, frames, args.rounds)
+    after = await run_case("dispatch", monitor.handle_websocket_message, monitor, frames, args.rounds)
+    print(f"{'speedup':<12} {after / before:>14.2f}x")
+    print("console frame stages:")
+    console_stages(frames, args.rounds)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
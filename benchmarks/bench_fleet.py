@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+监控器集群规模基准测试
+在同一进程中启动N个VPSMonitor，对接子进程中运行的本地模拟面板/Wings（mock_panel.py），测量：
+登录耗时、WebSocket连接耗时、每秒处理帧数、服务器offline到收到启动命令的延迟、每台服务器的内存（RSS）、
+事件循环延迟和面板请求的排队时间，结果写入JSON报告。
+
+面板请求限流默认关闭（--panel-rate-limit 0），测量的是监控器本身的开销；传入生产默认值10可复现
+大量服务器同时登录时在令牌桶中的排队时间。
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import aiohttp
+from vps_monitor import VPSMonitor, VPSConfig, SharedAuth, logger
+
+
+def rss_bytes() -> int:
+    """当前进程常驻内存"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def summarize(values: list, scale: float = 1000.0) -> dict:
+    """p50/p95/p99/max，默认把秒换算为毫秒"""
+    if not values:
+        return {}
+    ordered = sorted(v * scale for v in values)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 2)
+    return {'p50': pick(0.5), 'p95': pick(0.95), 'p99': pick(0.99), 'max': round(ordered[-1], 2),
+            'mean': round(statistics.fmean(ordered), 2)}
+
+
+def raise_fd_limit():
+    """大规模测试需要大量文件描述符"""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class LoopLagProbe:
+    """每隔interval睡眠一次，记录实际唤醒比预期晚了多少"""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.samples = []
+        self._task = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - start - self.interval))
+
+    def start(self):
+        self.samples = []
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+
+
+class MockPanelProcess:
+    """在子进程中运行mock_panel.py，避免模拟端的开销计入被测进程"""
+
+    def __init__(self, servers: int, faults: dict):
+        self.servers = servers
+        self.faults = faults
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.process = None
+        self._script = None
+
+    async def __aenter__(self):
+        self._script = tempfile.NamedTemporaryFile('w', suffix='.json', delete=False)
+        json.dump({'faults': self.faults}, self._script)
+        self._script.close()
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, 'mock_panel.py'), '--servers', str(self.servers),
+             '--port', str(self.port), '--script', self._script.name],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                with socket.create_connection(('127.0.0.1', self.port), timeout=0.2):
+                    return self
+            except OSError:
+                await asyncio.sleep(0.1)
+        raise RuntimeError("模拟面板启动超时")
+
+    async def __aexit__(self, *exc):
+        self.process.terminate()
+        self.process.wait(timeout=10)
+        os.unlink(self._script.name)
+
+    async def request(self, method: str, path: str, payload: dict = None) -> dict:
+        async with aiohttp.ClientSession() as session:
+            async with session.request(method, self.url + path, json=payload) as response:
+                return await response.json()
+
+
+async def timed(coro):
+    """返回(结果, 耗时秒)"""
+    start = time.perf_counter()
+    result = await coro
+    return result, time.perf_counter() - start
+
+
+async def run_size(count: int, args) -> dict:
+    """单个规模的完整测量"""
+    faults = {'console_rate': args.console_rate, 'stats_interval': args.stats_interval, 'start_delay': 0.5}
+    report = {'servers': count, 'errors': {}}
+    async with MockPanelProcess(count, faults) as panel:
+        uuids = sorted((await panel.request('GET', '/_mock/stats'))['states'])
+        rss_before = rss_bytes()
+        monitors = []
+        for i, uuid in enumerate(uuids):
+            config = VPSConfig(panel_url=panel.url, server_id=uuid[:8], server_uuid=uuid, node_host='127.0.0.1',
+                               ws_port=panel.port, ws_scheme='ws', username='admin', password='password',
+                               check_interval=5, anomaly_interval=0, panel_rate_limit=args.panel_rate_limit,
+                               panel_rate_burst=args.panel_rate_burst)
+            auth = SharedAuth(panel.url, config.username) if args.separate_auth else None
+            monitor = VPSMonitor(config, auth=auth)
+            await monitor.start_session()
+            monitors.append(monitor)
+
+        probe = LoopLagProbe()
+        probe.start()
+        # 登录与连接都并发进行，与同一进程中监控整个集群时一致
+        logins = await asyncio.gather(*(timed(m.login()) for m in monitors))
+        report['login_ms'] = summarize([elapsed for ok, elapsed in logins if ok])
+        report['errors']['login'] = sum(1 for ok, _ in logins if not ok)
+
+        connects = await asyncio.gather(*(timed(m.connect_websocket()) for m in monitors))
+        report['connect_ms'] = summarize([elapsed for ok, elapsed in connects if ok])
+        report['errors']['connect'] = sum(1 for ok, _ in connects if not ok)
+        connected = [m for m, (ok, _) in zip(monitors, connects) if ok]
+        tasks = [asyncio.create_task(m.monitor_websocket()) for m in connected]
+
+        start = time.perf_counter()
+        while any(m.current_status is None for m in connected) and time.perf_counter() - start < 60:
+            await asyncio.sleep(0.05)
+        report['ready_s'] = round(time.perf_counter() - start, 3)
+
+        frames_before = sum(m.dispatch_counters['frames'] for m in monitors)
+        lag_before = len(probe.samples)
+        await asyncio.sleep(args.duration)
+        frames = sum(m.dispatch_counters['frames'] for m in monitors) - frames_before
+        report['frames_per_sec'] = round(frames / args.duration, 1)
+        report['loop_lag_ms'] = summarize(probe.samples[lag_before:])
+
+        # 随机挑选服务器模拟崩溃，由模拟端统计offline到收到启动命令的延迟
+        victims = uuids[:min(args.crashes, len(connected))]
+        for uuid in victims:
+            await panel.request('POST', f'/_mock/servers/{uuid}/state', {'state': 'crash'})
+        deadline = time.monotonic() + 30
+        latencies = []
+        while time.monotonic() < deadline:
+            latencies = (await panel.request('GET', '/_mock/stats'))['start_latencies']
+            if len(latencies) >= len(victims):
+                break
+            await asyncio.sleep(0.1)
+        report['offline_to_start_ms'] = summarize(latencies)
+        report['errors']['restart'] = len(victims) - len(latencies)
+
+        report['rss_per_server_kb'] = round((rss_bytes() - rss_before) / count / 1024, 1)
+        report['http_pool'] = monitors[0].http_pool.metrics()
+        report['panel_scheduler'] = monitors[0].scheduler.metrics()
+        report['panel_queue_max_ms'] = round(max(
+            value for name, value in report['panel_scheduler'].items()
+            if name.startswith('panel_queue_max_seconds')) * 1000, 2)
+        await probe.stop()
+        for monitor in monitors:
+            monitor.stop()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for monitor in monitors:
+            await monitor.close()
+    return report
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="监控器集群规模基准测试")
+    parser.add_argument("--sizes", default="10,100", help="服务器数量列表，如 10,100,1000,5000")
+    parser.add_argument("--duration", type=float, default=10.0, help="吞吐量测量时长（秒）")
+    parser.add_argument("--console-rate", type=float, default=5.0, help="每台服务器每秒控制台行数")
+    parser.add_argument("--stats-interval", type=float, default=2.0, help="stats推送间隔（秒）")
+    parser.add_argument("--crashes", type=int, default=10, help="每个规模模拟崩溃的服务器数")
+    parser.add_argument("--separate-auth", action="store_true", help="每台服务器单独登录（默认同账号共用登录状态）")
+    parser.add_argument("--panel-rate-limit", type=float, default=0.0,
+                        help="面板每秒请求数（0为不限；生产默认值为10）")
+    parser.add_argument("--panel-rate-burst", type=int, default=20, help="面板请求允许的突发数")
+    parser.add_argument("--output", default="fleet_report.json", help="JSON报告路径")
+    args = parser.parse_args()
+
+    # 基准测试只关心监控本身的开销，不写日志
+    logger.setLevel(logging.ERROR)
+    fd_limit = raise_fd_limit()
+
+    results = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'fd_limit': fd_limit,
+        'params': vars(args),
+        'sizes': [],
+    }
+    print(f"{'servers':>8} {'login p50':>10} {'connect p50':>12} {'frames/s':>10} "
+          f"{'restart p50':>12} {'RSS/srv KB':>11} {'lag p99':>8} {'queue max':>10}")
+    for count in (int(n) for n in args.sizes.split(',')):
+        report = await run_size(count, args)
+        results['sizes'].append(report)
+        print(f"{count:>8} {report['login_ms'].get('p50', '-'):>10} {report['connect_ms'].get('p50', '-'):>12} "
+              f"{report['frames_per_sec']:>10} {report['offline_to_start_ms'].get('p50', '-'):>12} "
+              f"{report['rss_per_server_kb']:>11} {report['loop_lag_ms'].get('p99', '-'):>8} "
+              f"{report['panel_queue_max_ms']:>10}")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"报告已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+SSHX链接提取基准测试
+在大规模控制台输出流上对比旧版逐帧re.search与增量提取器的吞吐量和识别数量
+
+控制台流可以通过 --input 指定录制文件（每行一条控制台输出，或每行一个
+console output帧的JSON），未指定时生成带有拆分链接的模拟流。
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vps_monitor import SSHXLinkExtractor
+
+
+def random_token(rng: random.Random, length: int) -> str:
+    return ''.join(rng.choice(string.ascii_letters + string.digits) for _ in range(length))
+
+
+def generate_stream(lines: int, links: int, seed: int = 7) -> list:
+    """生成模拟控制台流：一部分链接被拆分到两帧，一部分标签与链接分行"""
+    rng = random.Random(seed)
+    stream = [
+        f"[{i:08d}] INFO worker-{rng.randint(1, 32)} processed {rng.randint(0, 10**6)} items in {rng.random():.3f}s"
+        for i in range(lines)
+    ]
+    for n in range(links):
+        link = f"https://sshx.io/s/{random_token(rng, 10)}#{random_token(rng, 14)}"
+        pos = rng.randrange(len(stream))
+        style = n % 3
+        if style == 0:
+            stream[pos:pos] = [f"  ➜  Link: {link}"]
+        elif style == 1:
+            cut = rng.randint(8, len(link) - 14)
+            stream[pos:pos] = [f"  ➜  Link: {link[:cut]}", link[cut:]]
+        else:
+            stream[pos:pos] = ["  ➜  Link:", f"     {link}"]
+    return stream
+
+
+def load_stream(path: str) -> list:
+    """读取录制的控制台流"""
+    stream = []
+    with open(path, encoding='utf-8') as f:
+        for raw in f:
+            raw = raw.rstrip('\n')
+            if raw.startswith('{'):
+                try:
+                    frame = json.loads(raw)
+                except json.JSONDecodeError:
+                    stream.append(raw)
+                    continue
+                if frame.get('event') == 'console output' and frame.get('args'):
+                    stream.append(frame['args'][0])
+            else:
+                stream.append(raw)
+    return stream
+
+
+def legacy_extract(stream: list) -> list:
+    """旧版逻辑：只在含"Link:"的帧上运行未编译的re.search"""
+    found = []
+    last = None
+    for line in stream:
+        if 'Link:' in line:
+            match = re.search(r'https://sshx\.io/s/[a-zA-Z0-9]+#[a-zA-Z0-9]+', line)
+            if match and match.group(0) != last:
+                last = match.group(0)
+                found.append(last)
+    return found
+
+
+def streaming_extract(stream: list) -> list:
+    """增量提取器"""
+    extractor = SSHXLinkExtractor()
+    found = []
+    for line in stream:
+        found.extend(extractor.feed(line))
+    found.extend(extractor.flush())
+    return found
+
+
+def run(name: str, func, stream: list, rounds: int):
+    best = 0.0
+    result = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = func(stream)
+        best = max(best, len(stream) / (time.perf_counter() - start))
+    print(f"{name:<10} {best:>14,.0f} lines/s {len(result):>8} links")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SSHX链接提取基准测试")
+    parser.add_argument("--input", help="录制的控制台流文件")
+    parser.add_argument("--lines", type=int, default=1_000_000, help="模拟流行数")
+    parser.add_argument("--links", type=int, default=300, help="模拟流中的链接数")
+    parser.add_argument("--rounds", type=int, default=3, help="轮数（取最好成绩）")
+    args = parser.parse_args()
+
+    stream = load_stream(args.input) if args.input else generate_stream(args.lines, args.links)
+    print(f"控制台流: {len(stream):,} 行")
+    run("legacy", legacy_extract, stream, args.rounds)
+    run("streaming", streaming_extract, stream, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
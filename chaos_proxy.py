@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+故障注入代理
+位于监控器和面板/Wings之间，转发HTTP请求和WebSocket帧，按脚本注入延迟、连接重置（RST）、
+半开连接（停止转发所有帧，包括ping/pong）、截断帧和419/5xx突发，并记录监控器发现故障和恢复所用的时间。
+
+监控器改为连接代理：PANEL_URL=http://<代理>，NODE_HOST=<代理主机>，WS_PORT=<代理端口>，WS_SCHEME=ws。
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import socket
+import struct
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+
+import aiohttp
+from aiohttp import web, WSMsgType
+
+logger = logging.getLogger("chaos_proxy")
+
+# 逐跳头部以及转发后失效的头部，不透传
+HOP_HEADERS = {
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization', 'te', 'trailers',
+    'transfer-encoding', 'upgrade', 'host', 'content-length', 'content-encoding',
+}
+WS_FORWARD_HEADERS = ('Origin', 'Cookie', 'Authorization', 'User-Agent')
+
+
+@dataclass
+class ProxyFaults:
+    """当前生效的故障参数"""
+    latency: float = 0.0  # 每个HTTP请求和每个WebSocket帧附加的延迟（秒）
+    http_419: int = 0  # 接下来N个HTTP请求返回419
+    http_5xx: int = 0  # 接下来N个HTTP请求返回503
+    stall: bool = False  # 半开连接：连接保持但不再转发任何帧
+    truncate: int = 0  # 接下来N个下行文本帧截掉后半部分
+
+    def update(self, values: Dict[str, Any]):
+        """按字段名更新，忽略未知字段"""
+        for name, value in values.items():
+            if hasattr(self, name):
+                setattr(self, name, type(getattr(self, name))(value))
+
+
+@dataclass
+class Incident:
+    """一次注入的故障及监控器的反应；时间均为相对故障开始的秒数"""
+    label: str
+    started: float
+    cleared: Optional[float] = None  # 故障解除时间，一次性故障等于开始时间
+    detected: Optional[float] = None  # 故障后监控器第一次重新建立WebSocket连接
+    recovered: Optional[float] = None  # 重连后收到auth success，或未重连时故障解除后第一个下行帧
+    reconnects: int = 0
+    http_errors: int = 0
+
+    def report(self) -> Dict[str, Any]:
+        def relative(value):
+            return None if value is None else round(value - self.started, 3)
+        return {
+            'label': self.label,
+            'detect_s': relative(self.detected),
+            'recover_s': relative(self.recovered),
+            'cleared_s': relative(self.cleared),
+            'reconnects': self.reconnects,
+            'http_errors': self.http_errors,
+        }
+
+
+@dataclass(eq=False)
+class _Bridge:
+    """一对客户端/上游WebSocket连接"""
+    client: web.WebSocketResponse
+    upstream: aiohttp.ClientWebSocketResponse
+    transport: Any = None
+    tasks: List[asyncio.Task] = field(default_factory=list)
+
+
+class ChaosProxy:
+    """HTTP/WebSocket故障注入代理"""
+
+    def __init__(self, upstream: str, wings: Optional[str] = None, faults: Optional[ProxyFaults] = None):
+        self.upstream = upstream.rstrip('/')
+        self.wings = (wings or upstream).rstrip('/').replace('https://', 'wss://').replace('http://', 'ws://')
+        self.faults = faults or ProxyFaults()
+        self.incidents: List[Incident] = []
+        self.counters = {'http_requests': 0, 'http_errors': 0, 'ws_connections': 0, 'frames_up': 0,
+                         'frames_down': 0, 'frames_dropped': 0, 'frames_truncated': 0, 'resets': 0}
+        self.app = web.Application()
+        self.app.router.add_route('*', '/{path:.*}', self.handle)
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._bridges: Set[_Bridge] = set()
+        self._runner: Optional[web.AppRunner] = None
+        self._tasks: set = set()
+        self.host = "127.0.0.1"
+        self.port = 0
+
+    # ---------- 生命周期 ----------
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0):
+        # 不保存cookie，由客户端请求头原样透传
+        self.session = aiohttp.ClientSession(cookie_jar=aiohttp.DummyCookieJar())
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        self.host = host
+        self.port = site._server.sockets[0].getsockname()[1]
+        logger.info(f"故障注入代理已启动: {self.url} -> {self.upstream}")
+
+    async def stop(self):
+        for task in list(self._tasks):
+            task.cancel()
+        for bridge in list(self._bridges):
+            await bridge.client.close()
+            await bridge.upstream.close()
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+        if self.session:
+            await self.session.close()
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def monitor_env(self, env: Dict[str, Any]) -> Dict[str, Any]:
+        """把直连上游的监控器配置改为经由代理"""
+        return dict(env, panel_url=self.url, node_host=self.host, ws_port=self.port, ws_scheme='ws')
+
+    def _spawn(self, coro):
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    # ---------- 故障记录 ----------
+
+    def _open_incidents(self) -> List[Incident]:
+        return [incident for incident in self.incidents if incident.recovered is None]
+
+    def _on_client_connect(self):
+        now = time.monotonic()
+        for incident in self._open_incidents():
+            incident.reconnects += 1
+            if incident.detected is None:
+                incident.detected = now
+
+    def _on_downstream_frame(self, data: str):
+        now = time.monotonic()
+        for incident in self._open_incidents():
+            if incident.cleared is None:
+                continue
+            if incident.detected is None or '"auth success"' in data:
+                incident.recovered = now
+                logger.info(f"✅ {incident.label}: 发现 {incident.report()['detect_s']}s，恢复 "
+                            f"{incident.report()['recover_s']}s")
+
+    def reset_connections(self):
+        """以RST中断所有WebSocket连接"""
+        for bridge in list(self._bridges):
+            self.counters['resets'] += 1
+            transport = bridge.transport
+            if transport is None or transport.is_closing():
+                continue
+            sock = transport.get_extra_info('socket')
+            if sock is not None:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+            transport.abort()
+            for task in bridge.tasks:
+                task.cancel()
+
+    def inject(self, label: str, faults: Optional[Dict[str, Any]] = None, reset: bool = False,
+               duration: float = 0.0) -> Incident:
+        """立即注入一次故障；duration>0时到期后把这些参数恢复为默认值"""
+        incident = Incident(label, time.monotonic())
+        self.incidents.append(incident)
+        if faults:
+            self.faults.update(faults)
+        if reset:
+            self.reset_connections()
+        logger.warning(f"💥 注入故障: {label}")
+        if duration > 0 and faults:
+            self._spawn(self._clear_after(incident, faults, duration))
+        else:
+            incident.cleared = incident.started
+        return incident
+
+    async def _clear_after(self, incident: Incident, faults: Dict[str, Any], duration: float):
+        await asyncio.sleep(duration)
+        defaults = ProxyFaults()
+        self.faults.update({name: getattr(defaults, name) for name in faults if hasattr(defaults, name)})
+        incident.cleared = time.monotonic()
+        logger.info(f"故障解除: {incident.label}")
+
+    async def run_script(self, script: Dict[str, Any]):
+        """执行脚本：{"faults": {...}, "timeline": [{"at": 秒, "label": 名称, "faults": {...}, "reset": true, "duration": 秒}]}"""
+        self.faults.update(script.get('faults', {}))
+        started = time.monotonic()
+        for step in sorted(script.get('timeline', []), key=lambda s: s.get('at', 0)):
+            await asyncio.sleep(max(0.0, started + step.get('at', 0) - time.monotonic()))
+            self.inject(step.get('label', f"t+{step.get('at', 0)}s"), step.get('faults'),
+                        bool(step.get('reset')), float(step.get('duration', 0)))
+
+    def report(self) -> List[Dict[str, Any]]:
+        return [incident.report() for incident in self.incidents]
+
+    # ---------- 转发 ----------
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        if request.headers.get('Upgrade', '').lower() == 'websocket':
+            return await self.handle_websocket(request)
+        return await self.handle_http(request)
+
+    async def handle_http(self, request: web.Request) -> web.StreamResponse:
+        self.counters['http_requests'] += 1
+        if self.faults.latency:
+            await asyncio.sleep(self.faults.latency)
+        for name, status in (('http_419', 419), ('http_5xx', 503)):
+            if getattr(self.faults, name) > 0:
+                setattr(self.faults, name, getattr(self.faults, name) - 1)
+                self.counters['http_errors'] += 1
+                for incident in self._open_incidents():
+                    incident.http_errors += 1
+                return web.json_response({'errors': [{'code': 'ChaosProxy', 'status': str(status)}]}, status=status)
+
+        headers = {name: value for name, value in request.headers.items() if name.lower() not in HOP_HEADERS}
+        body = await request.read()
+        try:
+            async with self.session.request(request.method, self.upstream + request.rel_url.path_qs,
+                                            headers=headers, data=body or None, allow_redirects=False) as upstream:
+                payload = await upstream.read()
+                response = web.Response(status=upstream.status, body=payload)
+                for name, value in upstream.headers.items():
+                    if name.lower() not in HOP_HEADERS:
+                        response.headers.add(name, value)
+                return response
+        except aiohttp.ClientError as e:
+            logger.error(f"上游请求失败: {e}")
+            return web.Response(status=502, text=str(e))
+
+    async def handle_websocket(self, request: web.Request) -> web.StreamResponse:
+        self.counters['ws_connections'] += 1
+        self._on_client_connect()
+        # 关闭自动应答ping，ping/pong和数据帧一样转发，半开时客户端才能通过心跳超时发现
+        client = web.WebSocketResponse(autoping=False)
+        await client.prepare(request)
+        headers = {name: request.headers[name] for name in WS_FORWARD_HEADERS if name in request.headers}
+        try:
+            upstream = await self.session.ws_connect(self.wings + request.rel_url.path_qs,
+                                                     headers=headers, autoping=False)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"上游WebSocket连接失败: {e}")
+            await client.close(code=1011)
+            return client
+
+        bridge = _Bridge(client, upstream, request.transport)
+        bridge.tasks = [asyncio.ensure_future(self._pump(client, upstream, False)),
+                        asyncio.ensure_future(self._pump(upstream, client, True))]
+        self._bridges.add(bridge)
+        try:
+            await asyncio.wait(bridge.tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            self._bridges.discard(bridge)
+            for task in bridge.tasks:
+                task.cancel()
+            await upstream.close()
+            if not client.closed:
+                await client.close()
+        return client
+
+    async def _pump(self, source, sink, downstream: bool):
+        """单向转发，直到任一端关闭"""
+        try:
+            async for msg in source:
+                if self.faults.stall:
+                    self.counters['frames_dropped'] += 1
+                    continue
+                if self.faults.latency:
+                    await asyncio.sleep(self.faults.latency)
+                if msg.type == WSMsgType.TEXT:
+                    data = msg.data
+                    if downstream:
+                        self.counters['frames_down'] += 1
+                        if self.faults.truncate > 0:
+                            self.faults.truncate -= 1
+                            self.counters['frames_truncated'] += 1
+                            data = data[:len(data) // 2]
+                        self._on_downstream_frame(data)
+                    else:
+                        self.counters['frames_up'] += 1
+                    await sink.send_str(data)
+                elif msg.type == WSMsgType.BINARY:
+                    await sink.send_bytes(msg.data)
+                elif msg.type == WSMsgType.PING:
+                    await sink.ping(msg.data)
+                elif msg.type == WSMsgType.PONG:
+                    await sink.pong(msg.data)
+                elif msg.type == WSMsgType.ERROR:
+                    break
+        except (ConnectionResetError, aiohttp.ClientError):
+            pass
+
+
+def print_report(proxy: ChaosProxy):
+    print(f"{'故障':<24} {'发现(s)':>8} {'恢复(s)':>8} {'重连':>5} {'HTTP错误':>8}")
+    for row in proxy.report():
+        print(f"{row['label']:<24} {str(row['detect_s']):>8} {str(row['recover_s']):>8} "
+              f"{row['reconnects']:>5} {row['http_errors']:>8}")
+
+
+async def serve(args):
+    proxy = ChaosProxy(args.upstream, args.wings)
+    script = None
+    if args.script:
+        with open(args.script, encoding='utf-8') as f:
+            script = json.load(f)
+    await proxy.start(args.host, args.port)
+    print(f"监控器配置: PANEL_URL={proxy.url} NODE_HOST={proxy.host} WS_PORT={proxy.port} WS_SCHEME=ws")
+    if script:
+        proxy._spawn(proxy.run_script(script))
+    try:
+        await asyncio.Event().wait()
+    finally:
+        print_report(proxy)
+        if args.report:
+            with open(args.report, 'w', encoding='utf-8') as f:
+                json.dump({'incidents': proxy.report(), 'counters': proxy.counters}, f, ensure_ascii=False, indent=2)
+        await proxy.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="面板/Wings故障注入代理")
+    parser.add_argument("--upstream", required=True, help="面板地址，如 https://panel.example.com")
+    parser.add_argument("--wings", help="Wings地址（如 https://node.example.com:8080），默认与面板相同")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--script", help="故障脚本（JSON）")
+    parser.add_argument("--report", default="chaos_report.json", help="退出时写入的JSON报告")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
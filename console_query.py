@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+控制台归档查询工具
+按时间范围读取CONSOLE_ARCHIVE_DIR中的压缩归档，只解压范围内的块
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+from datetime import datetime
+
+from vps_monitor import ConsoleArchive
+
+
+def parse_time(value: str) -> float:
+    """支持Unix时间戳、"YYYY-MM-DD HH:MM[:SS]"和相对时间（如 30m、2h、1d）"""
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)([smhd])', value)
+    if match:
+        seconds = float(match.group(1)) * {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[match.group(2)]
+        return time.time() - seconds
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%dT%H:%M:%S'):
+        try:
+            return datetime.strptime(value, fmt).timestamp()
+        except ValueError:
+            continue
+    raise argparse.ArgumentTypeError(f"无法解析时间: {value}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="查询控制台压缩归档")
+    parser.add_argument("--dir", default=os.getenv('CONSOLE_ARCHIVE_DIR', "console_archive"), help="归档目录")
+    parser.add_argument("--server", default=os.getenv('SERVER_UUID', "default"), help="服务器UUID")
+    parser.add_argument("--from", dest="start", type=parse_time, default=0.0, help="开始时间")
+    parser.add_argument("--to", dest="end", type=parse_time, default=float('inf'), help="结束时间")
+    parser.add_argument("--grep", help="只输出匹配该正则的行")
+    parser.add_argument("--stats", action="store_true", help="只显示段和块的统计信息")
+    args = parser.parse_args()
+
+    directory = os.path.join(args.dir, args.server)
+    segments = ConsoleArchive.segments(directory)
+    if not segments:
+        print(f"❌ 没有找到归档: {directory}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.stats:
+        for segment in segments:
+            index = ConsoleArchive.read_index(directory, segment)
+            if not index:
+                continue
+            first = datetime.fromtimestamp(index[0][0]).strftime('%Y-%m-%d %H:%M:%S')
+            last = datetime.fromtimestamp(index[-1][1]).strftime('%Y-%m-%d %H:%M:%S')
+            size = sum(record[3] for record in index)
+            print(f"段 {segment:08d}: {len(index)} 块, {size / 1024:.1f} KB, {first} ~ {last}")
+        return
+
+    pattern = re.compile(args.grep) if args.grep else None
+    try:
+        for timestamp, line in ConsoleArchive.query(directory, args.start, args.end):
+            if pattern and not pattern.search(line):
+                continue
+            stamp = datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+            print(f"[{stamp}] {line}")
+    except BrokenPipeError:
+        pass
+
+
+if __name__ == "__main__":
+    main()
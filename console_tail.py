@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+控制台输出查看工具
+通过本地控制接口读取监控器内存中最近的控制台输出（需要设置CONTROL_PORT）
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description="查看最近的控制台输出")
+    parser.add_argument("-n", "--lines", type=int, default=100, help="最近N行")
+    parser.add_argument("--since", type=float, help="只看最近N秒的输出")
+    parser.add_argument("--server", help="服务器UUID（监控多台服务器时必填）")
+    parser.add_argument("--url", help="控制接口地址（默认 http://127.0.0.1:$CONTROL_PORT）")
+    parser.add_argument("-t", "--timestamps", action="store_true", help="显示时间戳")
+    args = parser.parse_args()
+
+    if not args.url:
+        port = os.getenv('CONTROL_PORT', '0')
+        if port in ('', '0'):
+            parser.error("未设置CONTROL_PORT（监控器默认不开启控制接口），请设置与监控器相同的CONTROL_PORT或使用 --url 指定地址")
+        args.url = f"http://127.0.0.1:{port}"
+
+    params = {'lines': args.lines}
+    if args.since is not None:
+        params = {'since': time.time() - args.since}
+    if args.server:
+        params['server'] = args.server
+
+    try:
+        response = requests.get(f"{args.url}/console", params=params, timeout=10)
+    except requests.RequestException as e:
+        print(f"❌ 无法连接控制接口: {e}", file=sys.stderr)
+        sys.exit(1)
+    if response.status_code != 200:
+        print(f"❌ 请求失败: {response.status_code} {response.text}", file=sys.stderr)
+        sys.exit(1)
+
+    for entry in response.json()['lines']:
+        if args.timestamps:
+            stamp = time.strftime('%H:%M:%S', time.localtime(entry['time']))
+            print(f"[{stamp}] {entry['line']}")
+        else:
+            print(entry['line'])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,542 @@
+#!/usr/bin/env python3
+"""
+本地模拟Pterodactyl面板和Wings WebSocket
+用于集成测试和压力测试，实现监控器用到的全部接口：
+- Sanctum cookie流程（/server/{id}、/sanctum/csrf-cookie）和 /auth/login（含419 CSRF校验）
+- /api/client/servers/{uuid}/websocket 签发带过期时间的JWT
+- Wings WebSocket /api/servers/{uuid}/ws：推送status、console output、stats、token expiring/expired，
+  响应send logs、send stats、set state
+
+故障、延迟和输出量通过 Faults 参数、脚本文件（--script）或运行时的 /_mock/* 接口控制。
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import random
+import secrets
+import string
+import time
+from collections import deque
+from dataclasses import dataclass, field, asdict
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web, WSMsgType
+
+logger = logging.getLogger("mock_panel")
+
+
+@dataclass
+class Faults:
+    """可脚本化的故障和负载参数"""
+    latency: float = 0.0  # 每个HTTP请求附加的延迟（秒）
+    login_419: int = 0  # 接下来N次登录返回419
+    http_5xx: int = 0  # 接下来N个HTTP请求返回503
+    token_ttl: float = 600.0  # WebSocket token有效期（秒）
+    token_warning: float = 60.0  # 过期前多久推送token expiring
+    console_rate: float = 1.0  # 每台服务器每秒控制台行数
+    stats_interval: float = 2.0  # stats推送间隔（秒），0为不推送
+    ws_drop_after: float = 0.0  # 连接建立N秒后断开，0为不断开
+    start_delay: float = 1.0  # starting到running的耗时（秒）
+    history_lines: int = 50  # 收到send logs时回放的历史行数
+    rate_limit: int = 0  # 每个限流窗口允许的HTTP请求数（带X-RateLimit-*头，超出返回429），0为不限
+    rate_window: float = 60.0  # 限流窗口（秒）
+
+    def update(self, values: Dict[str, Any]):
+        """按字段名更新，忽略未知字段"""
+        for name, value in values.items():
+            if hasattr(self, name):
+                setattr(self, name, type(getattr(self, name))(value))
+
+
+@dataclass
+class MockServer:
+    """一台模拟服务器"""
+    uuid: str
+    identifier: str
+    state: str = 'running'
+    memory_bytes: float = 512 * 1024 ** 2
+    memory_limit_bytes: int = 2 * 1024 ** 3
+    started_at: float = field(default_factory=time.time)
+    history: deque = field(default_factory=lambda: deque(maxlen=200))
+    sockets: set = field(default_factory=set)
+    line_no: int = 0
+    offline_at: Optional[float] = None  # 最近一次进入offline的时间，用于统计拉起延迟
+    power_commands: List[str] = field(default_factory=list)
+
+
+def _b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+
+class MockPanel:
+    """模拟面板 + Wings，所有服务器共用一个aiohttp应用和端口"""
+
+    def __init__(self, servers: int = 1, username: str = "admin", password: str = "password",
+                 faults: Optional[Faults] = None, seed: int = 1):
+        self.username = username
+        self.password = password
+        self.faults = faults or Faults()
+        self.rng = random.Random(seed)
+        self.secret = secrets.token_bytes(16)
+        self.servers: Dict[str, MockServer] = {}
+        for i in range(servers):
+            uuid = f"{i:08x}-0000-4000-8000-{i:012x}"
+            self.servers[uuid] = MockServer(uuid, uuid[:8])
+        self.sessions: Dict[str, Dict[str, Any]] = {}
+        self.counters = {
+            'http_requests': 0, 'logins': 0, 'login_419': 0, 'http_5xx': 0, 'http_429': 0, 'tokens': 0,
+            'ws_connections': 0, 'auths': 0, 'frames_sent': 0, 'power_commands': 0,
+        }
+        self._rate_window_start = 0.0
+        self._rate_used = 0
+        # offline到收到set state start的延迟（秒）
+        self.start_latencies: List[float] = []
+        self.app = web.Application(middlewares=[self._fault_middleware])
+        self.app.router.add_get('/server/{server_id}', self.handle_server_page)
+        self.app.router.add_get('/sanctum/csrf-cookie', self.handle_csrf_cookie)
+        self.app.router.add_post('/auth/login', self.handle_login)
+        self.app.router.add_get('/api/client/servers/{uuid}/websocket', self.handle_ws_token)
+        self.app.router.add_get('/api/servers/{uuid}/ws', self.handle_wings)
+        self.app.router.add_get('/_mock/stats', self.handle_mock_stats)
+        self.app.router.add_post('/_mock/faults', self.handle_mock_faults)
+        self.app.router.add_post('/_mock/servers/{uuid}/state', self.handle_mock_state)
+        self._runner: Optional[web.AppRunner] = None
+        self._tasks: set = set()
+        self.host = "127.0.0.1"
+        self.port = 0
+
+    # ---------- 生命周期 ----------
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0):
+        """启动服务，port为0时自动分配"""
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        self.host = host
+        self.port = site._server.sockets[0].getsockname()[1]
+        logger.info(f"模拟面板已启动: {self.url}，服务器 {len(self.servers)} 台")
+
+    async def stop(self):
+        for task in list(self._tasks):
+            task.cancel()
+        for server in self.servers.values():
+            for ws in list(server.sockets):
+                await ws.close()
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def monitor_env(self, uuid: str) -> Dict[str, Any]:
+        """让监控器连接到该服务器所需的配置"""
+        return {
+            'panel_url': self.url,
+            'server_id': self.servers[uuid].identifier,
+            'server_uuid': uuid,
+            'node_host': self.host,
+            'ws_port': self.port,
+            'ws_scheme': 'ws',
+            'username': self.username,
+            'password': self.password,
+        }
+
+    def _spawn(self, coro):
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    # ---------- 面板HTTP接口 ----------
+
+    @web.middleware
+    async def _fault_middleware(self, request: web.Request, handler):
+        """注入延迟、限流和5xx，WebSocket和控制接口不受影响"""
+        if request.path.startswith('/_mock/') or request.path.endswith('/ws'):
+            return await handler(request)
+        self.counters['http_requests'] += 1
+        if self.faults.latency:
+            await asyncio.sleep(self.faults.latency)
+        headers = self._rate_limit_headers()
+        if 'Retry-After' in headers:
+            self.counters['http_429'] += 1
+            return web.json_response({'errors': [{'code': 'TooManyRequestsHttpException'}]},
+                                     status=429, headers=headers)
+        if self.faults.http_5xx > 0:
+            self.faults.http_5xx -= 1
+            self.counters['http_5xx'] += 1
+            response = web.json_response({'errors': [{'code': 'ServiceUnavailable'}]}, status=503)
+        else:
+            response = await handler(request)
+        response.headers.update(headers)
+        return response
+
+    def _rate_limit_headers(self) -> Dict[str, str]:
+        """固定窗口限流，响应头与面板（Laravel throttle）一致；超限时带Retry-After"""
+        limit = self.faults.rate_limit
+        if limit <= 0:
+            return {}
+        now = time.monotonic()
+        if now - self._rate_window_start >= self.faults.rate_window:
+            self._rate_window_start = now
+            self._rate_used = 0
+        self._rate_used += 1
+        headers = {'X-RateLimit-Limit': str(limit), 'X-RateLimit-Remaining': str(max(0, limit - self._rate_used))}
+        if self._rate_used > limit:
+            retry_after = self._rate_window_start + self.faults.rate_window - now
+            headers['Retry-After'] = f"{retry_after:.3f}"
+            headers['X-RateLimit-Reset'] = str(int(time.time() + retry_after))
+        return headers
+
+    def _session(self, request: web.Request) -> Optional[Dict[str, Any]]:
+        return self.sessions.get(request.cookies.get('pterodactyl_session', ''))
+
+    def _new_session(self, user: Optional[str] = None) -> str:
+        session_id = secrets.token_urlsafe(24)
+        self.sessions[session_id] = {'xsrf': secrets.token_urlsafe(24), 'user': user}
+        return session_id
+
+    def _set_cookies(self, response: web.StreamResponse, session_id: str):
+        response.set_cookie('XSRF-TOKEN', self.sessions[session_id]['xsrf'], path='/')
+        response.set_cookie('pterodactyl_session', session_id, path='/', httponly=True)
+
+    async def handle_server_page(self, request: web.Request) -> web.Response:
+        """服务器页面：已登录时页面包含window.PterodactylUser"""
+        session_id = request.cookies.get('pterodactyl_session', '')
+        if session_id not in self.sessions:
+            session_id = self._new_session()
+        user = self.sessions[session_id]['user']
+        if user:
+            body = f"<script>window.PterodactylUser = {json.dumps({'username': user})};</script>"
+        else:
+            body = "<html><body>login</body></html>"
+        response = web.Response(text=body, content_type='text/html')
+        self._set_cookies(response, session_id)
+        return response
+
+    async def handle_csrf_cookie(self, request: web.Request) -> web.Response:
+        """刷新XSRF-TOKEN"""
+        session_id = request.cookies.get('pterodactyl_session', '')
+        if session_id not in self.sessions:
+            session_id = self._new_session()
+        self.sessions[session_id]['xsrf'] = secrets.token_urlsafe(24)
+        response = web.Response(status=204)
+        self._set_cookies(response, session_id)
+        return response
+
+    async def handle_login(self, request: web.Request) -> web.Response:
+        """登录：X-XSRF-TOKEN与会话不一致时返回419，成功后重新生成会话"""
+        session = self._session(request)
+        if self.faults.login_419 > 0 or not session or request.headers.get('X-Xsrf-Token') != session['xsrf']:
+            if self.faults.login_419 > 0:
+                self.faults.login_419 -= 1
+            self.counters['login_419'] += 1
+            return web.json_response({'message': 'CSRF token mismatch.'}, status=419)
+        data = await request.json()
+        if data.get('user') != self.username or data.get('password') != self.password:
+            return web.json_response({'errors': [{'code': 'InvalidCredentials'}]}, status=422)
+        self.sessions.pop(request.cookies['pterodactyl_session'], None)
+        session_id = self._new_session(self.username)
+        self.counters['logins'] += 1
+        response = web.json_response({
+            'data': {'complete': True, 'intended': '/', 'user': {'username': self.username}},
+        })
+        self._set_cookies(response, session_id)
+        return response
+
+    def issue_token(self, uuid: str) -> str:
+        """签发HS256 JWT"""
+        now = time.time()
+        header = _b64url(json.dumps({'alg': 'HS256', 'typ': 'JWT'}).encode())
+        payload = _b64url(json.dumps({
+            'iat': now, 'exp': now + self.faults.token_ttl, 'server_uuid': uuid, 'permissions': ['*'],
+        }).encode())
+        signature = hmac.new(self.secret, f"{header}.{payload}".encode(), hashlib.sha256).digest()
+        return f"{header}.{payload}.{_b64url(signature)}"
+
+    def verify_token(self, token: str, uuid: str) -> Optional[float]:
+        """校验签名、服务器和有效期，返回过期时间"""
+        try:
+            header, payload, signature = token.split('.')
+            expected = hmac.new(self.secret, f"{header}.{payload}".encode(), hashlib.sha256).digest()
+            if not hmac.compare_digest(_b64url(expected), signature):
+                return None
+            claims = json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+        except (ValueError, AttributeError):
+            return None
+        if claims.get('server_uuid') != uuid or claims['exp'] <= time.time():
+            return None
+        return claims['exp']
+
+    async def handle_ws_token(self, request: web.Request) -> web.Response:
+        """签发WebSocket token，需要已登录的会话"""
+        session = self._session(request)
+        uuid = request.match_info['uuid']
+        if not session or not session['user']:
+            return web.json_response({'errors': [{'code': 'AuthenticationException'}]}, status=401)
+        if uuid not in self.servers:
+            return web.json_response({'errors': [{'code': 'NotFoundHttpException'}]}, status=404)
+        self.counters['tokens'] += 1
+        return web.json_response({'data': {
+            'token': self.issue_token(uuid),
+            'socket': f"ws://{self.host}:{self.port}/api/servers/{uuid}/ws",
+        }})
+
+    # ---------- Wings WebSocket ----------
+
+    async def _send(self, ws: web.WebSocketResponse, event: str, *args):
+        if ws.closed:
+            return
+        try:
+            await ws.send_str(json.dumps({'event': event, 'args': list(args)}))
+            self.counters['frames_sent'] += 1
+        except ConnectionError:
+            pass
+
+    async def _broadcast(self, server: MockServer, event: str, *args):
+        for ws in list(server.sockets):
+            await self._send(ws, event, *args)
+
+    def _console_line(self, server: MockServer) -> str:
+        server.line_no += 1
+        line = f"[{time.strftime('%H:%M:%S')}] [Server thread/INFO]: tick {server.line_no}"
+        server.history.append(line)
+        return line
+
+    def _stats_payload(self, server: MockServer) -> str:
+        running = server.state == 'running'
+        if running:
+            server.memory_bytes = min(server.memory_limit_bytes,
+                                      server.memory_bytes + self.rng.uniform(-1, 2) * 1024 ** 2)
+        return json.dumps({
+            'memory_bytes': int(server.memory_bytes) if running else 0,
+            'memory_limit_bytes': server.memory_limit_bytes,
+            'cpu_absolute': round(self.rng.uniform(1, 30), 3) if running else 0,
+            'network': {'rx_bytes': server.line_no * 100, 'tx_bytes': server.line_no * 80},
+            'state': server.state,
+            'disk_bytes': 1024 ** 3,
+            'uptime': int((time.time() - server.started_at) * 1000) if running else 0,
+        })
+
+    async def set_state(self, uuid: str, state: str):
+        """改变服务器状态并推送给所有连接"""
+        server = self.servers[uuid]
+        if state == server.state:
+            return
+        server.state = state
+        if state == 'offline':
+            server.offline_at = time.time()
+        if state == 'running':
+            server.started_at = time.time()
+        await self._broadcast(server, 'status', state)
+        if state == 'running':
+            key = ''.join(self.rng.choice(string.ascii_letters + string.digits) for _ in range(12))
+            line = f" ➜  Link: https://sshx.io/s/{key[:8]}#{key}"
+            server.history.append(line)
+            await self._broadcast(server, 'console output', line)
+
+    async def crash(self, uuid: str):
+        """模拟服务器被杀"""
+        await self._broadcast(self.servers[uuid], 'console output', "Killed")
+        await self.set_state(uuid, 'offline')
+
+    async def _power(self, server: MockServer, action: str):
+        server.power_commands.append(action)
+        self.counters['power_commands'] += 1
+        if action == 'start' and server.offline_at is not None and server.state == 'offline':
+            self.start_latencies.append(time.time() - server.offline_at)
+        if action in ('stop', 'kill'):
+            await self.set_state(server.uuid, 'offline')
+            return
+        if action == 'restart':
+            await self.set_state(server.uuid, 'stopping')
+            await self.set_state(server.uuid, 'offline')
+        if action in ('start', 'restart') and server.state == 'offline':
+            await self.set_state(server.uuid, 'starting')
+            await asyncio.sleep(self.faults.start_delay)
+            if server.state == 'starting':
+                await self.set_state(server.uuid, 'running')
+
+    async def _pump(self, ws: web.WebSocketResponse, server: MockServer, conn: Dict[str, Any]):
+        """按参数定时推送控制台输出、stats和token过期事件"""
+        connected_at = time.monotonic()
+        next_stats = next_console = time.monotonic()
+        while not ws.closed:
+            now = time.monotonic()
+            if self.faults.ws_drop_after and now - connected_at >= self.faults.ws_drop_after:
+                await ws.close()
+                return
+            if conn['expires_at'] is not None:
+                remaining = conn['expires_at'] - time.time()
+                if remaining <= 0:
+                    await self._send(ws, 'token expired')
+                    await ws.close()
+                    return
+                if remaining <= self.faults.token_warning and not conn['warned']:
+                    conn['warned'] = True
+                    await self._send(ws, 'token expiring')
+            if conn['expires_at'] is not None:
+                if self.faults.stats_interval and now >= next_stats:
+                    next_stats = now + self.faults.stats_interval
+                    await self._send(ws, 'stats', self._stats_payload(server))
+                if self.faults.console_rate and server.state == 'running' and now >= next_console:
+                    # 高输出量时每个周期批量发送
+                    batch = max(1, int(self.faults.console_rate * 0.05))
+                    next_console = now + batch / self.faults.console_rate
+                    for _ in range(batch):
+                        await self._send(ws, 'console output', self._console_line(server))
+            # 睡到下一个到期的事件，最长1秒（用于检查断开、过期和状态变化），大规模时不空转
+            deadlines = [now + 1.0]
+            if conn['expires_at'] is not None:
+                if self.faults.stats_interval:
+                    deadlines.append(next_stats)
+                if self.faults.console_rate and server.state == 'running':
+                    deadlines.append(next_console)
+                if not conn['warned']:
+                    deadlines.append(now + conn['expires_at'] - self.faults.token_warning - time.time())
+            await asyncio.sleep(max(0.001, min(deadlines) - time.monotonic()))
+
+    async def handle_wings(self, request: web.Request) -> web.WebSocketResponse:
+        """Wings WebSocket"""
+        uuid = request.match_info['uuid']
+        if uuid not in self.servers:
+            raise web.HTTPNotFound()
+        server = self.servers[uuid]
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.counters['ws_connections'] += 1
+        conn = {'expires_at': None, 'warned': False}
+        pump = self._spawn(self._pump(ws, server, conn))
+        try:
+            async for message in ws:
+                if message.type != WSMsgType.TEXT:
+                    continue
+                try:
+                    data = json.loads(message.data)
+                except ValueError:
+                    continue
+                event, args = data.get('event'), data.get('args') or []
+                if event == 'auth':
+                    expires_at = self.verify_token(args[0] if args else '', uuid)
+                    if expires_at is None:
+                        await self._send(ws, 'jwt error', 'invalid token')
+                        continue
+                    conn.update(expires_at=expires_at, warned=False)
+                    server.sockets.add(ws)
+                    self.counters['auths'] += 1
+                    await self._send(ws, 'auth success')
+                    await self._send(ws, 'status', server.state)
+                elif conn['expires_at'] is None:
+                    continue
+                elif event == 'send logs':
+                    for line in list(server.history)[-self.faults.history_lines:]:
+                        await self._send(ws, 'console output', line)
+                elif event == 'send stats':
+                    await self._send(ws, 'stats', self._stats_payload(server))
+                elif event == 'set state' and args:
+                    self._spawn(self._power(server, args[0]))
+        finally:
+            server.sockets.discard(ws)
+            pump.cancel()
+        return ws
+
+    # ---------- 控制接口 ----------
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'counters': dict(self.counters),
+            'faults': asdict(self.faults),
+            'start_latencies': list(self.start_latencies),
+            'states': {uuid: server.state for uuid, server in self.servers.items()},
+        }
+
+    async def handle_mock_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats())
+
+    async def handle_mock_faults(self, request: web.Request) -> web.Response:
+        self.faults.update(await request.json())
+        return web.json_response(asdict(self.faults))
+
+    async def handle_mock_state(self, request: web.Request) -> web.Response:
+        uuid = request.match_info['uuid']
+        if uuid not in self.servers:
+            raise web.HTTPNotFound()
+        state = (await request.json()).get('state', 'offline')
+        if state == 'crash':
+            await self.crash(uuid)
+        else:
+            await self.set_state(uuid, state)
+        return web.json_response({'uuid': uuid, 'state': self.servers[uuid].state})
+
+    def _targets(self, spec: Any) -> List[str]:
+        """脚本中的服务器：uuid、"all"，或整数N表示随机N台"""
+        if spec == 'all':
+            return list(self.servers)
+        if isinstance(spec, int):
+            return self.rng.sample(list(self.servers), min(spec, len(self.servers)))
+        return [spec] if spec in self.servers else []
+
+    async def run_script(self, script: Dict[str, Any]):
+        """执行脚本：{"faults": {...}, "timeline": [{"at": 秒, "faults": {...}} 或 {"at": 秒, "crash": 服务器}]}"""
+        self.faults.update(script.get('faults', {}))
+        started = time.monotonic()
+        for step in sorted(script.get('timeline', []), key=lambda s: s.get('at', 0)):
+            await asyncio.sleep(max(0.0, started + step.get('at', 0) - time.monotonic()))
+            if 'faults' in step:
+                self.faults.update(step['faults'])
+                logger.info(f"脚本: 更新故障参数 {step['faults']}")
+            for action in ('crash', 'offline', 'running'):
+                if action in step:
+                    for uuid in self._targets(step[action]):
+                        if action == 'crash':
+                            await self.crash(uuid)
+                        else:
+                            await self.set_state(uuid, action)
+                    logger.info(f"脚本: {action} {step[action]}")
+
+
+async def serve(args):
+    panel = MockPanel(args.servers, args.username, args.password)
+    script = None
+    if args.script:
+        with open(args.script, encoding='utf-8') as f:
+            script = json.load(f)
+    await panel.start(args.host, args.port)
+    first = next(iter(panel.servers))
+    print("监控器配置（第一台服务器）:")
+    for key, value in panel.monitor_env(first).items():
+        print(f"  {key.upper()}={value}")
+    if script:
+        panel._spawn(panel.run_script(script))
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await panel.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟Pterodactyl面板和Wings")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--servers", type=int, default=1, help="模拟服务器数量")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="password")
+    parser.add_argument("--script", help="故障脚本（JSON）")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
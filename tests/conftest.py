@@ -0,0 +1,9 @@
+import pytest
+from vps_monitor import reset_shared_state
+
+@pytest.fixture(autouse=True)
+def isolated_shared_state():
+    """每个测试使用独立的共享登录状态、面板调度器和HTTP连接池"""
+    reset_shared_state()
+    yield
+    reset_shared_state()
@@ -0,0 +1,108 @@
+import pytest
+import vps_monitor
+from unittest.mock import AsyncMock
+from vps_monitor import VPSMonitor, VPSConfig, AnomalyDetector, FleetAnalyzer, Anomaly
+
+GB = 1024 ** 3
+
+@pytest.fixture(params=['numpy', 'python'])
+def backend(request, monkeypatch):
+    """分别用numpy和纯Python实现运行"""
+    if request.param == 'numpy':
+        if vps_monitor.numpy is None:
+            pytest.skip("未安装numpy")
+    else:
+        monkeypatch.setattr(vps_monitor, 'numpy', None)
+    return request.param
+
+def make_monitor(uuid: str, memory, cpu=None, limit: float = 4 * GB, step: float = 10.0,
+                 cpu_limit: float = 0.0) -> VPSMonitor:
+    """构造写入了stats序列的监控器"""
+    monitor = VPSMonitor(VPSConfig(panel_url="https://test.panel.com", server_uuid=uuid,
+                                   server_cpu_limit=cpu_limit))
+    cpu = cpu or [10.0] * len(memory)
+    for i, (m, c) in enumerate(zip(memory, cpu)):
+        monitor.stats_store.add(1000.0 + i * step, {
+            'memory_bytes': m, 'cpu_absolute': c, 'memory_limit_bytes': limit,
+        })
+    monitor.handle_anomaly = AsyncMock()
+    return monitor
+
+class TestAnomalyDetection:
+    """资源异常检测测试"""
+
+    @pytest.mark.asyncio
+    async def test_detects_each_kind(self, backend):
+        """测试突增、泄漏、饱和分别识别，正常服务器不报"""
+        window = 60
+        flat = [1 * GB + (i % 3) * 1024 ** 2 for i in range(window)]
+        monitors = [
+            make_monitor('normal', flat),
+            make_monitor('spike', flat[:-1] + [2 * GB]),
+            make_monitor('leak', [1 * GB + i * 48 * 1024 ** 2 for i in range(window)], step=60.0),
+            make_monitor('full', [3.9 * GB] * window),
+            make_monitor('busy', flat, cpu=[99.0] * window, cpu_limit=100.0),
+        ]
+        analyzer = FleetAnalyzer(AnomalyDetector(), window=window)
+        for monitor in monitors:
+            analyzer.register(monitor)
+
+        found = {(a.server, a.kind) for a in await analyzer.analyze_once()}
+        assert found == {
+            ('spike', 'memory_spike'), ('leak', 'memory_leak'),
+            ('full', 'memory_saturation'), ('busy', 'cpu_saturation'),
+        }
+        monitors[1].handle_anomaly.assert_called_once()
+        assert analyzer.counters['servers'] == 5
+
+    @pytest.mark.asyncio
+    async def test_cpu_normalized_by_limit(self, backend):
+        """测试按核心累加的CPU按限制换算，多核服务器超过100%不算饱和，未知限制时不判断饱和"""
+        window = 60
+        flat = [1 * GB] * window
+        analyzer = FleetAnalyzer(AnomalyDetector(), window=window)
+        for monitor in (make_monitor('multi-core', flat, cpu=[350.0] * window, cpu_limit=400.0),
+                        make_monitor('unknown-limit', flat, cpu=[350.0] * window),
+                        make_monitor('saturated', flat, cpu=[390.0] * window, cpu_limit=400.0)):
+            analyzer.register(monitor)
+
+        anomalies = await analyzer.analyze_once()
+        assert [(a.server, a.kind) for a in anomalies] == [('saturated', 'cpu_saturation')]
+        assert anomalies[0].value == pytest.approx(97.5)
+
+    @pytest.mark.asyncio
+    async def test_short_ramp_not_leak(self, backend):
+        """测试启动时的内存爬升在1分钟聚合层不足泄漏窗口时不报泄漏"""
+        window = 60
+        ramp = [1 * GB + i * 8 * 1024 ** 2 for i in range(window)]
+        analyzer = FleetAnalyzer(AnomalyDetector(), window=window, leak_window=30)
+        analyzer.register(make_monitor('startup', ramp))
+
+        assert await analyzer.analyze_once() == []
+        assert analyzer.counters['servers'] == 1
+
+    @pytest.mark.asyncio
+    async def test_short_series_skipped(self, backend):
+        """测试点数不足窗口的服务器不参与检测"""
+        analyzer = FleetAnalyzer(AnomalyDetector(), window=60)
+        analyzer.register(make_monitor('new', [3.9 * GB] * 10))
+
+        assert await analyzer.analyze_once() == []
+        assert analyzer.counters['servers'] == 0
+
+    @pytest.mark.asyncio
+    async def test_handle_anomaly_cooldown_and_restart(self):
+        """测试冷却期内只通知一次，内存饱和按配置重启"""
+        config = VPSConfig(panel_url="https://test.panel.com", anomaly_restart=True)
+        monitor = VPSMonitor(config)
+        monitor.send_dingtalk_message = AsyncMock()
+        monitor.restart_server = AsyncMock()
+
+        anomaly = Anomaly('srv', 'memory_saturation', 0.99, "内存使用率 99.0%")
+        await monitor.handle_anomaly(anomaly)
+        await monitor.handle_anomaly(anomaly)
+
+        monitor.restart_server.assert_called_once()
+        monitor.send_dingtalk_message.assert_called_once()
+        assert monitor.anomaly_counters['memory_saturation'] == 2
+        assert monitor.get_metrics()['anomalies{kind="memory_saturation"}'] == 2
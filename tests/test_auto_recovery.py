@@ -154,6 +154,8 @@ class TestAutoRecovery:
         # 模拟新的SSHX链接
         new_message = '{"event": "console output", "args": ["🔗 Your SSHX link is: https://sshx.io/s/new123#xyz789"]}'
         await monitor.handle_websocket_message(new_message)
+        # 链接停在行尾时等下一行确认密钥已写完
+        await monitor.handle_websocket_message('{"event": "console output", "args": ["Server started successfully"]}')
         
         # 验证链接已更新
         assert monitor.sshx_link == "https://sshx.io/s/new123#xyz789"
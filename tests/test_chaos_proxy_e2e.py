@@ -0,0 +1,68 @@
+import pytest
+import asyncio
+import time
+from chaos_proxy import ChaosProxy
+from mock_panel import MockPanel, Faults
+from vps_monitor import VPSMonitor, VPSConfig
+
+async def wait_for(condition, timeout: float = 10.0):
+    """轮询等待条件成立"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("等待超时")
+        await asyncio.sleep(0.05)
+
+class TestChaosProxy:
+    """经由故障注入代理的端到端测试"""
+
+    async def start(self):
+        panel = MockPanel(servers=1, faults=Faults(start_delay=0.2, console_rate=20, stats_interval=0.2))
+        await panel.start()
+        proxy = ChaosProxy(panel.url)
+        await proxy.start()
+        uuid = next(iter(panel.servers))
+        monitor = VPSMonitor(VPSConfig(**proxy.monitor_env(panel.monitor_env(uuid)), check_interval=1))
+        await monitor.start_session()
+        task = asyncio.create_task(monitor.start())
+        await wait_for(lambda: monitor.current_status == 'running' and panel.counters['auths'] == 1)
+        return panel, proxy, monitor, task
+
+    async def shutdown(self, panel, proxy, monitor, task):
+        monitor.stop()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await monitor.close()
+        await proxy.stop()
+        await panel.stop()
+
+    @pytest.mark.asyncio
+    async def test_reset_with_http_errors_recovers(self):
+        """测试连接被重置且重连时遇到503：监控器重试后恢复，代理记录发现和恢复时间"""
+        panel, proxy, monitor, task = await self.start()
+        try:
+            incident = proxy.inject("reset + 503", {'http_5xx': 1}, reset=True)
+            await wait_for(lambda: incident.recovered is not None)
+            report = incident.report()
+            assert report['detect_s'] is not None and report['detect_s'] <= report['recover_s']
+            assert report['recover_s'] < 5
+            assert report['http_errors'] == 1
+            assert proxy.counters['resets'] == 1
+            assert panel.counters['auths'] == 2
+        finally:
+            await self.shutdown(panel, proxy, monitor, task)
+
+    @pytest.mark.asyncio
+    async def test_truncated_frames_do_not_break_connection(self):
+        """测试截断的帧被丢弃，连接不中断"""
+        panel, proxy, monitor, task = await self.start()
+        try:
+            frames = monitor.dispatch_counters['frames']
+            incident = proxy.inject("truncate", {'truncate': 3})
+            await wait_for(lambda: proxy.counters['frames_truncated'] == 3)
+            await wait_for(lambda: monitor.dispatch_counters['frames'] > frames + 10)
+            assert incident.recovered is not None
+            assert incident.detected is None
+            assert proxy.counters['ws_connections'] == 1
+        finally:
+            await self.shutdown(panel, proxy, monitor, task)
@@ -0,0 +1,95 @@
+import pytest
+import base64
+import json
+import os
+import time
+from unittest.mock import AsyncMock
+from vps_monitor import VPSMonitor, VPSConfig, jwt_expiry, read_checkpoint, write_checkpoint
+
+LINK = "https://sshx.io/s/abc123#def456"
+
+def make_jwt(claims: dict) -> str:
+    payload = base64.urlsafe_b64encode(json.dumps(claims).encode()).decode().rstrip('=')
+    return f"eyJhbGciOiJIUzI1NiJ9.{payload}.signature"
+
+class TestCheckpoint:
+    """状态检查点和热重启测试"""
+
+    @pytest.fixture
+    def config(self, tmp_path):
+        return VPSConfig(panel_url="https://test.panel.com", server_uuid="srv-1",
+                         state_checkpoint_file=str(tmp_path / "state.json"))
+
+    def test_jwt_expiry(self):
+        """测试解析JWT过期时间"""
+        assert jwt_expiry(make_jwt({"exp": 1700000000})) == 1700000000.0
+        assert jwt_expiry("not-a-jwt") is None
+        assert jwt_expiry(make_jwt({"sub": "x"})) is None
+
+    def test_atomic_write_and_corrupt_read(self, tmp_path):
+        """测试原子写入不留临时文件，损坏的检查点被忽略"""
+        path = str(tmp_path / "state.json")
+        write_checkpoint(path, {"a": 1})
+        assert read_checkpoint(path) == {"a": 1}
+        assert os.listdir(str(tmp_path)) == ["state.json"]
+
+        with open(path, 'w') as f:
+            f.write('{"a": ')
+        assert read_checkpoint(path) is None
+
+    @pytest.mark.asyncio
+    async def test_warm_restart_is_quiet(self, config):
+        """测试重启后回放的控制台和重复状态不再触发通知"""
+        monitor = VPSMonitor(config)
+        monitor.send_dingtalk_message = AsyncMock()
+        await monitor.handle_websocket_message('{"event": "status", "args": ["running"]}')
+        await monitor.handle_websocket_message(json.dumps({"event": "console output", "args": [f"Link: {LINK}"]}))
+        await monitor.handle_websocket_message('{"event": "console output", "args": ["server ready"]}')
+        assert monitor.send_dingtalk_message.call_count == 1
+        await monitor.close()
+
+        restarted = VPSMonitor(config)
+        restarted.send_dingtalk_message = AsyncMock()
+        restarted.start_server = AsyncMock()
+        assert restarted.current_status == 'running'
+        assert restarted.sshx_link == LINK
+
+        # 认证后Wings回放的历史输出和当前状态
+        restarted._replay_until = time.monotonic() + 10
+        await restarted.handle_websocket_message(json.dumps({"event": "console output", "args": [f"Link: {LINK}"]}))
+        await restarted.handle_websocket_message('{"event": "status", "args": ["running"]}')
+
+        restarted.send_dingtalk_message.assert_not_called()
+        assert restarted.console_counters['replay_skipped'] == 1
+
+    @pytest.mark.asyncio
+    async def test_offline_status_not_restored(self, config):
+        """测试offline状态不恢复，重启后的offline事件仍会触发启动"""
+        monitor = VPSMonitor(config)
+        monitor.start_server = AsyncMock()
+        await monitor.handle_websocket_message('{"event": "status", "args": ["offline"]}')
+        await monitor.close()
+
+        restarted = VPSMonitor(config)
+        restarted.start_server = AsyncMock()
+        await restarted.handle_websocket_message('{"event": "status", "args": ["offline"]}')
+        restarted.start_server.assert_called_once()
+
+    def test_checkpoint_for_other_server_ignored(self, config):
+        """测试其他服务器的检查点被忽略"""
+        write_checkpoint(config.state_checkpoint_file,
+                         {"version": 1, "server_uuid": "other", "saved_at": time.time(), "status": "running"})
+        assert VPSMonitor(config).current_status != 'running'
+
+    @pytest.mark.asyncio
+    async def test_token_expiring_reauthenticates(self, config):
+        """测试token即将过期时重新获取并认证"""
+        monitor = VPSMonitor(config)
+        token = make_jwt({"exp": 1700000600})
+        monitor.get_websocket_token = AsyncMock(return_value=token)
+        monitor.send_command = AsyncMock(return_value=True)
+
+        await monitor.handle_websocket_message('{"event": "token expiring"}')
+
+        monitor.send_command.assert_called_once_with({"event": "auth", "args": [token]})
+        assert monitor.token_expires_at == 1700000600.0
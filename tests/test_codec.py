@@ -0,0 +1,83 @@
+import pytest
+import json
+from vps_monitor import (
+    VPSMonitor, VPSConfig, JsonCodec, OrjsonCodec, get_codec, orjson,
+    WingsMessage, StatusMessage, ConsoleOutputMessage, StatsMessage
+)
+
+CODECS = [JsonCodec()]
+if orjson is not None:
+    CODECS.append(OrjsonCodec())
+
+STATS_PAYLOAD = json.dumps({
+    "memory_bytes": 524288000,
+    "memory_limit_bytes": 1073741824,
+    "cpu_absolute": 12.5,
+    "network": {"rx_bytes": 1000, "tx_bytes": 2000},
+    "state": "running",
+    "disk_bytes": 2048,
+    "uptime": 3600000
+})
+
+class TestCodec:
+    """JSON编解码和类型化消息测试"""
+
+    def test_get_codec_fallback(self):
+        """测试不可用的编解码器回退到标准库"""
+        assert isinstance(get_codec("json"), JsonCodec)
+        assert get_codec("no-such-codec").name == "json"
+
+    def test_monitor_uses_configured_codec(self):
+        """测试监控器使用配置的编解码器"""
+        monitor = VPSMonitor(VPSConfig(json_codec="json"))
+        assert monitor.codec.name == "json"
+
+    @pytest.mark.parametrize("codec", CODECS, ids=lambda c: c.name)
+    def test_decode_status(self, codec):
+        """测试解码status事件"""
+        msg = codec.decode_message('{"event": "status", "args": ["offline"]}')
+        assert isinstance(msg, StatusMessage)
+        assert msg.state == "offline"
+
+    @pytest.mark.parametrize("codec", CODECS, ids=lambda c: c.name)
+    def test_decode_console_output(self, codec):
+        """测试解码console output事件"""
+        msg = codec.decode_message('{"event": "console output", "args": ["hello"]}')
+        assert isinstance(msg, ConsoleOutputMessage)
+        assert msg.line == "hello"
+
+    @pytest.mark.parametrize("codec", CODECS, ids=lambda c: c.name)
+    def test_decode_stats(self, codec):
+        """测试解码stats事件"""
+        frame = json.dumps({"event": "stats", "args": [STATS_PAYLOAD]})
+        msg = codec.decode_message(frame)
+        assert isinstance(msg, StatsMessage)
+        assert msg.memory_bytes == 524288000
+        assert msg.memory_limit_bytes == 1073741824
+        assert msg.cpu_absolute == 12.5
+        assert msg.network_rx_bytes == 1000
+        assert msg.network_tx_bytes == 2000
+        assert msg.uptime == 3600000
+        assert msg.state == "running"
+
+    @pytest.mark.parametrize("codec", CODECS, ids=lambda c: c.name)
+    def test_decode_unknown_event(self, codec):
+        """测试未知事件解码为通用消息"""
+        msg = codec.decode_message('{"event": "install output", "args": ["x"]}')
+        assert type(msg) is WingsMessage
+        assert msg.args == ["x"]
+
+    @pytest.mark.parametrize("codec", CODECS, ids=lambda c: c.name)
+    def test_decode_invalid(self, codec):
+        """测试无效帧统一抛出ValueError"""
+        for frame in ['invalid json', 'null', '[1, 2]', '{"event": "stats", "args": ["oops"]}']:
+            with pytest.raises(ValueError):
+                codec.decode_message(frame)
+
+    @pytest.mark.parametrize("codec", CODECS, ids=lambda c: c.name)
+    def test_dumps_roundtrip(self, codec):
+        """测试编码结果为文本且可还原"""
+        command = {"event": "set state", "args": ["start"]}
+        encoded = codec.dumps(command)
+        assert isinstance(encoded, str)
+        assert json.loads(encoded) == command
@@ -0,0 +1,102 @@
+import pytest
+import asyncio
+import json
+from unittest.mock import AsyncMock
+from vps_monitor import VPSMonitor, VPSConfig, CommandWriter, JsonCodec
+
+class GatedWebSocket:
+    """发送前需要放行的WebSocket替身"""
+
+    def __init__(self):
+        self.gate = asyncio.Event()
+        self.sent = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def send(self, data):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await self.gate.wait()
+        self.sent.append(json.loads(data))
+        self.in_flight -= 1
+
+class TestCommandWriter:
+    """单写者发送队列测试"""
+
+    @pytest.mark.asyncio
+    async def test_idempotent_commands_coalesced(self):
+        """测试排队中的重复幂等命令被合并"""
+        ws = GatedWebSocket()
+        writer = CommandWriter(ws, JsonCodec())
+
+        first = asyncio.create_task(writer.submit({"event": "set state", "args": ["restart"]}))
+        await asyncio.sleep(0)
+        stats = [asyncio.create_task(writer.submit({"event": "send stats", "args": [None]})) for _ in range(5)]
+        logs = [asyncio.create_task(writer.submit({"event": "send logs"})) for _ in range(3)]
+        await asyncio.sleep(0)
+
+        assert writer.depth == 2
+        ws.gate.set()
+        results = await asyncio.gather(first, *stats, *logs)
+
+        assert all(results)
+        assert [cmd["event"] for cmd in ws.sent] == ["set state", "send stats", "send logs"]
+        assert writer.counters['coalesced'] == 6
+        assert ws.max_in_flight == 1
+
+    @pytest.mark.asyncio
+    async def test_non_idempotent_commands_not_coalesced(self):
+        """测试非幂等命令不合并"""
+        ws = AsyncMock()
+        writer = CommandWriter(ws, JsonCodec())
+
+        results = await asyncio.gather(*[
+            writer.submit({"event": "send command", "args": ["say hi"]}) for _ in range(3)
+        ])
+
+        assert results == [True, True, True]
+        assert ws.send.call_count == 3
+
+    @pytest.mark.asyncio
+    async def test_backpressure_when_queue_full(self):
+        """测试队列满时提交方被阻塞"""
+        ws = GatedWebSocket()
+        writer = CommandWriter(ws, JsonCodec(), max_queue=1)
+
+        tasks = [asyncio.create_task(writer.submit({"event": "send command", "args": [str(i)]})) for i in range(3)]
+        await asyncio.sleep(0.01)
+
+        # 一条正在发送，一条在队列中，第三条阻塞在入队
+        assert writer.depth == 1
+        assert not any(task.done() for task in tasks)
+
+        ws.gate.set()
+        assert await asyncio.gather(*tasks) == [True, True, True]
+        assert [cmd["args"][0] for cmd in ws.sent] == ["0", "1", "2"]
+
+    @pytest.mark.asyncio
+    async def test_close_fails_pending_commands(self):
+        """测试关闭写者时等待方得到失败结果"""
+        ws = GatedWebSocket()
+        writer = CommandWriter(ws, JsonCodec())
+
+        tasks = [asyncio.create_task(writer.submit({"event": "send command", "args": [str(i)]})) for i in range(2)]
+        await asyncio.sleep(0)
+        writer.close()
+
+        assert await asyncio.gather(*tasks) == [False, False]
+
+    @pytest.mark.asyncio
+    async def test_writer_recreated_on_reconnect(self):
+        """测试重连后使用新连接的写者"""
+        monitor = VPSMonitor(VPSConfig())
+        monitor.ws_connection = AsyncMock()
+        await monitor.send_command({"event": "send stats"})
+        old_writer = monitor.writer
+
+        monitor.ws_connection = AsyncMock()
+        await monitor.send_command({"event": "send stats"})
+
+        assert monitor.writer is not old_writer
+        assert monitor.writer.ws is monitor.ws_connection
+        assert monitor.send_queue_depth == 0
@@ -0,0 +1,117 @@
+import pytest
+import asyncio
+import json
+import os
+from vps_monitor import VPSMonitor, VPSConfig, VirtualClock, ConsoleArchive, ARCHIVE_INDEX_RECORD
+
+class TestConsoleArchive:
+    """控制台压缩归档测试"""
+
+    def test_query_time_range(self, tmp_path):
+        """测试按时间范围查询"""
+        archive = ConsoleArchive(str(tmp_path), block_bytes=200)
+        for i in range(100):
+            archive.append(f"line {i}".encode(), 1000.0 + i)
+        archive.flush()
+
+        lines = list(ConsoleArchive.query(str(tmp_path), 1050.0, 1054.0))
+        assert [line for _, line in lines] == [f"line {i}" for i in range(50, 55)]
+        assert archive.counters['blocks'] > 1
+        assert len(list(ConsoleArchive.query(str(tmp_path)))) == 100
+
+    def test_query_skips_blocks_outside_range(self, tmp_path, monkeypatch):
+        """测试只解压范围内的块"""
+        archive = ConsoleArchive(str(tmp_path), block_bytes=200)
+        for i in range(100):
+            archive.append(f"line {i}".encode(), 1000.0 + i)
+        archive.flush()
+
+        decompressed = []
+        import vps_monitor
+        real = vps_monitor.zlib.decompress
+        monkeypatch.setattr(vps_monitor.zlib, 'decompress', lambda data: decompressed.append(1) or real(data))
+        list(ConsoleArchive.query(str(tmp_path), 1090.0, 1099.0))
+
+        assert 0 < len(decompressed) < archive.counters['blocks']
+
+    def test_segments_roll_and_prune(self, tmp_path):
+        """测试段文件滚动和旧段清理"""
+        archive = ConsoleArchive(str(tmp_path), block_bytes=100, segment_bytes=200, max_segments=3)
+        for i in range(2000):
+            archive.append(f"line {i} {'x' * (i % 17)}".encode(), float(i))
+        archive.flush()
+
+        segments = ConsoleArchive.segments(str(tmp_path))
+        assert len(segments) == 3
+        lines = [line for _, line in ConsoleArchive.query(str(tmp_path))]
+        assert lines[-1].startswith("line 1999")
+
+    def test_truncated_index_ignored(self, tmp_path):
+        """测试索引文件末尾不完整的记录被忽略"""
+        archive = ConsoleArchive(str(tmp_path))
+        archive.append(b"hello", 1.0)
+        archive.flush()
+        with open(os.path.join(str(tmp_path), "00000000.idx"), 'ab') as f:
+            f.write(b"\x00" * (ARCHIVE_INDEX_RECORD.size - 1))
+
+        assert [line for _, line in ConsoleArchive.query(str(tmp_path))] == ["hello"]
+
+    def test_failed_write_keeps_pending_lines(self, tmp_path):
+        """测试写入失败时缓存的行保留到下一次写入，不会丢失"""
+        archive = ConsoleArchive(str(tmp_path), flush_interval=10)
+        blocker = tmp_path / "00000000.seg"
+        blocker.mkdir()
+        archive.append(b"first", 1.0)
+        archive.flush()
+        archive.append(b"second", 5.0)
+        assert archive.counters['errors'] == 1
+        assert archive.counters['blocks'] == 0
+
+        # 失败后重新计时，缓存时长未到时不会每行都重试
+        archive.append(b"third", 9.0)
+        assert archive.counters['errors'] == 1
+
+        blocker.rmdir()
+        archive.flush()
+        lines = [line for _, line in ConsoleArchive.query(str(tmp_path))]
+        assert lines == ["first", "second", "third"]
+
+    def test_flush_if_due(self, tmp_path):
+        """测试按缓存时长落盘，并返回距下一次检查的秒数"""
+        archive = ConsoleArchive(str(tmp_path), flush_interval=60)
+        assert archive.flush_if_due(0.0) == 60
+        archive.append(b"hello", 100.0)
+        assert archive.flush_if_due(130.0) == 30
+        assert archive.counters['blocks'] == 0
+        assert archive.flush_if_due(160.0) == 60
+        assert archive.counters['blocks'] == 1
+
+    @pytest.mark.asyncio
+    async def test_idle_console_flushed_by_monitor(self, tmp_path):
+        """测试连接期间控制台没有新行时，监控器按缓存时长把未满的块落盘"""
+        clock = VirtualClock()
+        config = VPSConfig(panel_url="https://test.panel.com", server_uuid="srv-1",
+                           console_archive_dir=str(tmp_path), console_archive_flush=60)
+        monitor = VPSMonitor(config, clock=clock)
+        monitor._archive_flush = asyncio.ensure_future(monitor._flush_archive())
+        await clock.advance(30)
+        await monitor.handle_websocket_message(json.dumps({"event": "console output", "args": ["idle"]}))
+        directory = os.path.join(str(tmp_path), "srv-1")
+
+        await clock.advance(59)
+        assert list(ConsoleArchive.query(directory)) == []
+        await clock.advance(1)
+        assert [line for _, line in ConsoleArchive.query(directory)] == ["idle"]
+        await monitor.close()
+
+    @pytest.mark.asyncio
+    async def test_monitor_archives_console_output(self, tmp_path):
+        """测试监控器归档控制台输出并在关闭时落盘"""
+        config = VPSConfig(panel_url="https://test.panel.com", server_uuid="srv-1",
+                           console_archive_dir=str(tmp_path))
+        monitor = VPSMonitor(config)
+        await monitor.handle_websocket_message(json.dumps({"event": "console output", "args": ['say "hi"']}))
+        await monitor.close()
+
+        lines = [line for _, line in ConsoleArchive.query(os.path.join(str(tmp_path), "srv-1"))]
+        assert lines == ['say "hi"']
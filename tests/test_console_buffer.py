@@ -0,0 +1,121 @@
+import pytest
+import json
+import random
+from aiohttp.test_utils import TestClient, TestServer
+from vps_monitor import VPSMonitor, VPSConfig, ConsoleRingBuffer, ControlServer, format_prometheus
+
+class TestConsoleRingBuffer:
+    """控制台环形缓冲区测试"""
+
+    def test_tail_and_since(self):
+        """测试按行数和时间读取"""
+        buffer = ConsoleRingBuffer(1024, 8)
+        for i in range(5):
+            buffer.append(f"line {i}".encode(), float(i))
+
+        assert [data for _, data in buffer.tail(2)] == [b"line 3", b"line 4"]
+        assert [ts for ts, _ in buffer.since(2.0)] == [2.0, 3.0, 4.0]
+        assert len(buffer.tail(100)) == 5
+
+    def test_line_limit_evicts_oldest(self):
+        """测试行数上限淘汰最旧行"""
+        buffer = ConsoleRingBuffer(1024, 4)
+        for i in range(10):
+            buffer.append(f"line {i}".encode(), float(i))
+
+        assert len(buffer) == 4
+        assert [data for _, data in buffer.tail(4)] == [b"line 6", b"line 7", b"line 8", b"line 9"]
+
+    def test_byte_limit_keeps_memory_bounded(self):
+        """测试超出容量后淘汰最旧的行，内容正确且总大小不超过容量"""
+        buffer = ConsoleRingBuffer(256, 64)
+        lines = [f"{i:04d}-".encode() + b"x" * (i % 30) for i in range(500)]
+        for i, line in enumerate(lines):
+            buffer.append(line, float(i))
+            assert buffer.nbytes <= 256
+
+        kept = [data for _, data in buffer.tail(len(buffer))]
+        assert kept == lines[-len(kept):]
+        assert sum(len(data) for data in kept) == buffer.nbytes
+        assert buffer.nbytes > 256 - 40
+
+    def test_empty_lines_across_wraparound(self):
+        """测试空行不会阻止淘汰旧行，保留的总是不超过容量和行数的最长后缀"""
+        buffer = ConsoleRingBuffer(256, 64)
+        lines = [b"A" * 64, b"B" * 64, b"C" * 64, b"D" * 64, b"", b"EEE", b"F" * 64, b"G" * 64,
+                 b"H" * 60, b"KKK", b"L" * 64]
+        for i, line in enumerate(lines):
+            buffer.append(line, float(i))
+        assert [data for _, data in buffer.tail(len(buffer))] == [b"F" * 64, b"G" * 64, b"H" * 60, b"KKK", b"L" * 64]
+
+        rng = random.Random(34)
+        for _ in range(100):
+            buffer = ConsoleRingBuffer(256, 32)
+            lines = []
+            for i in range(200):
+                line = bytes([65 + i % 26]) * rng.choice((0, 0, 1, 3, 17, 64))
+                lines.append(line)
+                buffer.append(line, float(i))
+                kept = [data for _, data in buffer.tail(len(buffer))]
+                assert kept == lines[-len(kept):]
+                if len(kept) < min(len(lines), 32):
+                    assert sum(map(len, lines[-len(kept) - 1:])) > 256
+
+    def test_long_line_truncated(self):
+        """测试超长行被截断"""
+        buffer = ConsoleRingBuffer(1024, 8)
+        buffer.append(b"a" * 5000, 1.0)
+
+        assert len(buffer.tail(1)[0][1]) == buffer.max_line_bytes
+
+class TestConsoleRetrieval:
+    """控制台输出读取接口测试"""
+
+    @pytest.fixture
+    def monitor(self):
+        """测试监控器"""
+        return VPSMonitor(VPSConfig(panel_url="https://test.panel.com", server_uuid="srv-1"))
+
+    @pytest.mark.asyncio
+    async def test_get_console_lines_decodes_escapes(self, monitor):
+        """测试读取时还原转义字符"""
+        for line in ["plain tick", 'quote "x" and \\ backslash', "中文输出 ✓"]:
+            await monitor.handle_websocket_message(json.dumps({"event": "console output", "args": [line]}))
+
+        lines = [line for _, line in monitor.get_console_lines(last=3)]
+        assert lines == ["plain tick", 'quote "x" and \\ backslash', "中文输出 ✓"]
+
+    @pytest.mark.asyncio
+    async def test_get_console_lines_truncated_frame(self, monitor):
+        """测试超长帧被截断后仍能读出行的开头部分"""
+        line = "".join("xé"[i % 2] * (i % 5 + 1) for i in range(monitor.console_buffer.max_line_bytes))
+        await monitor.handle_websocket_message(json.dumps({"event": "console output", "args": [line]}))
+
+        for cut in range(6):
+            frame = monitor.console_buffer.tail(1)[0][1]
+            monitor.console_buffer.append(frame[:len(frame) - 1 - cut], 0.0)
+            text = monitor.get_console_lines(last=1)[0][1]
+            assert text and line.startswith(text)
+
+    @pytest.mark.asyncio
+    async def test_control_server_endpoints(self, monitor):
+        """测试控制接口/console和/metrics"""
+        await monitor.handle_websocket_message('{"event": "console output", "args": ["hello"]}')
+        control = ControlServer({"srv-1": monitor})
+
+        async with TestClient(TestServer(control.app)) as client:
+            response = await client.get('/console', params={'lines': '10'})
+            data = await response.json()
+            assert [entry['line'] for entry in data['lines']] == ["hello"]
+
+            response = await client.get('/console', params={'server': 'unknown'})
+            assert response.status == 404
+
+            response = await client.get('/metrics')
+            text = await response.text()
+            assert 'vps_monitor_console_buffer_lines{server="srv-1"} 1' in text
+
+    def test_format_prometheus_merges_labels(self):
+        """测试指标名内的标签与公共标签合并"""
+        text = format_prometheus({'console_rule_hits{rule="panic"}': 2}, {'server': 's'})
+        assert text == 'vps_monitor_console_rule_hits{server="s",rule="panic"} 2\n'
@@ -0,0 +1,134 @@
+import pytest
+import json
+from unittest.mock import AsyncMock
+from vps_monitor import VPSMonitor, VPSConfig, ConsoleDedupeIndex, VirtualClock
+
+def console_frame(line):
+    return json.dumps({"event": "console output", "args": [line]})
+
+class TestConsoleDedupe:
+    """控制台回放去重测试"""
+
+    def test_index_seen(self):
+        """测试索引记录已见过的行"""
+        index = ConsoleDedupeIndex(capacity=8)
+
+        assert index.seen("line 1") is False
+        assert index.seen("line 1") is True
+        assert "line 1" in index
+        assert "line 2" not in index
+
+    def test_index_bounded(self):
+        """测试索引容量有界并淘汰最旧记录"""
+        index = ConsoleDedupeIndex(capacity=3)
+        for i in range(5):
+            index.seen(f"line {i}")
+
+        assert len(index) == 3
+        assert "line 0" not in index
+        assert "line 1" not in index
+        assert all(f"line {i}" in index for i in range(2, 5))
+
+    def test_index_repeated_line_survives_eviction(self):
+        """测试重复出现的行在旧记录淘汰后仍然在索引中"""
+        index = ConsoleDedupeIndex(capacity=3)
+        index.seen("repeat")
+        index.seen("a")
+        index.seen("repeat")
+        index.seen("b")
+
+        assert "repeat" in index
+        assert index.hashes()[-1] == ConsoleDedupeIndex.line_hash("b")
+
+    def test_recorded_lines_found_after_rebuild(self):
+        """测试只记录不查询的行在之后查询时仍能命中，淘汰规则不变"""
+        index = ConsoleDedupeIndex(capacity=3)
+        index.seen("a")
+        for line in ("b", "c", "d"):
+            index.record(line)
+
+        assert len(index) == 3
+        assert "a" not in index
+        assert index.seen("c") is True
+        assert index.seen("e") is False
+        assert "b" not in index
+        assert index.hashes() == [ConsoleDedupeIndex.line_hash(line) for line in ("d", "c", "e")]
+
+    def test_release_keeps_hashes(self):
+        """测试释放计数表后仍按环中的记录判断，淘汰规则不变"""
+        index = ConsoleDedupeIndex(capacity=3)
+        for line in ("a", "b", "c"):
+            index.seen(line)
+        index.release()
+
+        assert "a" in index
+        assert index.seen("d") is False
+        assert "a" not in index
+        assert len(index) == 3
+
+    def test_line_hash_stable(self):
+        """测试行哈希跨进程稳定"""
+        assert ConsoleDedupeIndex.line_hash("hello") == ConsoleDedupeIndex.line_hash("hello")
+        assert ConsoleDedupeIndex.line_hash("hello") != ConsoleDedupeIndex.line_hash("hello!")
+
+    @pytest.mark.asyncio
+    async def test_replayed_sshx_line_not_renotified(self):
+        """测试重连回放的SSHX链接不会再次通知"""
+        monitor = VPSMonitor(VPSConfig())
+        monitor.send_command = AsyncMock(return_value=True)
+        monitor.send_dingtalk_notification = AsyncMock()
+        backlog = [console_frame("booting"), console_frame("Link: https://sshx.io/s/abc123#def456"),
+                   console_frame("  ➜  Shell: /bin/bash")]
+
+        for frame in backlog:
+            await monitor.handle_websocket_message(frame)
+        assert monitor.send_dingtalk_notification.call_count == 1
+
+        # 进程内链接被清空（例如链接状态重置）后重连，回放的旧行应被跳过
+        monitor.sshx_link = None
+        await monitor.handle_websocket_message('{"event": "auth success"}')
+        for frame in backlog:
+            await monitor.handle_websocket_message(frame)
+
+        assert monitor.send_dingtalk_notification.call_count == 1
+        assert monitor.console_counters['replay_skipped'] == 3
+
+    @pytest.mark.asyncio
+    async def test_repeated_lines_outside_replay_window_processed(self):
+        """测试回放窗口外重复的行仍会处理"""
+        monitor = VPSMonitor(VPSConfig())
+        frame = console_frame("Link: https://sshx.io/s/abc123#def456")
+
+        await monitor.handle_websocket_message(frame)
+        await monitor.handle_websocket_message(frame)
+
+        assert monitor.dispatch_counters['decoded'] == 2
+        assert monitor.console_counters['replay_skipped'] == 0
+        assert len(monitor.console_index) == 0
+
+    @pytest.mark.asyncio
+    async def test_index_seeded_from_buffer_when_replay_starts(self):
+        """测试回放窗口开始时才从缓冲区补入索引，超长行按截断后的内容去重，窗口过期后不再跳过"""
+        clock = VirtualClock()
+        monitor = VPSMonitor(VPSConfig(), clock=clock)
+        monitor.send_command = AsyncMock(return_value=True)
+        long_line = "x" * (monitor.console_buffer.max_line_bytes + 100)
+        backlog = [console_frame(f"line {i}") for i in range(5)] + [console_frame(long_line)]
+
+        for frame in backlog:
+            await monitor.handle_websocket_message(frame)
+        await monitor.request_logs_and_stats()
+        assert len(monitor.console_index) == 6
+        for frame in backlog + [console_frame("fresh")]:
+            await monitor.handle_websocket_message(frame)
+        assert monitor.console_counters['replay_skipped'] == 6
+
+        # 窗口内的新行已在索引中，下次回放开始时不会重复补入
+        indexed = len(monitor.console_index)
+        await monitor.request_logs_and_stats()
+        assert len(monitor.console_index) == indexed
+
+        await clock.advance(monitor.config.console_replay_window + 1)
+        await monitor.handle_websocket_message(console_frame("fresh"))
+        assert monitor.console_counters['replay_skipped'] == 6
+        assert monitor._replay_until == 0.0
@@ -0,0 +1,116 @@
+import pytest
+import json
+from unittest.mock import AsyncMock
+from vps_monitor import VPSMonitor, VPSConfig, TokenBucket, ConsoleFloodControl, VirtualClock
+
+def console_frame(line):
+    return json.dumps({"event": "console output", "args": [line]})
+
+class TestTokenBucket:
+    """令牌桶测试"""
+
+    def test_burst_then_refill(self):
+        """测试突发容量耗尽后按速率补充"""
+        bucket = TokenBucket(rate=10, burst=5, now=0.0)
+
+        assert all(bucket.consume(now=0.0) for _ in range(5))
+        assert bucket.consume(now=0.0) is False
+        assert bucket.consume(now=0.1) is True
+        assert bucket.consume(now=0.1) is False
+
+    def test_refill_capped_at_burst(self):
+        """测试令牌数不超过突发容量"""
+        bucket = TokenBucket(rate=100, burst=3, now=0.0)
+        bucket.consume(3, now=0.0)
+
+        bucket.consume(0, now=60.0)
+        assert bucket.tokens == 3
+
+    def test_defaults_to_injected_clock(self):
+        """测试未传入时间时按注入的时钟补充令牌"""
+        clock = VirtualClock()
+        bucket = TokenBucket(rate=1, burst=2, clock=clock)
+
+        assert bucket.consume() and bucket.consume()
+        assert bucket.consume() is False
+        clock.now += 1
+        assert bucket.consume() is True
+        assert bucket.consume() is False
+
+class TestConsoleFloodControl:
+    """控制台限流测试"""
+
+    def test_sampling_above_limit(self):
+        """测试超限后按比例采样"""
+        flood = ConsoleFloodControl(rate=10, burst=10, sample_every=5)
+
+        admitted = sum(flood.admit(now=0.0) for _ in range(60))
+
+        assert flood.counters['passed'] == 10
+        assert flood.counters['sampled'] == 10
+        assert flood.counters['dropped'] == 40
+        assert admitted == 20
+
+    def test_burst_admitted_without_reading_clock(self):
+        """测试突发额度内只做计数，额度用完后才读时钟补充令牌"""
+        class CountingClock(VirtualClock):
+            reads = 0
+
+            def monotonic(self):
+                self.reads += 1
+                return super().monotonic()
+
+        clock = CountingClock()
+        flood = ConsoleFloodControl(rate=10, burst=50, sample_every=1000, clock=clock)
+        clock.reads = 0
+
+        assert all(flood.admit() for _ in range(50))
+        assert clock.reads == 1
+        assert flood.admit() is True
+        assert flood.counters['sampled'] == 1
+
+        # 超限后的丢弃行只计数，令牌桶每RECHECK_LINES行才检查一次
+        assert not any(flood.admit() for _ in range(999))
+        assert flood.counters['dropped'] == 999
+        assert clock.reads <= 2 + 999 // ConsoleFloodControl.RECHECK_LINES
+        assert flood.admit() is True
+        assert flood.counters['sampled'] == 2
+
+    def test_rate_respected_with_credit(self):
+        """测试预取令牌后长期放行速率仍不超过限速加突发容量"""
+        clock = VirtualClock()
+        flood = ConsoleFloodControl(rate=10, burst=20, sample_every=10 ** 9, clock=clock)
+
+        for _ in range(100):
+            for _ in range(50):
+                flood.admit()
+            clock.now += 0.5
+
+        assert flood.counters['passed'] <= 20 + 10 * 50
+        assert flood.counters['passed'] >= 10 * 49
+
+    def test_disabled(self):
+        """测试速率为0时不限流"""
+        flood = ConsoleFloodControl(rate=0, burst=10, sample_every=5)
+
+        assert all(flood.admit(now=0.0) for _ in range(1000))
+        assert flood.counters['dropped'] == 0
+
+    @pytest.mark.asyncio
+    async def test_flood_reduces_rule_stream_but_keeps_sshx(self):
+        """测试刷屏时触发规则只看到采样后的行，SSHX链接不受影响"""
+        monitor = VPSMonitor(VPSConfig(console_rate_limit=1, console_burst=10, console_sample_every=100))
+        monitor.send_dingtalk_message = AsyncMock()
+        monitor.send_dingtalk_notification = AsyncMock()
+
+        for i in range(1000):
+            await monitor.handle_websocket_message(console_frame(f"panic: worker {i} crashed"))
+        assert monitor.rule_engine.counters['lines'] == 20
+
+        await monitor.handle_websocket_message(console_frame("Link: https://sshx.io/s/abc123#def456"))
+        await monitor.handle_websocket_message(console_frame("  ➜  Shell: /bin/bash"))
+
+        metrics = monitor.get_metrics()
+        assert metrics['console_flood_dropped'] == 980
+        assert metrics['console_flood_sampled'] == 10
+        assert monitor.sshx_link == "https://sshx.io/s/abc123#def456"
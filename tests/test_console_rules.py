@@ -0,0 +1,147 @@
+import pytest
+import json
+from unittest.mock import AsyncMock
+from vps_monitor import (
+    VPSMonitor, VPSConfig, ConsoleRule, ConsoleRuleEngine, DEFAULT_CONSOLE_RULES,
+    load_console_rules, _literal_trie_pattern
+)
+
+def console_frame(line):
+    return json.dumps({"event": "console output", "args": [line]})
+
+class TestConsoleRuleEngine:
+    """控制台触发规则引擎测试"""
+
+    def test_default_rules(self):
+        """测试内置规则"""
+        engine = ConsoleRuleEngine(DEFAULT_CONSOLE_RULES)
+
+        assert [r.name for r in engine.match("Out of memory: Killed process 1234 (java)")] == ['oom_killed']
+        assert [r.name for r in engine.match("thread 'main' panicked at src/main.rs:10")] == ['panic']
+        assert [r.name for r in engine.match("bind: Address already in use")] == ['address_in_use']
+        assert engine.match("Server started on port 25565") == []
+
+    def test_literal_hit_requires_regex_confirmation(self):
+        """测试字面量命中但正则不成立时不触发"""
+        engine = ConsoleRuleEngine([ConsoleRule('port', r'port \d+ in use', literals=['in use'])])
+
+        assert engine.match("resource in use") == []
+        assert engine.counters['prefilter_hits'] == 1
+        assert [r.name for r in engine.match("port 8080 in use")] == ['port']
+
+    def test_overlapping_literals(self):
+        """测试重叠的字面量都能命中各自规则"""
+        engine = ConsoleRuleEngine([
+            ConsoleRule('short', 'error'),
+            ConsoleRule('long', 'fatal error'),
+        ])
+
+        assert {r.name for r in engine.match("FATAL ERROR occurred")} == {'short', 'long'}
+
+    def test_rule_without_literals_always_checked(self):
+        """测试无法推导字面量的规则每行都检查，且不能在原始帧上预筛"""
+        engine = ConsoleRuleEngine([ConsoleRule('digits', r'\d{5,}')])
+
+        assert engine.wants(console_frame("anything")) is True
+        assert [r.name for r in engine.match("code 123456")] == ['digits']
+
+    def test_raw_frame_prefilter(self):
+        """测试在原始帧上预筛"""
+        engine = ConsoleRuleEngine(DEFAULT_CONSOLE_RULES)
+
+        assert engine.wants(console_frame("tick 42")) is False
+        assert engine.wants(console_frame("java.lang.OutOfMemoryError: out of memory")) is True
+
+    def test_raw_prefilter_with_many_literals(self):
+        """测试字面量较多时改用合并的正则预筛，结果与逐个查找一致"""
+        words = [f"marker{i}" for i in range(ConsoleRuleEngine.INLINE_LITERALS + 4)]
+        engine = ConsoleRuleEngine([ConsoleRule(word, word) for word in words])
+
+        assert engine.wants(console_frame("tick 42")) is False
+        assert engine.wants(console_frame(f"got {words[-1].upper()} here")) is True
+
+    def test_trie_pattern(self):
+        """测试字面量合并为前缀树正则"""
+        assert _literal_trie_pattern(['oom', 'out']) == 'o(?:om|ut)'
+        assert _literal_trie_pattern(['panic', 'pan']) == 'pan'
+
+    def test_load_rules_file(self, tmp_path):
+        """测试从文件加载规则"""
+        path = tmp_path / "rules.json"
+        path.write_text(json.dumps([
+            {"name": "crash", "pattern": "segfault", "action": "restart", "cooldown": 60}
+        ]))
+
+        rules = load_console_rules(str(path))
+
+        assert rules[0].name == 'crash'
+        assert rules[0].action == 'restart'
+
+    def test_load_rules_file_invalid_action(self, tmp_path):
+        """测试无效动作被拒绝"""
+        path = tmp_path / "rules.json"
+        path.write_text(json.dumps([{"name": "x", "pattern": "x", "action": "explode"}]))
+
+        with pytest.raises(ValueError):
+            load_console_rules(str(path))
+
+class TestConsoleRuleActions:
+    """规则动作测试"""
+
+    @pytest.fixture
+    def monitor(self, tmp_path):
+        path = tmp_path / "rules.json"
+        path.write_text(json.dumps([
+            {"name": "oom", "pattern": "out of memory", "action": "notify", "cooldown": 300},
+            {"name": "crash", "pattern": "segfault", "action": "restart", "cooldown": 0},
+            {"name": "gc", "pattern": "GC pause", "action": "metric"},
+        ]))
+        monitor = VPSMonitor(VPSConfig(console_rules_file=str(path)))
+        monitor.send_dingtalk_message = AsyncMock()
+        monitor.send_command = AsyncMock(return_value=True)
+        return monitor
+
+    @pytest.mark.asyncio
+    async def test_notify_with_cooldown(self, monitor):
+        """测试通知动作受冷却时间限制"""
+        for _ in range(3):
+            await monitor.handle_websocket_message(console_frame("java: out of memory"))
+
+        monitor.send_dingtalk_message.assert_called_once()
+        assert monitor.rule_counters['oom'] == 3
+
+    @pytest.mark.asyncio
+    async def test_restart_action(self, monitor):
+        """测试重启动作"""
+        await monitor.handle_websocket_message(console_frame("Segfault in worker"))
+
+        monitor.send_command.assert_called_once_with({"event": "set state", "args": ["restart"]})
+
+    @pytest.mark.asyncio
+    async def test_metric_action(self, monitor):
+        """测试计数动作"""
+        await monitor.handle_websocket_message(console_frame("GC pause 120ms"))
+        await monitor.handle_websocket_message(console_frame("GC pause 80ms"))
+
+        assert monitor.rule_counters['gc'] == 2
+        monitor.send_dingtalk_message.assert_not_called()
+        monitor.send_command.assert_not_called()
+
+    def test_invalid_rules_file_falls_back(self, tmp_path):
+        """测试规则文件无效时使用内置规则"""
+        monitor = VPSMonitor(VPSConfig(console_rules_file=str(tmp_path / "missing.json")))
+
+        assert [r.name for r in monitor.rule_engine.rules] == [r.name for r in DEFAULT_CONSOLE_RULES]
+
+    @pytest.mark.asyncio
+    async def test_empty_rules_file_skips_rule_engine(self, tmp_path):
+        """测试规则文件为空时控制台行不经过限流和规则匹配"""
+        path = tmp_path / "rules.json"
+        path.write_text("[]")
+        monitor = VPSMonitor(VPSConfig(console_rules_file=str(path)))
+
+        await monitor.handle_websocket_message(console_frame("java: out of memory"))
+
+        assert monitor.flood_control.counters['passed'] == 0
+        assert monitor.rule_engine.counters['lines'] == 0
+        assert monitor.get_console_lines(1)[0][1] == "java: out of memory"
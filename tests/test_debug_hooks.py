@@ -0,0 +1,71 @@
+import pytest
+import asyncio
+import os
+import time
+from aiohttp.test_utils import TestClient, TestServer
+from vps_monitor import VPSMonitor, VPSConfig, ControlServer, SamplingProfiler, dump_asyncio_tasks
+
+def busy_spin(seconds: float):
+    """在事件循环线程中占用CPU"""
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        sum(range(100))
+
+async def stuck_in_read(event: asyncio.Event):
+    await wait_for_frames(event)
+
+async def wait_for_frames(event: asyncio.Event):
+    await event.wait()
+
+class TestDebugHooks:
+    """任务快照和采样分析测试"""
+
+    @pytest.mark.asyncio
+    async def test_task_dump_shows_await_chain(self):
+        """测试任务快照列出每层协程和最内层等待的对象"""
+        event = asyncio.Event()
+        task = asyncio.create_task(stuck_in_read(event), name="stuck-monitor")
+        await asyncio.sleep(0)
+        try:
+            dump = dump_asyncio_tasks()
+            section = dump[dump.index("任务 stuck-monitor"):]
+            assert "stuck_in_read" in section.splitlines()[0]
+            assert "in wait_for_frames" in section
+            assert "Future pending" in section.splitlines()[0]
+        finally:
+            event.set()
+            await task
+
+    @pytest.mark.asyncio
+    async def test_profile_written_in_folded_format(self, tmp_path):
+        """测试采样结果为折叠栈格式并写入文件"""
+        profiler = SamplingProfiler(str(tmp_path), interval=0.002)
+        task = asyncio.create_task(profiler.profile(0.3))
+        await asyncio.sleep(0.02)
+        busy_spin(0.25)
+        path, text = await task
+
+        assert os.path.dirname(path) == str(tmp_path) and path.endswith('.folded')
+        with open(path, encoding='utf-8') as f:
+            assert f.read() == text
+        hot = [line for line in text.splitlines() if 'busy_spin' in line]
+        assert hot and hot[0].startswith('MainThread;')
+        assert all(line.rsplit(' ', 1)[1].isdigit() for line in text.splitlines())
+
+    @pytest.mark.asyncio
+    async def test_control_endpoints(self, tmp_path):
+        """测试 /debug/tasks 和 /debug/profile，并发采样返回409"""
+        monitor = VPSMonitor(VPSConfig(panel_url="https://test.panel.com", server_uuid="srv-1"))
+        server = ControlServer({"srv-1": monitor}, profiler=SamplingProfiler(str(tmp_path)))
+        async with TestClient(TestServer(server.app)) as client:
+            response = await client.get('/debug/tasks')
+            assert response.status == 200
+            assert "个任务" in await response.text()
+
+            first = asyncio.ensure_future(client.get('/debug/profile', params={'seconds': '0.3'}))
+            await asyncio.sleep(0.1)
+            second = await client.get('/debug/profile', params={'seconds': '0.1'})
+            assert second.status == 409
+            response = await first
+            assert response.status == 200
+            assert os.path.exists(response.headers['X-Profile-Path'])
@@ -0,0 +1,72 @@
+import pytest
+import asyncio
+from unittest.mock import AsyncMock
+from vps_monitor import VPSMonitor, VPSConfig, peek_event_name
+
+class TestDispatch:
+    """事件分发注册表测试"""
+
+    @pytest.fixture
+    def monitor(self):
+        """测试监控器"""
+        return VPSMonitor(VPSConfig(panel_url="https://test.panel.com"))
+
+    def test_peek_event_name(self):
+        """测试快速预读事件名"""
+        assert peek_event_name('{"event": "status", "args": ["running"]}') == 'status'
+        assert peek_event_name('{"event":"console output","args":["x"]}') == 'console output'
+        assert peek_event_name('{"args": ["{\\"event\\": \\"fake\\"}"], "event": "stats"}') == 'stats'
+        assert peek_event_name('invalid json string') is None
+        assert peek_event_name(b'{"event": "status"}') is None
+        # 事件名含转义字符时交给正则判断，无法确定就返回None
+        assert peek_event_name('{"event": "a\\"b", "args": []}') is None
+        assert peek_event_name('{"event": "unterminated') is None
+
+    @pytest.mark.asyncio
+    async def test_unhandled_event_skips_decode(self, monitor):
+        """测试无处理器的事件不解码"""
+        await monitor.handle_websocket_message('{"event": "install output", "args": ["Installing..."]}')
+
+        assert monitor.dispatch_counters['skipped'] == 1
+        assert monitor.dispatch_counters['decoded'] == 0
+
+    @pytest.mark.asyncio
+    async def test_console_prefilter_skips_plain_output(self, monitor):
+        """测试普通控制台输出被预过滤器跳过"""
+        await monitor.handle_websocket_message('{"event": "console output", "args": ["tick"]}')
+
+        assert monitor.dispatch_counters['skipped'] == 1
+        assert monitor.sshx_link is None
+
+    @pytest.mark.asyncio
+    async def test_register_custom_handler(self, monitor):
+        """测试订阅自定义事件"""
+        handler = AsyncMock()
+        monitor.register_handler('install output', handler)
+
+        await monitor.handle_websocket_message('{"event": "install output", "args": ["Installing..."]}')
+        handler.assert_called_once()
+        assert handler.call_args[0][0].args == ["Installing..."]
+
+        monitor.unregister_handler('install output', handler)
+        await monitor.handle_websocket_message('{"event": "install output", "args": ["Installing..."]}')
+        assert handler.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_multiple_handlers_same_event(self, monitor):
+        """测试同一事件的多个处理器按注册顺序执行"""
+        calls = []
+
+        async def first(msg):
+            calls.append(('first', msg.state))
+
+        async def second(msg):
+            calls.append(('second', msg.state))
+
+        monitor.register_handler('status', first)
+        monitor.register_handler('status', second)
+
+        await monitor.handle_websocket_message('{"event": "status", "args": ["running"]}')
+
+        assert monitor.current_status == 'running'
+        assert calls == [('first', 'running'), ('second', 'running')]
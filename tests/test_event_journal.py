@@ -0,0 +1,141 @@
+import pytest
+import json
+import os
+from unittest.mock import AsyncMock
+from vps_monitor import VPSMonitor, VPSConfig, EventJournal, VirtualClock
+
+class TestEventJournal:
+    """状态/电源事件日志测试"""
+
+    @pytest.fixture
+    def journal(self, tmp_path):
+        journal = EventJournal(str(tmp_path / "srv.jsonl"), checkpoint_every=4)
+        yield journal
+        journal.close()
+
+    def test_timestamps_from_injected_clock(self, tmp_path):
+        """测试未传入时间戳时记录和查询都读取注入的时钟"""
+        clock = VirtualClock(start=1000.0)
+        journal = EventJournal(str(tmp_path / "clock.jsonl"), clock=clock)
+        try:
+            journal.record_status('running')
+            clock.now += 300
+            journal.record_status('offline')
+            clock.now += 100
+
+            result = journal.availability(1000.0)
+            assert result['uptime'] == 300.0
+            assert result['downtime'] == 100.0
+        finally:
+            journal.close()
+
+    def test_availability_and_flaps(self, journal):
+        """测试可用率、离线时长和掉线次数"""
+        journal.record_status('running', 0.0)
+        journal.record_status('offline', 100.0)
+        journal.record_power('start', True, 101.0)
+        journal.record_status('starting', 110.0)
+        journal.record_status('running', 120.0)
+        journal.record_status('stopping', 300.0)
+        journal.record_status('offline', 310.0)
+
+        result = journal.availability(0.0, 400.0)
+        assert result['uptime'] == 280.0
+        assert result['downtime'] == 10.0 + 90.0
+        assert result['flaps'] == 2
+        assert result['availability'] == pytest.approx(280.0 / 380.0)
+
+        window = journal.availability(50.0, 150.0)
+        assert window['uptime'] == 50.0 + 30.0
+        assert window['downtime'] == 10.0
+        assert window['flaps'] == 1
+
+    def test_query_uses_checkpoints(self, journal, monkeypatch):
+        """测试查询从检查点开始，只重放少量记录"""
+        for i in range(100):
+            journal.record_status('running' if i % 2 == 0 else 'offline', float(i * 10))
+
+        replayed = []
+        real = EventJournal._apply
+        monkeypatch.setattr(EventJournal, '_apply',
+                            classmethod(lambda cls, totals, record: replayed.append(1) or real(totals, record)))
+        result = journal.availability(500.0, 900.0)
+
+        assert result == {'availability': 0.5, 'uptime': 200.0, 'downtime': 200.0, 'flaps': 20}
+        assert len(replayed) <= 2 * journal.checkpoint_every
+
+    def test_reopen_restores_totals(self, tmp_path):
+        """测试重新打开后继续累计，且监控器停止期间不计入"""
+        path = str(tmp_path / "srv.jsonl")
+        journal = EventJournal(path, checkpoint_every=3)
+        journal.record_status('running', 0.0)
+        journal.record_monitor('stop', 50.0)
+        journal.close()
+        with open(path, 'ab') as f:
+            f.write(b'{"t": 60.0, "type": "sta')
+
+        journal = EventJournal(path, checkpoint_every=3)
+        assert journal.state == 'unknown'
+        journal.record_monitor('start', 1000.0)
+        journal.record_status('running', 1000.0)
+        journal.record_status('offline', 1100.0)
+
+        result = journal.availability(0.0, 1200.0)
+        journal.close()
+        assert result['uptime'] == 150.0
+        assert result['downtime'] == 100.0
+        assert result['flaps'] == 1
+
+    def test_checkpoint_on_non_status_record(self, tmp_path):
+        """测试检查点落在电源操作记录上时，查询和重新打开后的累计值与完整扫描一致"""
+        records = [('status', 'running', 0.0), ('power', 'restart', 100.0), ('status', 'offline', 200.0),
+                   ('monitor', 'stop', 250.0), ('monitor', 'start', 400.0), ('status', 'running', 400.0),
+                   ('power', 'stop', 450.0), ('power', 'start', 470.0), ('status', 'offline', 500.0)]
+
+        def write(journal):
+            for kind, value, timestamp in records:
+                if kind == 'status':
+                    journal.record_status(value, timestamp)
+                elif kind == 'power':
+                    journal.record_power(value, True, timestamp)
+                else:
+                    journal.record_monitor(value, timestamp)
+
+        windows = [(0.0, 300.0), (50.0, 150.0), (150.0, 460.0), (0.0, 600.0)]
+        full = EventJournal(str(tmp_path / "full.jsonl"), checkpoint_every=1000)
+        write(full)
+        expected = [full.availability(start, end) for start, end in windows]
+        full.close()
+        assert expected[0]['uptime'] == 200.0
+
+        path = str(tmp_path / "srv.jsonl")
+        journal = EventJournal(path, checkpoint_every=2)
+        write(journal)
+        assert [journal.availability(start, end) for start, end in windows] == expected
+        journal.close()
+
+        journal = EventJournal(path, checkpoint_every=2)
+        assert [journal.availability(start, end) for start, end in windows] == expected
+        assert (journal.uptime, journal.downtime) == (full.uptime, full.downtime)
+        journal.close()
+
+class TestMonitorJournal:
+    """监控器写入事件日志测试"""
+
+    @pytest.mark.asyncio
+    async def test_status_and_power_recorded(self, tmp_path):
+        """测试状态变化和电源命令写入日志"""
+        config = VPSConfig(panel_url="https://test.panel.com", server_uuid="srv-1",
+                           event_journal_dir=str(tmp_path))
+        monitor = VPSMonitor(config)
+        monitor.send_command = AsyncMock(return_value=True)
+
+        await monitor.handle_websocket_message('{"event": "status", "args": ["running"]}')
+        await monitor.handle_websocket_message('{"event": "status", "args": ["offline"]}')
+        assert monitor.get_availability(0.0)['flaps'] == 1
+        await monitor.close()
+
+        with open(os.path.join(str(tmp_path), "srv-1.jsonl")) as f:
+            records = [json.loads(line) for line in f]
+        assert [r['type'] for r in records] == ['status', 'status', 'power', 'monitor']
+        assert records[2]['action'] == 'start' and records[2]['ok'] is True
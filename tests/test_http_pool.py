@@ -0,0 +1,78 @@
+import pytest
+import asyncio
+import aiohttp
+from types import SimpleNamespace
+from aiohttp.test_utils import TestClient, TestServer
+from mock_panel import MockPanel
+from vps_monitor import VPSMonitor, VPSConfig, ControlServer, HTTPPool
+
+class TestHTTPPool:
+    """共享HTTP连接池测试"""
+
+    @pytest.mark.asyncio
+    async def test_monitors_share_connector(self):
+        """测试监控器共用同一个连接器，最后一个关闭时才释放"""
+        config = VPSConfig(panel_url="https://test.panel.com", http_pool_per_host=7)
+        first, second = VPSMonitor(config), VPSMonitor(config)
+        await first.start_session()
+        await second.start_session()
+        connector = first.session.connector
+        assert second.session.connector is connector
+        assert first.http_pool is HTTPPool.for_config(config)
+        assert connector.limit_per_host == 7
+
+        await first.close()
+        assert not connector.closed
+        await second.close()
+        assert connector.closed
+
+    @pytest.mark.asyncio
+    async def test_reconnect_storm_reuses_connections(self):
+        """测试多台服务器同时请求面板时排队复用已建立的连接，并导出连接池指标"""
+        panel = MockPanel(servers=8)
+        await panel.start()
+        monitors = [VPSMonitor(VPSConfig(**panel.monitor_env(uuid), http_pool_per_host=2))
+                    for uuid in panel.servers]
+        try:
+            for monitor in monitors:
+                await monitor.start_session()
+            pool = monitors[0].http_pool
+            for _ in range(2):
+                assert all(await asyncio.gather(*(monitor.get_csrf_token() for monitor in monitors)))
+
+            assert pool.counters['connections_opened'] <= 2
+            assert pool.counters['connections_reused'] >= 4 * len(monitors) - 2
+            assert pool.counters['queued'] > 0
+
+            server = ControlServer({monitor.config.server_uuid: monitor for monitor in monitors})
+            async with TestClient(TestServer(server.app)) as client:
+                text = await (await client.get('/metrics')).text()
+            assert text.count('vps_monitor_http_pool_connections_opened ') == 1
+            assert 'vps_monitor_http_pool_idle 2\n' in text
+        finally:
+            for monitor in monitors:
+                await monitor.close()
+            await panel.stop()
+
+    def test_metrics_without_connector_internals(self):
+        """测试连接器缺少内部属性或类型变化时指标按0统计，不抛异常"""
+        pool = HTTPPool(limit=10)
+        assert pool.metrics()['http_pool_in_use'] == 0
+
+        pool.connector = SimpleNamespace(closed=False, _acquired=None, _conns=[1, 2], _waiters={'a': 1})
+        metrics = pool.metrics()
+        assert metrics['http_pool_in_use'] == 0
+        assert metrics['http_pool_idle'] == 2
+        assert metrics['http_pool_waiting'] == 0
+
+    @pytest.mark.skipif(aiohttp.__version__ != "3.9.1", reason="只针对requirements.txt锁定的aiohttp版本")
+    @pytest.mark.asyncio
+    async def test_connector_internals_on_pinned_aiohttp(self):
+        """测试锁定版本的aiohttp连接器仍有指标读取的内部属性，升级aiohttp时提示核对"""
+        connector = aiohttp.TCPConnector()
+        try:
+            assert isinstance(connector._acquired, set)
+            assert isinstance(connector._conns, dict)
+            assert isinstance(connector._waiters, dict)
+        finally:
+            await connector.close()
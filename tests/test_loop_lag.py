@@ -0,0 +1,71 @@
+import pytest
+import asyncio
+import threading
+import time
+from unittest.mock import patch, MagicMock
+from vps_monitor import VPSMonitor, VPSConfig, LoopLagMonitor, format_prometheus
+
+def blocking_call(seconds: float):
+    """模拟在事件循环中调用的同步阻塞函数"""
+    time.sleep(seconds)
+
+class TestLoopLagMonitor:
+    """事件循环延迟监控测试"""
+
+    def test_histogram_is_cumulative(self):
+        """测试直方图按Prometheus格式累计"""
+        monitor = LoopLagMonitor(buckets=(0.01, 0.1, 1.0))
+        for lag in (0.001, 0.01, 0.05, 0.5, 3.0):
+            monitor.observe(lag)
+
+        metrics = monitor.metrics()
+        assert metrics['loop_lag_seconds_bucket{le="0.01"}'] == 2
+        assert metrics['loop_lag_seconds_bucket{le="0.1"}'] == 3
+        assert metrics['loop_lag_seconds_bucket{le="1.0"}'] == 4
+        assert metrics['loop_lag_seconds_bucket{le="+Inf"}'] == 5
+        assert metrics['loop_lag_seconds_count'] == 5
+        assert metrics['loop_lag_max_seconds'] == 3.0
+        text = format_prometheus(metrics, {})
+        assert 'vps_monitor_loop_lag_seconds_bucket{le="0.1"} 3\n' in text
+        assert 'vps_monitor_loop_lag_seconds_count 5\n' in text
+
+    @pytest.mark.asyncio
+    async def test_blocking_call_is_reported_with_stack(self):
+        """测试短阻塞触发延迟告警，长阻塞由看门狗打印调用栈，且都能指出阻塞函数"""
+        monitor = LoopLagMonitor(interval=0.02, warn_threshold=0.05, stall_threshold=0.3)
+        task = asyncio.create_task(monitor.run())
+        try:
+            await asyncio.sleep(0.1)
+            blocking_call(0.15)
+            await asyncio.sleep(0.1)
+            assert monitor.counters['warnings'] >= 1
+            assert monitor.counters['stalls'] == 0
+            assert 'blocking_call' in monitor.last_stack
+
+            monitor.last_stack = None
+            blocking_call(0.5)
+            await asyncio.sleep(0.1)
+            assert monitor.counters['stalls'] == 1
+            assert 'blocking_call' in monitor.last_stack
+            assert monitor.max_lag >= 0.4
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+class TestDingtalkOffLoop:
+    """钉钉通知不阻塞事件循环"""
+
+    @pytest.mark.asyncio
+    async def test_webhook_runs_in_thread(self):
+        """测试同步的requests.post在线程中执行"""
+        monitor = VPSMonitor(VPSConfig(panel_url="https://test.panel.com",
+                                       dingtalk_webhook_url="https://oapi.dingtalk.com/robot/send"))
+        threads = []
+
+        def post(*args, **kwargs):
+            threads.append(threading.current_thread())
+            return MagicMock(status_code=200, json=lambda: {'errcode': 0})
+
+        with patch('vps_monitor.requests.post', side_effect=post):
+            await monitor.send_dingtalk_message("测试")
+        assert threads and threads[0] is not threading.main_thread()
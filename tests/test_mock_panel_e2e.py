@@ -0,0 +1,74 @@
+import pytest
+import asyncio
+import time
+from mock_panel import MockPanel, Faults
+from vps_monitor import VPSMonitor, VPSConfig
+
+async def wait_for(condition, timeout: float = 10.0):
+    """轮询等待条件成立"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("等待超时")
+        await asyncio.sleep(0.05)
+
+class TestMockPanelEndToEnd:
+    """真实监控器对接本地模拟面板/Wings的端到端测试"""
+
+    async def start_panel(self) -> MockPanel:
+        panel = MockPanel(servers=2, faults=Faults(start_delay=0.2, console_rate=20, stats_interval=0.2))
+        await panel.start()
+        return panel
+
+    async def run_monitor(self, panel: MockPanel, uuid: str):
+        config = VPSConfig(**panel.monitor_env(uuid), check_interval=1)
+        monitor = VPSMonitor(config)
+        await monitor.start_session()
+        task = asyncio.create_task(monitor.start())
+        return monitor, task
+
+    async def shutdown(self, panel: MockPanel, monitor: VPSMonitor, task: asyncio.Task):
+        monitor.stop()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await monitor.close()
+        await panel.stop()
+
+    @pytest.mark.asyncio
+    async def test_login_connect_and_restart_crashed_server(self):
+        """测试登录（含一次419）、连接认证、接收数据，以及服务器崩溃后自动拉起"""
+        panel = await self.start_panel()
+        panel.faults.login_419 = 1
+        uuid = next(iter(panel.servers))
+        monitor, task = await self.run_monitor(panel, uuid)
+        try:
+            await wait_for(lambda: monitor.current_status == 'running')
+            await wait_for(lambda: len(monitor.stats_store.tiers['raw']) >= 2)
+            await wait_for(lambda: len(monitor.console_buffer) >= 5)
+            assert panel.counters['login_419'] == 1
+            assert panel.counters['auths'] == 1
+
+            await panel.crash(uuid)
+            await wait_for(lambda: panel.servers[uuid].power_commands == ['start'])
+            await wait_for(lambda: monitor.current_status == 'running')
+            await wait_for(lambda: monitor.sshx_link is not None)
+            assert panel.start_latencies[0] < 5
+            # 另一台服务器不受影响
+            assert panel.servers[list(panel.servers)[1]].power_commands == []
+        finally:
+            await self.shutdown(panel, monitor, task)
+
+    @pytest.mark.asyncio
+    async def test_token_expiring_reauthenticates(self):
+        """测试token即将过期时在同一连接上重新认证"""
+        panel = await self.start_panel()
+        panel.faults.token_ttl = 3.0
+        panel.faults.token_warning = 2.5
+        uuid = next(iter(panel.servers))
+        monitor, task = await self.run_monitor(panel, uuid)
+        try:
+            await wait_for(lambda: panel.counters['auths'] >= 2)
+            assert panel.counters['ws_connections'] == 1
+            assert monitor.token_expires_at > time.time()
+        finally:
+            await self.shutdown(panel, monitor, task)
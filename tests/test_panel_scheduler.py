@@ -0,0 +1,77 @@
+import pytest
+import asyncio
+from unittest.mock import Mock
+from mock_panel import MockPanel, Faults
+from vps_monitor import (VPSMonitor, VPSConfig, VirtualClock, PanelRequestScheduler,
+                         PANEL_PRIORITY_CRITICAL, PANEL_PRIORITY_BACKGROUND, format_prometheus)
+
+class TestPanelRequestScheduler:
+    """面板请求调度测试"""
+
+    @pytest.mark.asyncio
+    async def test_critical_requests_jump_the_queue(self):
+        """测试令牌不足时恢复路径的请求先于后台请求放行，并统计排队时间"""
+        scheduler = PanelRequestScheduler(rate=20, burst=1)
+        await scheduler.acquire()
+        order = []
+
+        async def request(name: str, priority: int):
+            await scheduler.acquire(priority)
+            order.append(name)
+
+        await asyncio.gather(request('refresh-1', PANEL_PRIORITY_BACKGROUND),
+                             request('refresh-2', PANEL_PRIORITY_BACKGROUND),
+                             request('reconnect', PANEL_PRIORITY_CRITICAL))
+        assert order == ['reconnect', 'refresh-1', 'refresh-2']
+
+        metrics = scheduler.metrics()
+        assert metrics['panel_queued'] == 3
+        assert metrics['panel_queue_seconds_count{priority="background"}'] == 2
+        assert metrics['panel_queue_max_seconds{priority="background"}'] >= 0.1
+        assert 'vps_monitor_panel_queue_seconds_sum{priority="critical"}' in format_prometheus(metrics, {})
+
+    def test_rate_limit_headers(self):
+        """测试限流头收紧速率和剩余额度，429按Retry-After暂停，无法解析的头被忽略"""
+        clock = VirtualClock()
+        scheduler = PanelRequestScheduler(rate=10, burst=20, window=60, clock=clock)
+        scheduler.observe(200, Mock())
+        assert scheduler.bucket.rate == 10
+
+        scheduler.observe(200, {'X-RateLimit-Limit': '120', 'X-RateLimit-Remaining': '3'})
+        assert scheduler.bucket.rate == 2
+        assert scheduler.bucket.tokens == 3
+
+        scheduler.observe(429, {'Retry-After': '5'})
+        assert scheduler.counters['rate_limited'] == 1
+        assert not scheduler._try_take(clock.monotonic() + 4.9)
+        assert scheduler._try_take(clock.monotonic() + 5)
+
+        scheduler.observe(429, {'X-RateLimit-Reset': str(int(clock.time()) + 30)})
+        assert not scheduler._try_take(clock.monotonic() + 29)
+
+    @pytest.mark.asyncio
+    async def test_monitors_share_limit_against_panel(self):
+        """测试多台服务器共用调度器：面板返回429时排队重试，全部登录并取得token"""
+        panel = MockPanel(servers=4, faults=Faults(rate_limit=6, rate_window=0.5))
+        await panel.start()
+        monitors = [VPSMonitor(VPSConfig(**panel.monitor_env(uuid), panel_rate_limit=100,
+                                         panel_rate_window=0.5, panel_rate_retries=5))
+                    for uuid in panel.servers]
+        try:
+            scheduler = monitors[0].scheduler
+            assert all(monitor.scheduler is scheduler for monitor in monitors)
+            for monitor in monitors:
+                await monitor.start_session()
+            assert all(await asyncio.gather(*(monitor._login() for monitor in monitors)))
+            tokens = await asyncio.gather(*(monitor.get_websocket_token() for monitor in monitors))
+            assert all(tokens)
+
+            assert scheduler.bucket.rate == pytest.approx(12)
+            assert scheduler.counters['rate_limited'] == panel.counters['http_429']
+            assert scheduler.counters['queued'] > 0
+            assert scheduler.counters['retried'] == scheduler.counters['rate_limited']
+            assert scheduler.counters['requests'] == 4 * 4 + scheduler.counters['retried']
+        finally:
+            for monitor in monitors:
+                await monitor.close()
+            await panel.stop()
@@ -0,0 +1,64 @@
+import pytest
+from unittest.mock import AsyncMock
+from vps_monitor import VPSMonitor, VPSConfig, RequestGovernor, VirtualClock
+
+class TestRequestGovernor:
+    """send logs/send stats应答限流测试"""
+
+    def test_echo_of_own_request_suppressed(self):
+        """测试自身请求的回显被抑制"""
+        governor = RequestGovernor(min_interval=5, echo_window=2)
+        governor.note_request('send logs', now=100.0)
+
+        assert governor.allow_reply('send logs', now=101.0) is False
+        assert governor.dropped['echo'] == 1
+        assert governor.allow_reply('send logs', now=103.0) is True
+
+    def test_replies_rate_limited(self):
+        """测试应答频率限制"""
+        governor = RequestGovernor(min_interval=5, echo_window=2)
+
+        assert governor.allow_reply('send stats', now=0.0) is True
+        assert governor.allow_reply('send stats', now=1.0) is False
+        assert governor.allow_reply('send stats', now=4.9) is False
+        assert governor.allow_reply('send stats', now=5.0) is True
+        assert governor.dropped['rate_limited'] == 2
+
+    def test_events_limited_independently(self):
+        """测试不同事件独立限流"""
+        governor = RequestGovernor(min_interval=5, echo_window=2)
+
+        assert governor.allow_reply('send stats', now=0.0) is True
+        assert governor.allow_reply('send logs', now=0.0) is True
+
+    def test_defaults_to_injected_clock(self):
+        """测试未传入时间时读取注入的时钟"""
+        clock = VirtualClock()
+        governor = RequestGovernor(min_interval=5, echo_window=2, clock=clock)
+        governor.note_request('send logs')
+
+        assert governor.allow_reply('send logs') is False
+        clock.now += 2
+        assert governor.allow_reply('send logs') is True
+        assert governor.allow_reply('send logs') is False
+        clock.now += 5
+        assert governor.allow_reply('send logs') is True
+
+        monitor = VPSMonitor(VPSConfig(), clock=clock)
+        assert monitor.governor.clock is clock
+        assert monitor.flood_control.bucket.clock is clock
+
+    @pytest.mark.asyncio
+    async def test_ping_pong_storm_bounded(self):
+        """测试对端连续发送请求时应答数量有界"""
+        monitor = VPSMonitor(VPSConfig(reply_min_interval=60, echo_window=2))
+        monitor.send_command = AsyncMock(return_value=True)
+
+        await monitor.request_logs_and_stats()
+        for _ in range(50):
+            await monitor.handle_websocket_message('{"event": "send logs"}')
+            await monitor.handle_websocket_message('{"event": "send stats"}')
+
+        # 只有认证后的两次主动请求，回显全部被抑制
+        assert monitor.send_command.call_count == 2
+        assert monitor.governor.dropped['echo'] == 100
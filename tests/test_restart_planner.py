@@ -0,0 +1,103 @@
+import pytest
+import time
+from unittest.mock import AsyncMock
+from vps_monitor import (VPSMonitor, VPSConfig, RestartPlanner, parse_maintenance_window,
+                         next_window_start)
+
+MB = 1024 ** 2
+
+def local_ts(hour: int, minute: int = 0, day: int = 15) -> float:
+    """2024-05-<day> 本地时间"""
+    return time.mktime((2024, 5, day, hour, minute, 0, 0, 0, -1))
+
+def growth(now: float, start_mb: float, mb_per_min: float, minutes: int = 60):
+    """过去minutes分钟每分钟一个点的线性增长序列"""
+    return [(now - (minutes - i) * 60, (start_mb + mb_per_min * i) * MB) for i in range(minutes + 1)]
+
+class TestMaintenanceWindow:
+    """维护窗口测试"""
+
+    def test_parse(self):
+        """测试解析和格式错误"""
+        assert parse_maintenance_window("03:00-05:30") == (180, 330)
+        assert parse_maintenance_window("23:00-01:00") == (1380, 60)
+        with pytest.raises(ValueError):
+            parse_maintenance_window("3am-5am")
+
+    def test_next_window_start(self):
+        """测试下一次窗口开始时间，含跨午夜窗口"""
+        window = (180, 300)
+        assert next_window_start(local_ts(1), window) == local_ts(3)
+        assert next_window_start(local_ts(4), window) == local_ts(4)
+        assert next_window_start(local_ts(6), window) == local_ts(3, day=16)
+        assert next_window_start(local_ts(0, 30), (1380, 60)) == local_ts(0, 30)
+        assert next_window_start(local_ts(22), (1380, 60)) == local_ts(23)
+
+class TestRestartPlanner:
+    """预防性重启计划测试"""
+
+    @pytest.fixture
+    def planner(self):
+        return RestartPlanner((180, 300), horizon=86400, margin=900, oom_ratio=1.0)
+
+    def test_restart_in_window_before_oom(self, planner):
+        """测试预计OOM晚于维护窗口时安排在窗口开始"""
+        now = local_ts(22)
+        # 2000MB起每分钟+1MB，4096MB上限约35小时后才会OOM，超出预测范围
+        assert planner.plan(now, growth(now, 2000, 1), 4096 * MB) is None
+        # 每分钟+3MB：约11小时后OOM，次日03:00窗口来得及
+        plan = planner.plan(now, growth(now, 2000, 3), 4096 * MB)
+        assert plan.at == local_ts(3, day=16)
+        assert plan.reason == "维护窗口"
+
+    def test_restart_before_oom_when_window_too_late(self, planner):
+        """测试窗口来不及时在OOM前重启"""
+        now = local_ts(22)
+        plan = planner.plan(now, growth(now, 3000, 10), 4096 * MB)
+        assert plan.reason == "OOM前"
+        assert plan.at == pytest.approx(plan.oom_at - 900)
+        assert now < plan.at < local_ts(3, day=16)
+
+    def test_no_plan_for_flat_or_noisy_memory(self, planner):
+        """测试平稳或无规律波动的内存不安排重启"""
+        now = local_ts(22)
+        flat = [(now - i * 60, 2000 * MB) for i in range(60)]
+        noisy = [(now - i * 60, (2000 + (i * 37) % 500) * MB) for i in range(60)]
+        assert planner.plan(now, flat, 4096 * MB) is None
+        assert planner.plan(now, noisy, 4096 * MB) is None
+        assert planner.plan(now, growth(now, 2000, 50)[:5], 4096 * MB) is None
+
+class TestPredictiveRestart:
+    """预防性重启执行测试"""
+
+    @pytest.mark.asyncio
+    async def test_plan_executes_restart_once(self):
+        """测试到达计划时间后通过WebSocket重启一次"""
+        config = VPSConfig(panel_url="https://test.panel.com", predictive_restart=True,
+                           maintenance_window="00:00-24:00", predict_oom_ratio=1.0)
+        monitor = VPSMonitor(config)
+        monitor.restart_server = AsyncMock(return_value=True)
+        monitor.send_dingtalk_message = AsyncMock()
+
+        now = time.time()
+        for t, memory in growth(now - 60, 3000, 10, minutes=12):
+            monitor.stats_store.add(t, {'memory_bytes': memory, 'memory_limit_bytes': 4096.0 * MB})
+
+        await monitor._check_restart_plan(now)
+        assert monitor.restart_plan is not None
+        assert 'restart_planned_at' in monitor.get_metrics()
+
+        await monitor._check_restart_plan(monitor.restart_plan.at)
+        monitor.restart_server.assert_called_once()
+        assert monitor.restart_plan is None
+
+        # 重启前的数据不再参与拟合
+        await monitor._check_restart_plan(now + 120)
+        assert monitor.restart_plan is None
+        monitor.restart_server.assert_called_once()
+
+    def test_invalid_window_disables_planner(self):
+        """测试维护窗口配置错误时关闭预防性重启"""
+        config = VPSConfig(panel_url="https://test.panel.com", predictive_restart=True,
+                           maintenance_window="whenever")
+        assert VPSMonitor(config).restart_planner is None
@@ -0,0 +1,114 @@
+import pytest
+import json
+from unittest.mock import AsyncMock
+from vps_monitor import VPSMonitor, VPSConfig, VirtualClock, SSHXLinkExtractor
+
+LINK = "https://sshx.io/s/KNJlCbLcqZ#5KDXbWZGH3Ak1t"
+NEXT_LINE = "  ➜  Shell: /bin/bash (pid 42)"
+
+def console_frame(line):
+    return json.dumps({"event": "console output", "args": [line]})
+
+class TestSSHXLinkExtractor:
+    """增量SSHX链接提取测试"""
+
+    def test_link_in_single_frame(self):
+        """测试单帧中的链接：停在行尾时等下一行或flush确认后才报告"""
+        extractor = SSHXLinkExtractor()
+        assert extractor.feed(f"  ➜  Link: {LINK} (read-write)") == [LINK]
+
+        extractor = SSHXLinkExtractor()
+        assert extractor.feed(f"  ➜  Link: {LINK}") == []
+        assert extractor.held == LINK
+        assert extractor.flush() == [LINK]
+        assert not extractor.pending
+
+    def test_link_reported_once(self):
+        """测试同一链接只报告一次"""
+        extractor = SSHXLinkExtractor()
+        assert extractor.feed(LINK) == []
+        assert extractor.feed(f"again {LINK}") == [LINK]
+        assert extractor.flush() == []
+
+    @pytest.mark.parametrize("split", [5, 18, 22, 28, 29])
+    def test_link_split_across_frames(self, split):
+        """测试链接在前缀、会话名或#处被拆分到两帧"""
+        extractor = SSHXLinkExtractor()
+        line = f"Link: {LINK}"
+        cut = len("Link: ") + split
+
+        assert extractor.feed(line[:cut]) == []
+        assert extractor.pending
+        assert extractor.held is None
+        assert extractor.feed(line[cut:]) == []
+        assert extractor.held == LINK
+        assert extractor.feed(NEXT_LINE) == [LINK]
+        assert not extractor.pending
+
+    @pytest.mark.parametrize("word", ["Ready", "Done", "5KDX"])
+    def test_complete_link_not_joined_with_next_frame(self, word):
+        """测试行尾的完整链接在下一帧到达时报告，即使下一帧只有一个单词也不会拼进密钥"""
+        extractor = SSHXLinkExtractor()
+        assert extractor.feed("Link: https://sshx.io/s/abc#def") == []
+        assert extractor.feed(word) == ["https://sshx.io/s/abc#def"]
+        assert not extractor.pending
+
+    def test_fragment_dropped_when_not_continued(self):
+        """测试未被续接的片段不会污染后续帧"""
+        extractor = SSHXLinkExtractor()
+        extractor.feed("see https://sshx.io/s/abc")
+        assert extractor.feed(" and nothing else") == []
+        assert not extractor.pending
+
+    def test_wants_raw_frame(self):
+        """测试原始帧预判"""
+        extractor = SSHXLinkExtractor()
+        assert extractor.wants(console_frame("no link here")) is False
+        assert extractor.wants(console_frame(f"Link: {LINK}")) is True
+        assert extractor.wants(console_frame("Link: https://ss")) is True
+        assert extractor.wants(console_frame("ends with h")) is True
+        assert extractor.wants(console_frame("ends with hx")) is False
+
+    @pytest.mark.asyncio
+    async def test_label_on_previous_line(self):
+        """测试"Link:"标签和链接不在同一行"""
+        monitor = VPSMonitor(VPSConfig())
+        monitor.send_dingtalk_notification = AsyncMock()
+
+        await monitor.handle_websocket_message(console_frame("Link:"))
+        await monitor.handle_websocket_message(console_frame(f"    {LINK}"))
+        await monitor.handle_websocket_message(console_frame(NEXT_LINE))
+
+        assert monitor.sshx_link == LINK
+        monitor.send_dingtalk_notification.assert_called_once_with(LINK)
+
+    @pytest.mark.asyncio
+    async def test_one_word_frame_after_link_through_monitor(self):
+        """测试监控器收到链接帧后紧跟单个单词的帧时，通知的是原链接"""
+        monitor = VPSMonitor(VPSConfig())
+        monitor.send_dingtalk_notification = AsyncMock()
+
+        await monitor.handle_websocket_message(console_frame("Link: https://sshx.io/s/abc#def"))
+        await monitor.handle_websocket_message(console_frame("Done"))
+
+        assert monitor.sshx_link == "https://sshx.io/s/abc#def"
+        monitor.send_dingtalk_notification.assert_called_once_with("https://sshx.io/s/abc#def")
+        await monitor.close()
+
+    @pytest.mark.asyncio
+    async def test_split_link_through_monitor(self):
+        """测试监控器处理在#处被拆分的链接，没有后续输出时等待片刻后报告完整链接"""
+        clock = VirtualClock()
+        monitor = VPSMonitor(VPSConfig(), clock=clock)
+        monitor.send_dingtalk_notification = AsyncMock()
+
+        await monitor.handle_websocket_message(console_frame(f"Link: {LINK[:29]}"))
+        await clock.advance(SSHXLinkExtractor.HOLD_SECONDS / 2)
+        await monitor.handle_websocket_message(console_frame(LINK[29:]))
+        await clock.advance(SSHXLinkExtractor.HOLD_SECONDS / 2)
+        assert monitor.sshx_link is None
+
+        await clock.advance(SSHXLinkExtractor.HOLD_SECONDS)
+        assert monitor.sshx_link == LINK
+        monitor.send_dingtalk_notification.assert_called_once_with(LINK)
+        await monitor.close()
@@ -0,0 +1,94 @@
+import pytest
+import asyncio
+import gc
+import sys
+import tracemalloc
+from mock_panel import MockPanel
+from vps_monitor import (VPSMonitor, VPSConfig, ServerState, SharedAuth, PanelRequestScheduler,
+                         HTTPPool, reset_shared_state)
+
+# 一万台服务器的预算：默认配置下新建的监控器（含控制台和stats缓冲区）每台不超过64KB
+FOOTPRINT_BUDGET = 64 * 1024
+
+class TestStateRecords:
+    """紧凑状态记录测试"""
+
+    def test_records_are_slotted(self):
+        """测试状态记录没有实例字典，原有属性名仍可读写"""
+        monitor = VPSMonitor(VPSConfig(panel_url="https://test.panel.com"))
+        assert not hasattr(monitor.state, '__dict__')
+        assert not hasattr(monitor.auth, '__dict__')
+
+        monitor.current_status = 'running'
+        monitor.xsrf_token = 'token'
+        assert monitor.state.current_status == 'running'
+        assert monitor.auth.xsrf_token == 'token'
+        assert 'current_status' not in vars(monitor)
+        assert sys.getsizeof(ServerState()) < sys.getsizeof(dict.fromkeys(ServerState.__slots__))
+
+    def test_shared_auth_is_referenced(self):
+        """测试同一账号的服务器引用同一份登录状态"""
+        auth = SharedAuth.for_account("https://test.panel.com/", "admin")
+        assert SharedAuth.for_account("https://test.panel.com", "admin") is auth
+        assert SharedAuth.for_account("https://test.panel.com", "other") is not auth
+
+        monitors = [VPSMonitor(VPSConfig(panel_url="https://test.panel.com", username="admin",
+                                         server_uuid=f"srv-{i}")) for i in range(3)]
+        assert all(monitor.auth is auth for monitor in monitors)
+        monitors[0].session_cookie = 'session'
+        assert all(monitor.session_cookie == 'session' for monitor in monitors)
+        assert monitors[0].state is not monitors[1].state
+
+        separate = VPSMonitor(VPSConfig(panel_url="https://test.panel.com", username="admin"),
+                              auth=SharedAuth("https://test.panel.com", "admin"))
+        assert separate.session_cookie is None
+
+    def test_reset_shared_state(self):
+        """测试重置后新建的监控器不再引用之前共享的登录状态、调度器和连接池"""
+        config = VPSConfig(panel_url="https://test.panel.com", username="admin")
+        monitor = VPSMonitor(config)
+        pool = HTTPPool.for_config(config)
+        reset_shared_state()
+
+        assert SharedAuth.for_account(config.panel_url, config.username) is not monitor.auth
+        assert PanelRequestScheduler.for_config(config) is not monitor.scheduler
+        assert HTTPPool.for_config(config) is not pool
+        assert monitor.auth.panel_url == "https://test.panel.com"
+
+    def test_per_server_footprint(self):
+        """测试默认配置下每台服务器的内存占用在预算内"""
+        # 共享的登录状态在测量前创建，不计入每台服务器
+        auth = SharedAuth.for_account("https://test.panel.com", "admin")
+        gc.collect()
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            monitors = [VPSMonitor(VPSConfig(panel_url="https://test.panel.com", username="admin",
+                                             server_uuid=f"srv-{i}")) for i in range(200)]
+            gc.collect()
+            per_server = (tracemalloc.get_traced_memory()[0] - before) / len(monitors)
+        finally:
+            tracemalloc.stop()
+        assert per_server < FOOTPRINT_BUDGET
+
+class TestSharedLogin:
+    """共享登录测试"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_logins_hit_panel_once(self):
+        """测试共享登录状态的服务器并发登录时只向面板登录一次，且都能连接WebSocket"""
+        panel = MockPanel(servers=3)
+        await panel.start()
+        monitors = [VPSMonitor(VPSConfig(**panel.monitor_env(uuid))) for uuid in panel.servers]
+        auth = monitors[0].auth
+        try:
+            for monitor in monitors:
+                await monitor.start_session()
+            assert all(await asyncio.gather(*(monitor.login() for monitor in monitors)))
+            assert panel.counters['logins'] == 1
+            assert auth.generation == 1
+            assert all(await asyncio.gather(*(monitor.connect_websocket() for monitor in monitors)))
+        finally:
+            for monitor in monitors:
+                await monitor.close()
+            await panel.stop()
@@ -0,0 +1,109 @@
+import pytest
+import json
+from aiohttp.test_utils import TestClient, TestServer
+from vps_monitor import VPSMonitor, VPSConfig, StatsStore, TimeSeriesRing, ControlServer, VirtualClock
+
+def sample(cpu: float, memory: float) -> dict:
+    return {'cpu_absolute': cpu, 'memory_bytes': memory}
+
+class TestStatsStore:
+    """stats时间序列测试"""
+
+    def test_ring_overwrites_oldest(self):
+        """测试写满后覆盖最旧的点且范围查询正确"""
+        ring = TimeSeriesRing(5, ('cpu_absolute',))
+        for i in range(12):
+            ring.append(float(i), {'cpu_absolute': float(i)})
+
+        assert len(ring) == 5
+        assert ring.range('cpu_absolute', 0.0, 100.0) == [(float(i), float(i)) for i in range(7, 12)]
+        assert ring.range('cpu_absolute', 8.5, 10.0) == [(9.0, 9.0), (10.0, 10.0)]
+
+    def test_minute_and_hour_downsampling(self):
+        """测试1分钟和1小时聚合的均值与最大值"""
+        store = StatsStore(raw_points=100, minute_points=200, hour_points=10)
+        for second in range(0, 7200 + 120, 10):
+            cpu = 100.0 if second % 60 == 0 else 40.0
+            store.add(float(second), sample(cpu, 1024.0))
+
+        _, minutes = store.query('cpu_absolute', 0.0, 59.0, tier='1m')
+        assert minutes == [(0.0, pytest.approx(50.0))]
+        _, peaks = store.query('cpu_absolute_max', 0.0, 59.0, tier='1m')
+        assert peaks == [(0.0, 100.0)]
+
+        _, hours = store.query('memory_bytes', 0.0, 7200.0, tier='1h')
+        assert [t for t, _ in hours] == [0.0, 3600.0]
+        assert hours[0][1] == pytest.approx(1024.0)
+
+    def test_auto_tier_selection(self):
+        """测试自动选择覆盖查询起点的最细层"""
+        store = StatsStore(raw_points=10, minute_points=100, hour_points=10)
+        for second in range(0, 1800, 5):
+            store.add(float(second), sample(1.0, 1.0))
+
+        assert store.query('cpu_absolute', 1760.0)[0] == 'raw'
+        assert store.query('cpu_absolute', 600.0)[0] == '1m'
+        with pytest.raises(ValueError):
+            store.query('unknown', 0.0)
+
+    def test_short_history_across_hour_boundary(self):
+        """测试刚启动时数据跨过整点，不会因为小时桶的开始时间更早而选中只有一个点的1小时层"""
+        store = StatsStore()
+        for second in range(3000, 3780, 60):
+            store.add(float(second), sample(1.0, 1.0))
+
+        tier, points = store.query('memory_bytes', 3780.0 - 3600)
+        assert tier == 'raw'
+        assert len(points) == 13
+
+    def test_memory_is_bounded(self):
+        """测试内存随写入增长，各层写满后不再增长"""
+        store = StatsStore(raw_points=50, minute_points=50, hour_points=50)
+        assert store.nbytes == 0
+        for second in range(0, 200000, 10):
+            store.add(float(second), sample(1.0, 1.0))
+        size = store.nbytes
+        assert size == 50 * (8 + 4 * 7) + 2 * 50 * (8 + 4 * 9)
+        for second in range(200000, 400000, 10):
+            store.add(float(second), sample(1.0, 1.0))
+        assert store.nbytes == size
+
+class TestStatsIngest:
+    """stats事件写入测试"""
+
+    @pytest.mark.asyncio
+    async def test_stats_event_recorded_and_served(self):
+        """测试stats事件写入并可通过控制接口查询"""
+        monitor = VPSMonitor(VPSConfig(panel_url="https://test.panel.com", server_uuid="srv-1"))
+        payload = json.dumps({"memory_bytes": 2048, "cpu_absolute": 12.5, "state": "running"})
+        await monitor.handle_websocket_message(json.dumps({"event": "stats", "args": [payload]}))
+
+        assert monitor.stats_store.latest['memory_bytes'] == 2048.0
+        assert monitor.get_metrics()['stats_cpu_absolute'] == 12.5
+
+        async with TestClient(TestServer(ControlServer({"srv-1": monitor}).app)) as client:
+            response = await client.get('/stats', params={'field': 'memory_bytes', 'since': '0'})
+            data = await response.json()
+            assert data['tier'] == 'raw'
+            assert [value for _, value in data['points']] == [2048.0]
+
+            response = await client.get('/stats', params={'field': 'bogus'})
+            assert response.status == 400
+
+    @pytest.mark.asyncio
+    async def test_default_range_follows_monitor_clock(self, tmp_path):
+        """测试控制接口未指定since时按监控器的时钟取最近的数据"""
+        clock = VirtualClock(start=1000.0)
+        monitor = VPSMonitor(VPSConfig(panel_url="https://test.panel.com", server_uuid="srv-1",
+                                       event_journal_dir=str(tmp_path)), clock=clock)
+        await monitor.handle_websocket_message(json.dumps({"event": "status", "args": ["running"]}))
+        await clock.advance(600)
+        payload = json.dumps({"memory_bytes": 2048, "cpu_absolute": 12.5})
+        await monitor.handle_websocket_message(json.dumps({"event": "stats", "args": [payload]}))
+
+        async with TestClient(TestServer(ControlServer({"srv-1": monitor}).app)) as client:
+            data = await (await client.get('/stats', params={'field': 'memory_bytes'})).json()
+            assert data['points'] == [[1600.0, 2048.0]]
+            data = await (await client.get('/availability')).json()
+            assert data['uptime'] == pytest.approx(600)
+        await monitor.close()
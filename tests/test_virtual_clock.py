@@ -0,0 +1,91 @@
+import pytest
+import asyncio
+import time
+from unittest.mock import AsyncMock
+from vps_monitor import VPSMonitor, VPSConfig, VirtualClock
+
+class TestVirtualClock:
+    """虚拟时钟测试"""
+
+    @pytest.mark.asyncio
+    async def test_sleepers_wake_in_order(self):
+        """测试等待者按唤醒时间顺序运行，时间只由advance推进"""
+        clock = VirtualClock(start=1000.0)
+        woke = []
+
+        async def sleeper(name, seconds):
+            await clock.sleep(seconds)
+            woke.append((name, clock.time()))
+
+        tasks = [asyncio.create_task(sleeper(name, seconds)) for name, seconds in (('b', 20), ('a', 10), ('c', 30))]
+        await clock.advance(25)
+        assert woke == [('a', 1010.0), ('b', 1020.0)]
+        assert clock.time() == 1025.0 and clock.monotonic() == 25.0
+        assert clock.sleepers == 1
+
+        tasks[2].cancel()
+        await clock.advance(100)
+        assert len(woke) == 2
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+class TestFleetSimulation:
+    """在虚拟时间中模拟长时间运行"""
+
+    def make_monitor(self, clock, tmp_path, **overrides) -> VPSMonitor:
+        config = VPSConfig(panel_url="https://test.panel.com", server_uuid="sim-1", check_interval=30,
+                           event_journal_dir=str(tmp_path), **overrides)
+        monitor = VPSMonitor(config, clock=clock)
+        monitor.send_dingtalk_message = AsyncMock()
+        monitor.check_login_status = AsyncMock(return_value=True)
+        monitor.connect_websocket = AsyncMock(return_value=True)
+        return monitor
+
+    @pytest.mark.asyncio
+    async def test_start_retry_backoff(self, tmp_path):
+        """测试启动命令发送失败时按10/20秒退避重试，虚拟时间不占用真实时间"""
+        clock = VirtualClock()
+        monitor = self.make_monitor(clock, tmp_path)
+        monitor.send_command = AsyncMock(side_effect=[False, False, True])
+
+        started = time.monotonic()
+        task = asyncio.create_task(monitor.start_server())
+        await clock.advance(9)
+        assert monitor.send_command.call_count == 1
+        await clock.advance(1)
+        assert monitor.send_command.call_count == 2
+        await clock.advance(20)
+        assert await task is True
+        assert monitor.last_power == {'action': 'start', 'ok': True, 'at': clock.start + 30}
+        assert time.monotonic() - started < 5
+        await monitor.close()
+
+    @pytest.mark.asyncio
+    async def test_crash_loop_for_a_day(self, tmp_path):
+        """模拟服务器每运行1小时崩溃一次、持续一天：每次崩溃都被拉起，可用率按虚拟时间统计"""
+        clock = VirtualClock()
+        monitor = self.make_monitor(clock, tmp_path)
+        monitor.send_command = AsyncMock(return_value=True)
+
+        async def session():
+            # 一次WebSocket会话：服务器运行1小时后崩溃，连接随之断开
+            await monitor.handle_websocket_message('{"event": "status", "args": ["running"]}')
+            await clock.sleep(3600)
+            await monitor.handle_websocket_message('{"event": "status", "args": ["offline"]}')
+        monitor.monitor_websocket = session
+
+        started = time.monotonic()
+        monitor.is_running = True
+        task = asyncio.create_task(monitor.run_monitor())
+        await clock.advance(86400)
+        monitor.stop()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+        # 每轮3600秒运行 + 30秒重连等待，第k次崩溃发生在 3600 + 3630k 秒
+        cycles = (86400 - 3600) // 3630 + 1
+        assert monitor.send_command.call_count == cycles
+        result = monitor.get_availability(clock.start, clock.start + 86400)
+        assert result['flaps'] == cycles
+        assert result['availability'] == pytest.approx(3600 / 3630, rel=0.01)
+        assert time.monotonic() - started < 10
+        await monitor.close()
@@ -220,7 +220,7 @@ class TestVPSMonitor:
         result = await monitor.send_command(command)
         
         assert result == True
-        monitor.ws_connection.send.assert_called_once_with(json.dumps(command))
+        monitor.ws_connection.send.assert_called_once_with(monitor.codec.dumps(command))
         
     @pytest.mark.asyncio
     async def test_send_command_failure(self, monitor):
@@ -276,6 +276,8 @@ class TestVPSMonitor:
         
         message = '{"event": "console output", "args": ["🔗 Your SSHX link is: https://sshx.io/s/new123#xyz789"]}'
         await monitor.handle_websocket_message(message)
+        # 链接停在行尾时等下一行确认密钥已写完
+        await monitor.handle_websocket_message('{"event": "console output", "args": ["Server started successfully"]}')
         
         assert monitor.sshx_link == "https://sshx.io/s/new123#xyz789"
         
@@ -171,6 +171,8 @@ class TestWebSocket:
             if test_case['expected_action'] == 'restart_trigger':
                 assert monitor.start_server.called
             elif test_case['expected_action'] == 'sshx_extract':
+                # 链接停在行尾时等下一行确认密钥已写完
+                await monitor.handle_websocket_message('{"event": "console output", "args": ["Server started successfully"]}')
                 assert monitor.sshx_link == "https://sshx.io/s/test123#abc456"
                 
     @pytest.mark.asyncio
@@ -0,0 +1,87 @@
+import pytest
+import json
+from unittest.mock import AsyncMock
+from vps_monitor import VPSMonitor, VPSConfig, WebSocketCapture
+from ws_replay import OfflineMonitor, offline_config, replay
+
+class FakeConnection:
+    """按顺序产出帧的WebSocket连接"""
+
+    def __init__(self, frames):
+        self.frames = frames
+        self.closed = False
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for frame in self.frames:
+            yield frame
+
+    async def close(self):
+        self.closed = True
+
+class TestWebSocketCapture:
+    """WebSocket录制与回放测试"""
+
+    def test_roundtrip_and_truncated_tail(self, tmp_path):
+        """测试文本/二进制帧往返，末尾不完整的记录被忽略"""
+        path = str(tmp_path / "ws.cap")
+        capture = WebSocketCapture(path)
+        capture.write('{"event": "status", "args": ["running"]}', 100.0)
+        capture.write(b'\x00\x01binary', 100.5)
+        capture.write('{"event": "console output", "args": ["中文"]}', 101.0)
+        capture.close()
+        with open(path, 'ab') as f:
+            f.write(b'\x00' * 5)
+
+        frames = list(WebSocketCapture.read(path))
+        assert frames == [
+            (100.0, '{"event": "status", "args": ["running"]}'),
+            (100.5, b'\x00\x01binary'),
+            (101.0, '{"event": "console output", "args": ["中文"]}'),
+        ]
+
+    def test_size_limit_drops_frames(self, tmp_path):
+        """测试达到大小上限后停止录制"""
+        path = str(tmp_path / "ws.cap")
+        capture = WebSocketCapture(path, max_bytes=64)
+        for _ in range(5):
+            capture.write('x' * 20, 1.0)
+        capture.close()
+        assert capture.counters['frames'] == 1
+        assert capture.counters['dropped'] == 4
+        assert len(list(WebSocketCapture.read(path))) == 1
+
+    def test_rejects_foreign_file(self, tmp_path):
+        path = tmp_path / "other.bin"
+        path.write_bytes(b'not a capture')
+        with pytest.raises(ValueError):
+            list(WebSocketCapture.read(str(path)))
+
+    @pytest.mark.asyncio
+    async def test_monitor_captures_and_replay_matches(self, tmp_path):
+        """测试监控器录制收到的帧，回放后得到相同的处理结果且不联网"""
+        path = str(tmp_path / "ws.cap")
+        frames = ['{"event": "status", "args": ["running"]}']
+        frames += [json.dumps({"event": "console output", "args": [f"line {i}"]}) for i in range(100)]
+        frames.append('{"event": "status", "args": ["offline"]}')
+
+        monitor = VPSMonitor(VPSConfig(panel_url="https://test.panel.com", ws_capture_file=path))
+        monitor.ws_connection = FakeConnection(frames)
+        monitor.start_server = AsyncMock(return_value=True)
+        await monitor.monitor_websocket()
+        assert monitor.get_metrics()['ws_capture_frames'] == len(frames)
+        monitor.start_server.assert_called_once()
+        await monitor.close()
+
+        recorded = list(WebSocketCapture.read(path))
+        assert [message for _, message in recorded] == frames
+
+        offline = OfflineMonitor(offline_config())
+        result = await replay(offline, recorded)
+        assert result['frames'] == len(frames)
+        assert offline.dispatch_counters == monitor.dispatch_counters
+        assert offline.actions['starts'] == 1
+        assert len(offline.console_buffer) == 100
+        await offline.close()
@@ -5,19 +5,53 @@ VPS监控和自动拉起系统
 """
 
 import asyncio
+import base64
+import bisect
+import contextlib
+import heapq
+import itertools
 import json
 import logging
+import operator
 import os
 import re
+import signal
+import struct
+import sys
+import threading
 import time
-from typing import Optional, Dict, Any
-from dataclasses import dataclass
+import traceback
+import weakref
+import zlib
+from array import array
+from collections import deque
+from typing import Optional, Dict, Any, List, Sequence, Tuple, Callable, Awaitable
+from dataclasses import dataclass, field
 from urllib.parse import urlparse, unquote
 
 import aiohttp
 import websockets
 import requests
-from aiohttp import ClientSession, ClientResponse
+from aiohttp import ClientSession, ClientResponse, web
+
+# 可选的高性能JSON库，未安装时回退到标准库json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+# 可选的numpy，用于全量服务器的向量化异常检测
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 # 配置日志
 logging.basicConfig(
@@ -38,26 +72,2481 @@ class VPSConfig:
     server_uuid: str = os.getenv('SERVER_UUID', "")
     node_host: str = os.getenv('NODE_HOST', "")
     ws_port: int = int(os.getenv('WS_PORT', "8080"))
+    ws_scheme: str = os.getenv('WS_SCHEME', "wss")  # 节点WebSocket协议，本地模拟面板使用ws
     username: str = os.getenv('USERNAME', "")
     password: str = os.getenv('PASSWORD', "")
     check_interval: int = int(os.getenv('CHECK_INTERVAL', "30"))  # 检查间隔（秒）
     max_retries: int = int(os.getenv('MAX_RETRIES', "3"))  # 最大重试次数
     dingtalk_webhook_url: str = os.getenv('DINGTALK_WEBHOOK_URL', "")
+    json_codec: str = os.getenv('JSON_CODEC', "auto")  # auto/msgspec/orjson/json
+    send_queue_size: int = int(os.getenv('SEND_QUEUE_SIZE', "64"))  # 发送队列上限，满时阻塞调用方
+    reply_min_interval: float = float(os.getenv('REPLY_MIN_INTERVAL', "5"))  # send logs/stats应答最小间隔（秒）
+    echo_window: float = float(os.getenv('ECHO_WINDOW', "2"))  # 视为自身请求回显的时间窗口（秒）
+    console_dedupe_size: int = int(os.getenv('CONSOLE_DEDUPE_SIZE', "4096"))  # 控制台去重索引容量（行）
+    console_replay_window: float = float(os.getenv('CONSOLE_REPLAY_WINDOW', "10"))  # 请求日志后视为回放的时间窗口（秒）
+    console_rules_file: str = os.getenv('CONSOLE_RULES_FILE', "")  # 控制台触发规则文件（JSON），为空时使用内置规则
+    console_rate_limit: float = float(os.getenv('CONSOLE_RATE_LIMIT', "200"))  # 每秒处理的控制台行数上限，0为不限
+    console_burst: int = int(os.getenv('CONSOLE_BURST', "1000"))  # 控制台突发行数
+    console_sample_every: int = int(os.getenv('CONSOLE_SAMPLE_EVERY', "100"))  # 超限后每N行采样1行
+    console_buffer_bytes: int = int(os.getenv('CONSOLE_BUFFER_BYTES', "32768"))  # 控制台环形缓冲区字节数
+    console_buffer_lines: int = int(os.getenv('CONSOLE_BUFFER_LINES', "512"))  # 控制台环形缓冲区行数
+    console_archive_dir: str = os.getenv('CONSOLE_ARCHIVE_DIR', "")  # 控制台压缩归档目录，为空则不归档
+    console_archive_block_kb: int = int(os.getenv('CONSOLE_ARCHIVE_BLOCK_KB', "64"))  # 压缩块大小（未压缩KB）
+    console_archive_segment_mb: int = int(os.getenv('CONSOLE_ARCHIVE_SEGMENT_MB', "64"))  # 单个段文件大小
+    console_archive_segments: int = int(os.getenv('CONSOLE_ARCHIVE_SEGMENTS', "16"))  # 每台服务器保留的段数
+    console_archive_flush: float = float(os.getenv('CONSOLE_ARCHIVE_FLUSH', "60"))  # 未满块的最长缓存时间（秒）
+    stats_raw_points: int = int(os.getenv('STATS_RAW_POINTS', "600"))  # 原始stats保留点数
+    stats_minute_points: int = int(os.getenv('STATS_MINUTE_POINTS', "720"))  # 1分钟聚合保留点数
+    stats_hour_points: int = int(os.getenv('STATS_HOUR_POINTS', "720"))  # 1小时聚合保留点数
+    anomaly_interval: int = int(os.getenv('ANOMALY_INTERVAL', "60"))  # 异常检测间隔（秒），0为关闭
+    anomaly_window: int = int(os.getenv('ANOMALY_WINDOW', "120"))  # 异常检测使用的最近原始点数
+    anomaly_leak_window: int = int(os.getenv('ANOMALY_LEAK_WINDOW', "30"))  # 泄漏判断至少需要的1分钟聚合点数
+    anomaly_zscore: float = float(os.getenv('ANOMALY_ZSCORE', "4"))  # 突增判定的z-score阈值
+    anomaly_leak_rate: float = float(os.getenv('ANOMALY_LEAK_RATE', "0.2"))  # 内存每小时增长占上限的比例
+    anomaly_memory_saturation: float = float(os.getenv('ANOMALY_MEMORY_SATURATION', "0.95"))  # 内存饱和比例
+    anomaly_cpu_saturation: float = float(os.getenv('ANOMALY_CPU_SATURATION', "95"))  # CPU饱和阈值（占CPU限制的百分比）
+    server_cpu_limit: float = float(os.getenv('SERVER_CPU_LIMIT', "0"))  # 服务器CPU限制（%，与面板一致，100为一个核心），0为未知
+    anomaly_cooldown: int = int(os.getenv('ANOMALY_COOLDOWN', "1800"))  # 同类异常的通知冷却（秒）
+    anomaly_restart: bool = os.getenv('ANOMALY_RESTART', "false").lower() == "true"  # 内存饱和时主动重启
+    predictive_restart: bool = os.getenv('PREDICTIVE_RESTART', "false").lower() == "true"  # 按内存增长趋势预防性重启
+    maintenance_window: str = os.getenv('MAINTENANCE_WINDOW', "03:00-05:00")  # 计划重启的维护窗口（本地时间）
+    predict_window: int = int(os.getenv('PREDICT_WINDOW', "3600"))  # 拟合内存增长使用的时间范围（秒）
+    predict_horizon: int = int(os.getenv('PREDICT_HORIZON', "86400"))  # 只为该时间内预计OOM的服务器安排重启
+    predict_margin: int = int(os.getenv('PREDICT_MARGIN', "900"))  # 在预计OOM前至少提前多久重启（秒）
+    predict_oom_ratio: float = float(os.getenv('PREDICT_OOM_RATIO', "0.98"))  # 内存达到上限的该比例视为OOM
+    event_journal_dir: str = os.getenv('EVENT_JOURNAL_DIR', "")  # 状态/电源事件日志目录，为空则不记录
+    event_journal_checkpoint: int = int(os.getenv('EVENT_JOURNAL_CHECKPOINT', "256"))  # 每N条记录写一个索引检查点
+    state_checkpoint_file: str = os.getenv('STATE_CHECKPOINT_FILE', "")  # 运行状态检查点文件，为空则不保存
+    state_checkpoint_interval: int = int(os.getenv('STATE_CHECKPOINT_INTERVAL', "30"))  # 检查点写入间隔（秒）
+    state_checkpoint_max_age: int = int(os.getenv('STATE_CHECKPOINT_MAX_AGE', "3600"))  # 超过该时长的状态不恢复
+    ws_capture_file: str = os.getenv('WS_CAPTURE_FILE', "")  # WebSocket原始帧录制文件，为空则不录制
+    ws_capture_max_mb: int = int(os.getenv('WS_CAPTURE_MAX_MB', "256"))  # 录制文件大小上限
+    loop_lag_interval: float = float(os.getenv('LOOP_LAG_INTERVAL', "0.5"))  # 事件循环延迟采样间隔（秒），0为关闭
+    loop_lag_warn: float = float(os.getenv('LOOP_LAG_WARN', "0.1"))  # 循环延迟告警阈值（秒）
+    loop_stall_dump: float = float(os.getenv('LOOP_STALL_DUMP', "1.0"))  # 循环阻塞超过该时长时立即打印调用栈（秒）
+    profile_dir: str = os.getenv('PROFILE_DIR', "profiles")  # 采样分析结果目录
+    profile_seconds: float = float(os.getenv('PROFILE_SECONDS', "10"))  # SIGUSR1触发的采样时长（秒）
+    profile_interval_ms: float = float(os.getenv('PROFILE_INTERVAL_MS', "5"))  # 采样间隔（毫秒）
+    http_pool_limit: int = int(os.getenv('HTTP_POOL_LIMIT', "100"))  # 进程内面板HTTP连接总数上限
+    http_pool_per_host: int = int(os.getenv('HTTP_POOL_PER_HOST', "32"))  # 每个主机的连接数上限，0为不限
+    http_keepalive: float = float(os.getenv('HTTP_KEEPALIVE', "60"))  # 空闲连接保持时长（秒）
+    http_dns_ttl: int = int(os.getenv('HTTP_DNS_TTL', "300"))  # DNS解析结果缓存时长（秒）
+    http_connect_timeout: float = float(os.getenv('HTTP_CONNECT_TIMEOUT', "10"))  # 建立连接超时（秒）
+    http_timeout: float = float(os.getenv('HTTP_TIMEOUT', "30"))  # 单个面板请求总超时（秒）
+    panel_rate_limit: float = float(os.getenv('PANEL_RATE_LIMIT', "10"))  # 每个面板账号每秒请求数，0为不限
+    panel_rate_burst: int = int(os.getenv('PANEL_RATE_BURST', "20"))  # 允许的突发请求数
+    panel_rate_window: float = float(os.getenv('PANEL_RATE_WINDOW', "60"))  # 面板限流窗口（秒），用于换算X-RateLimit-Limit
+    panel_rate_retries: int = int(os.getenv('PANEL_RATE_RETRIES', "2"))  # 429后排队重试次数
+    control_host: str = os.getenv('CONTROL_HOST', "127.0.0.1")  # 本地控制接口地址
+    control_port: int = int(os.getenv('CONTROL_PORT', "0"))  # 本地控制接口端口，0为关闭
 
-class VPSMonitor:
-    """VPS监控器"""
+@dataclass(slots=True)
+class WingsMessage:
+    """Wings WebSocket消息"""
+    event: str
+    args: List[Any]
+
+@dataclass(slots=True)
+class StatusMessage(WingsMessage):
+    """status事件"""
+    state: str = ""
+
+@dataclass(slots=True)
+class ConsoleOutputMessage(WingsMessage):
+    """console output事件"""
+    line: str = ""
+
+@dataclass(slots=True)
+class StatsMessage(WingsMessage):
+    """stats事件，args[0]为JSON字符串形式的资源统计"""
+    memory_bytes: int = 0
+    memory_limit_bytes: int = 0
+    cpu_absolute: float = 0.0
+    disk_bytes: int = 0
+    network_rx_bytes: int = 0
+    network_tx_bytes: int = 0
+    uptime: int = 0
+    state: str = ""
+
+class JsonCodec:
+    """标准库json编解码，解码失败统一抛出ValueError"""
+    name = 'json'
     
-    def __init__(self, config: VPSConfig):
-        self.config = config
-        self.session: Optional[ClientSession] = None
+    def loads(self, data: str) -> Any:
+        return json.loads(data)
+        
+    def dumps(self, obj: Any) -> str:
+        return json.dumps(obj)
+        
+    def decode_message(self, data: str) -> WingsMessage:
+        """将Wings帧解码为类型化消息"""
+        frame = self.loads(data)
+        if not isinstance(frame, dict):
+            raise ValueError(f"消息不是JSON对象: {type(frame).__name__}")
+        event = frame.get('event')
+        args = frame.get('args') or []
+        builder = _MESSAGE_BUILDERS.get(event)
+        if builder is None:
+            return WingsMessage(event, args)
+        return builder(self, event, args)
+
+class OrjsonCodec(JsonCodec):
+    """orjson编解码"""
+    name = 'orjson'
+    
+    def loads(self, data: str) -> Any:
+        return orjson.loads(data)
+        
+    def dumps(self, obj: Any) -> str:
+        # orjson输出bytes，WebSocket需要以文本帧发送
+        return orjson.dumps(obj).decode()
+
+class MsgspecCodec(JsonCodec):
+    """msgspec编解码"""
+    name = 'msgspec'
+    
+    def __init__(self):
+        self._encoder = msgspec.json.Encoder()
+        self._decoder = msgspec.json.Decoder()
+        
+    def loads(self, data: str) -> Any:
+        try:
+            return self._decoder.decode(data)
+        except msgspec.DecodeError as e:
+            raise ValueError(str(e)) from e
+            
+    def dumps(self, obj: Any) -> str:
+        return self._encoder.encode(obj).decode()
+
+def _build_status(codec: JsonCodec, event: str, args: List[Any]) -> StatusMessage:
+    state = args[0] if args and isinstance(args[0], str) else ""
+    return StatusMessage(event, args, state)
+
+def _build_console_output(codec: JsonCodec, event: str, args: List[Any]) -> ConsoleOutputMessage:
+    line = args[0] if args and isinstance(args[0], str) else ""
+    return ConsoleOutputMessage(event, args, line)
+
+def _build_stats(codec: JsonCodec, event: str, args: List[Any]) -> StatsMessage:
+    payload = args[0] if args else {}
+    if isinstance(payload, str):
+        payload = codec.loads(payload)
+    if not isinstance(payload, dict):
+        raise ValueError("stats消息格式错误")
+    network = payload.get('network') or {}
+    return StatsMessage(
+        event, args,
+        memory_bytes=int(payload.get('memory_bytes') or 0),
+        memory_limit_bytes=int(payload.get('memory_limit_bytes') or 0),
+        cpu_absolute=float(payload.get('cpu_absolute') or 0.0),
+        disk_bytes=int(payload.get('disk_bytes') or 0),
+        network_rx_bytes=int(network.get('rx_bytes') or 0),
+        network_tx_bytes=int(network.get('tx_bytes') or 0),
+        uptime=int(payload.get('uptime') or 0),
+        state=payload.get('state') or "",
+    )
+
+_MESSAGE_BUILDERS = {
+    'status': _build_status,
+    'console output': _build_console_output,
+    'stats': _build_stats,
+}
+
+_CODECS = {
+    'msgspec': (MsgspecCodec, lambda: msgspec is not None),
+    'orjson': (OrjsonCodec, lambda: orjson is not None),
+    'json': (JsonCodec, lambda: True),
+}
+
+def get_codec(name: str = "auto") -> JsonCodec:
+    """按名称选择编解码器，auto时优先使用已安装的最快实现"""
+    if name == "auto":
+        for codec_class, available in _CODECS.values():
+            if available():
+                return codec_class()
+    if name in _CODECS:
+        codec_class, available = _CODECS[name]
+        if available():
+            return codec_class()
+    logger.warning(f"JSON编解码器 {name} 不可用，回退到标准库json")
+    return JsonCodec()
+
+class Clock:
+    """真实时钟：监控器的所有等待和时间读取都经由时钟对象，便于替换为虚拟时钟"""
+    
+    # 直接使用C实现，每帧都要读取时间的热路径上省去一层Python调用
+    monotonic = staticmethod(time.monotonic)
+    time = staticmethod(time.time)
+        
+    async def sleep(self, seconds: float):
+        await asyncio.sleep(seconds)
+
+class VirtualClock(Clock):
+    """虚拟时钟：sleep只登记唤醒时间，由advance()推进时间并按顺序唤醒，几秒内即可模拟数天的运行
+    
+    每唤醒一个等待者后让事件循环空转若干轮，使被唤醒的任务运行到下一次等待；
+    被模拟的代码不应在虚拟时间推进期间等待真实网络IO。
+    """
+    SETTLE_ROUNDS = 20
+    
+    def __init__(self, start: float = 1700000000.0):
+        self.start = start
+        self.now = start
+        self._sleepers: List[Tuple[float, int, asyncio.Future]] = []
+        self._sequence = 0
+        
+    def time(self) -> float:
+        return self.now
+        
+    def monotonic(self) -> float:
+        return self.now - self.start
+        
+    async def sleep(self, seconds: float):
+        if seconds <= 0:
+            await asyncio.sleep(0)
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._sequence += 1
+        heapq.heappush(self._sleepers, (self.now + seconds, self._sequence, future))
+        await future
+        
+    @property
+    def sleepers(self) -> int:
+        """仍在等待的任务数"""
+        return sum(1 for _, _, future in self._sleepers if not future.done())
+        
+    async def settle(self):
+        for _ in range(self.SETTLE_ROUNDS):
+            await asyncio.sleep(0)
+            
+    async def advance(self, seconds: float):
+        """把虚拟时间推进seconds秒，期间到期的等待按时间顺序逐个唤醒"""
+        target = self.now + seconds
+        await self.settle()
+        while self._sleepers and self._sleepers[0][0] <= target:
+            deadline, _, future = heapq.heappop(self._sleepers)
+            if future.done():
+                continue
+            self.now = max(self.now, deadline)
+            future.set_result(None)
+            await self.settle()
+        self.now = target
+
+REAL_CLOCK = Clock()
+
+# 幂等命令：排队期间重复提交的相同命令会被合并为一次发送
+IDEMPOTENT_COMMANDS = {
+    ('send logs',),
+    ('send stats',),
+    ('set state', 'start'),
+}
+
+def _command_key(command: Dict[str, Any]) -> Optional[Tuple]:
+    """幂等命令返回合并键，其他命令返回None"""
+    args = tuple(arg for arg in command.get('args') or () if arg is not None)
+    key = (command.get('event'),) + args
+    return key if key in IDEMPOTENT_COMMANDS else None
+
+class CommandWriter:
+    """WebSocket单写者：每个连接一个发送队列，串行发送并合并重复的幂等命令"""
+    
+    def __init__(self, ws, codec: JsonCodec, max_queue: int = 64):
+        self.ws = ws
+        self.codec = codec
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._pending: Dict[Tuple, asyncio.Future] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.counters = {'sent': 0, 'failed': 0, 'coalesced': 0}
+        
+    @property
+    def depth(self) -> int:
+        """当前排队的命令数"""
+        return self._queue.qsize()
+        
+    async def submit(self, command: Dict[str, Any]) -> bool:
+        """提交命令并等待发送结果，队列满时阻塞（背压）"""
+        key = _command_key(command)
+        if key is not None and key in self._pending:
+            self.counters['coalesced'] += 1
+            return await asyncio.shield(self._pending[key])
+            
+        future = asyncio.get_running_loop().create_future()
+        if key is not None:
+            self._pending[key] = future
+        await self._queue.put((key, command, future))
+        # 写任务在队列清空后退出，有新命令时再拉起，保证同一时刻只有一个写者
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return await asyncio.shield(future)
+        
+    async def _run(self):
+        """写任务：依次发送队列中的命令"""
+        while not self._queue.empty():
+            key, command, future = self._queue.get_nowait()
+            if key is not None and self._pending.get(key) is future:
+                del self._pending[key]
+            result = False
+            try:
+                await self.ws.send(self.codec.dumps(command))
+                self.counters['sent'] += 1
+                logger.info(f"发送命令: {command}")
+                result = True
+            except Exception as e:
+                self.counters['failed'] += 1
+                logger.error(f"发送命令失败: {e}")
+            finally:
+                # 写任务被取消时也要唤醒等待方
+                if not future.done():
+                    future.set_result(result)
+                
+    def close(self):
+        """停止写任务，未发送的命令全部以失败返回"""
+        if self._task and not self._task.done():
+            self._task.cancel()
+        while not self._queue.empty():
+            _, _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_result(False)
+        self._pending.clear()
+
+class RequestGovernor:
+    """send logs/send stats应答限流：抑制自身请求的回显，限制应答频率并统计丢弃数"""
+    
+    def __init__(self, min_interval: float = 5.0, echo_window: float = 2.0, clock: Optional[Clock] = None):
+        self.clock = clock or REAL_CLOCK
+        self.min_interval = min_interval
+        self.echo_window = echo_window
+        self._requested_at: Dict[str, float] = {}
+        self._replied_at: Dict[str, float] = {}
+        self.dropped = {'echo': 0, 'rate_limited': 0}
+        
+    def note_request(self, event: str, now: Optional[float] = None):
+        """记录本端主动发出的请求"""
+        self._requested_at[event] = self.clock.monotonic() if now is None else now
+        
+    def allow_reply(self, event: str, now: Optional[float] = None) -> bool:
+        """判断是否应答对端的请求，不应答时计入丢弃统计"""
+        now = self.clock.monotonic() if now is None else now
+        requested = self._requested_at.get(event)
+        if requested is not None and now - requested < self.echo_window:
+            self.dropped['echo'] += 1
+            return False
+        replied = self._replied_at.get(event)
+        if replied is not None and now - replied < self.min_interval:
+            self.dropped['rate_limited'] += 1
+            return False
+        self._replied_at[event] = now
+        return True
+
+class ConsoleDedupeIndex:
+    """最近控制台行的有界哈希索引：64位哈希存放在环形数组中，淘汰最旧的记录
+    
+    环形数组随记录增长，写满容量后才开始覆盖，只在回放窗口内用到的索引不会预先占满内存。
+    监控器只在重连回放窗口内使用索引，窗口开始时从控制台缓冲区补入之前的行；
+    只记录不查询的行（record）不维护计数表，计数表在第一次查询时才按环重建。
+    """
+    
+    def __init__(self, capacity: int = 4096):
+        self.capacity = max(1, capacity)
+        self._ring = array('Q')
+        self._next = 0
+        self._size = 0
+        # 哈希 -> 环中出现次数，同一行重复出现时淘汰旧记录不影响成员判断；None表示需要重建
+        self._counts: Optional[Dict[int, int]] = {}
+        
+    @staticmethod
+    def line_hash(line: str) -> int:
+        """稳定的64位行哈希（跨进程一致，可用于持久化）：高32位CRC32，低32位Adler-32"""
+        data = line.encode('utf-8', 'surrogatepass')
+        return zlib.crc32(data) << 32 | zlib.adler32(data)
+        
+    def __len__(self) -> int:
+        return self._size
+        
+    def __contains__(self, line: str) -> bool:
+        return self.line_hash(line) in self._index()
+        
+    def _index(self) -> Dict[int, int]:
+        counts = self._counts
+        if counts is None:
+            counts = self._counts = {}
+            for value in self.hashes():
+                counts[value] = counts.get(value, 0) + 1
+        return counts
+        
+    def record(self, line: str):
+        """只记录该行，不判断是否出现过"""
+        if self._size < self.capacity:
+            self._ring.append(self.line_hash(line))
+            self._size += 1
+        else:
+            self._ring[self._next] = self.line_hash(line)
+        self._next = (self._next + 1) % self.capacity
+        self._counts = None
+        
+    def add_hash(self, value: int):
+        """记录一个行哈希，容量已满时淘汰最旧的记录"""
+        counts = self._index()
+        if self._size == self.capacity:
+            old = self._ring[self._next]
+            remaining = counts[old] - 1
+            if remaining:
+                counts[old] = remaining
+            else:
+                del counts[old]
+            self._ring[self._next] = value
+        else:
+            self._ring.append(value)
+            self._size += 1
+        counts[value] = counts.get(value, 0) + 1
+        self._next = (self._next + 1) % self.capacity
+        
+    def seen(self, line: str) -> bool:
+        """记录该行并返回此前是否出现过"""
+        value = self.line_hash(line)
+        found = value in self._index()
+        self.add_hash(value)
+        return found
+        
+    def release(self):
+        """释放计数表（只保留环形数组），下次查询时再重建"""
+        self._counts = None
+        
+    def hashes(self) -> List[int]:
+        """按从旧到新的顺序返回索引中的哈希"""
+        start = (self._next - self._size) % self.capacity
+        return [self._ring[(start + i) % self.capacity] for i in range(self._size)]
+
+# SSHX链接：https://sshx.io/s/<会话名>#<密钥>
+SSHX_LINK_PATTERN = re.compile(r'https://sshx\.io/s/[a-zA-Z0-9]+#[a-zA-Z0-9]+')
+SSHX_LINK_PREFIX = 'https://sshx.io/s/'
+# 行尾尚未写完的链接（缺少密钥部分）
+_SSHX_PARTIAL_PATTERN = re.compile(r'https://sshx\.io/s/[a-zA-Z0-9]*(?:#[a-zA-Z0-9]*)?\Z')
+# 比完整前缀还短的片段，例如"https://ss"
+_SSHX_PREFIX_FRAGMENTS = tuple(SSHX_LINK_PREFIX[:size] for size in range(1, len(SSHX_LINK_PREFIX)))
+
+class SSHXLinkExtractor:
+    """增量SSHX链接提取器
+    
+    跨帧保留行尾未写完的链接片段（前缀片段、缺少#或密钥为空），链接被拆分到多个console output帧时也能识别；
+    已报告过的链接不再重复报告。每个console帧是一行，停在帧末尾的完整链接不与下一帧拼接，
+    下一帧到达时（或由调用方超时后flush）报告。
+    """
+    MAX_TAIL = 128
+    HOLD_SECONDS = 0.5
+    
+    def __init__(self, history: int = 16):
+        self._tail = ""
+        self._reported = deque(maxlen=history)
+        
+    @property
+    def pending(self) -> bool:
+        """是否有等待后续帧补全的链接片段"""
+        return bool(self._tail)
+        
+    @property
+    def held(self) -> Optional[str]:
+        """停在上一帧末尾、尚未报告的完整链接"""
+        if self._tail and SSHX_LINK_PATTERN.fullmatch(self._tail):
+            return self._tail
+        return None
+        
+    @property
+    def reported(self) -> List[str]:
+        """已报告过的链接，从旧到新"""
+        return list(self._reported)
+        
+    def mark_reported(self, links: List[str]):
+        """把链接标记为已报告（用于重启后恢复）"""
+        for link in links:
+            if link not in self._reported:
+                self._reported.append(link)
+        
+    def wants(self, frame: str) -> bool:
+        """根据原始帧粗判是否需要解码后交给feed处理"""
+        if self._tail or 'sshx' in frame:
+            return True
+        # 行文本以帧内最后一个引号结束，只需检查其是否以链接前缀的开头结尾；
+        # 前缀片段都以h开头且不超过17个字符，帧尾（含"]}）20个字符内没有h时不必逐个比较
+        return 'h' in frame[-20:] and frame.endswith(_SSHX_PREFIX_FRAGMENTS, 0, frame.rfind('"'))
+        
+    def feed(self, text: str) -> List[str]:
+        """输入一帧控制台文本，返回新出现的链接"""
+        links = self.flush() if self.held else []
+        buffer = self._tail + text if self._tail else text
+        if 'sshx.io/s/' in buffer:
+            end = len(buffer)
+            for match in SSHX_LINK_PATTERN.finditer(buffer):
+                if match.end() < end:
+                    self._report(match.group(0), links)
+        start = self._fragment_start(buffer)
+        self._tail = buffer[start:] if start >= 0 else ""
+        return links
+        
+    def flush(self) -> List[str]:
+        """不再等待续接，报告停在行尾的链接"""
+        links = []
+        held = self.held
+        if held:
+            self._report(held, links)
+        self._tail = ""
+        return links
+        
+    def _report(self, link: str, links: List[str]):
+        if link not in self._reported:
+            self._reported.append(link)
+            links.append(link)
+        
+    def _fragment_start(self, text: str) -> int:
+        """返回行尾未写完（或可能未写完）的链接片段的起始位置，没有时返回-1"""
+        length = len(text)
+        window = max(0, length - self.MAX_TAIL)
+        if text.find('sshx.io/s/', window) != -1:
+            match = _SSHX_PARTIAL_PATTERN.search(text, window)
+            if match:
+                return match.start()
+        if text.endswith(_SSHX_PREFIX_FRAGMENTS):
+            for size in range(len(SSHX_LINK_PREFIX) - 1, 0, -1):
+                if text.endswith(SSHX_LINK_PREFIX[:size]):
+                    return length - size
+        return -1
+
+@dataclass
+class ConsoleRule:
+    """控制台触发规则"""
+    name: str
+    pattern: str  # 确认用的正则
+    action: str = 'notify'  # notify/restart/metric
+    literals: List[str] = field(default_factory=list)  # 预筛字面量，任一出现才运行正则；为空时尝试从pattern推导
+    ignore_case: bool = True
+    cooldown: float = 300.0  # 同一规则两次动作的最小间隔（秒），metric不受限制
+
+CONSOLE_RULE_ACTIONS = ('notify', 'restart', 'metric')
+
+DEFAULT_CONSOLE_RULES = [
+    ConsoleRule('oom_killed', r'out of memory|oom[- ]?kill', literals=['out of memory', 'oom']),
+    ConsoleRule('panic', r'\bpanic(?:ked)?\b|fatal error', literals=['panic', 'fatal error']),
+    ConsoleRule('address_in_use', r'address already in use', literals=['address already in use']),
+]
+
+_REGEX_METACHARACTERS = set('.^$*+?{}[]\\|()')
+# 可以直接在原始JSON帧上预筛的字面量（不含会被JSON转义的字符）
+_RAW_SAFE_LITERAL = re.compile(r'[A-Za-z0-9 _\-.:/=,;!@#%()\[\]]+')
+
+def load_console_rules(path: str) -> List[ConsoleRule]:
+    """从JSON文件加载控制台触发规则"""
+    with open(path, encoding='utf-8') as f:
+        items = json.load(f)
+    rules = []
+    for item in items:
+        rule = ConsoleRule(**item)
+        if rule.action not in CONSOLE_RULE_ACTIONS:
+            raise ValueError(f"规则 {rule.name} 的动作无效: {rule.action}")
+        re.compile(rule.pattern)
+        rules.append(rule)
+    return rules
+
+def _literal_trie_pattern(literals: List[str]) -> str:
+    """把字面量合并为前缀树形式的正则，每个位置只沿一条分支匹配"""
+    trie: Dict[str, Any] = {}
+    for literal in literals:
+        node = trie
+        for ch in literal:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+        
+    def build(node: Dict[str, Any]) -> str:
+        # 只需判断是否存在，较短的字面量匹配即可结束
+        if '' in node:
+            return ''
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items())]
+        return branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        
+    return build(trie)
+
+class ConsoleRuleEngine:
+    """控制台触发规则引擎
+    
+    所有规则的字面量合并为一个多模式匹配器（已安装pyahocorasick时使用Aho-Corasick，
+    否则使用前缀树形式的单个正则），每行只扫描一次；命中后再用对应规则的正则确认。
+    """
+    INLINE_LITERALS = 8
+    
+    def __init__(self, rules: List[ConsoleRule]):
+        self.rules = rules
+        self._confirm = [
+            re.compile(rule.pattern, re.IGNORECASE if rule.ignore_case else 0) for rule in rules
+        ]
+        self._literal_rules: Dict[str, List[int]] = {}
+        self._always: List[int] = []
+        for index, rule in enumerate(rules):
+            literals = rule.literals or self._derive_literals(rule.pattern)
+            if not literals:
+                self._always.append(index)
+            for literal in literals:
+                self._literal_rules.setdefault(literal.lower(), []).append(index)
+                
+        self._automaton = None
+        self._prefilter = None
+        if self._literal_rules:
+            if ahocorasick is not None:
+                self._automaton = ahocorasick.Automaton()
+                for literal, indexes in self._literal_rules.items():
+                    self._automaton.add_word(literal, indexes)
+                self._automaton.make_automaton()
+            # 字面量统一小写，匹配前把行转为小写，避免IGNORECASE拖慢正则的前缀扫描
+            self._prefilter = re.compile(_literal_trie_pattern(list(self._literal_rules)))
+        # 没有"总是检查"的规则且字面量都不会被JSON转义时，可在解码前用原始帧预筛
+        self._raw_prefilter = not self._always and all(
+            _RAW_SAFE_LITERAL.fullmatch(literal) for literal in self._literal_rules
+        )
+        # 字面量不多时逐个用in查找比正则快，原始帧预筛走这条路径
+        self._raw_literals: Optional[Tuple[str, ...]] = None
+        if self._raw_prefilter and len(self._literal_rules) <= self.INLINE_LITERALS:
+            self._raw_literals = tuple(self._literal_rules)
+        self.counters = {'lines': 0, 'prefilter_hits': 0, 'matches': 0}
+        
+    @staticmethod
+    def _derive_literals(pattern: str) -> List[str]:
+        """纯字面量的pattern可直接作为预筛字面量"""
+        if pattern and not _REGEX_METACHARACTERS.intersection(pattern):
+            return [pattern]
+        return []
+        
+    def wants(self, frame: str) -> bool:
+        """根据原始帧粗判是否可能命中规则"""
+        if not self.rules:
+            return False
+        if not self._raw_prefilter:
+            return True
+        lowered = frame.lower()
+        if self._raw_literals is not None:
+            for literal in self._raw_literals:
+                if literal in lowered:
+                    return True
+            return False
+        return self._prefilter.search(lowered) is not None
+        
+    def match(self, line: str) -> List[ConsoleRule]:
+        """返回该行命中的规则"""
+        self.counters['lines'] += 1
+        candidates = set(self._always)
+        lowered = line.lower()
+        if self._prefilter is not None and self._prefilter.search(lowered):
+            self.counters['prefilter_hits'] += 1
+            if self._automaton is not None:
+                for _, indexes in self._automaton.iter(lowered):
+                    candidates.update(indexes)
+            else:
+                for literal, indexes in self._literal_rules.items():
+                    if literal in lowered:
+                        candidates.update(indexes)
+        matched = [self.rules[i] for i in sorted(candidates) if self._confirm[i].search(line)]
+        self.counters['matches'] += len(matched)
+        return matched
+
+class TokenBucket:
+    """令牌桶"""
+    
+    def __init__(self, rate: float, burst: float, now: Optional[float] = None, clock: Optional[Clock] = None):
+        self.clock = clock or REAL_CLOCK
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self._updated = self.clock.monotonic() if now is None else now
+        
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+        self._updated = now
+        
+    def consume(self, tokens: float = 1, now: Optional[float] = None) -> bool:
+        """尝试取出令牌，不足时返回False"""
+        self._refill(self.clock.monotonic() if now is None else now)
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+class ConsoleFloodControl:
+    """控制台限流：令牌桶限速，超限后每N行采样1行，其余丢弃并定期汇总"""
+    SUMMARY_INTERVAL = 10.0
+    RECHECK_LINES = 64
+    
+    def __init__(self, rate: float, burst: int, sample_every: int, clock: Optional[Clock] = None):
+        self.clock = clock or REAL_CLOCK
+        self.enabled = rate > 0
+        self.bucket = TokenBucket(rate, max(1, burst), clock=self.clock)
+        self.sample_every = max(1, sample_every)
+        self._summary_at = 0.0
+        self._summary_dropped = 0
+        # 从桶中预先取出的整数令牌，用完之前放行只需计数，不读时钟也不补充令牌
+        self._credit = 0
+        # 超限的行数；超限后接下来的_skip行直接丢弃（不超过下一个采样行），同样只需计数
+        self._over_limit = 0
+        self._skip = 0
+        self.counters = {'passed': 0, 'sampled': 0, 'dropped': 0}
+        
+    def admit(self, now: Optional[float] = None) -> bool:
+        """判断该行是否继续处理"""
+        if not self.enabled:
+            return True
+        if self._credit:
+            self._credit -= 1
+            self.counters['passed'] += 1
+            return True
+        if self._skip:
+            self._skip -= 1
+            self._over_limit += 1
+            self.counters['dropped'] += 1
+            self._summary_dropped += 1
+            return False
+        now = self.clock.monotonic() if now is None else now
+        if self.bucket.consume(1, now):
+            self.counters['passed'] += 1
+            self._flush_summary(now)
+            # 还有未汇总的丢弃行时逐行检查，保证汇总能及时输出
+            if not self._summary_dropped:
+                self._credit = int(self.bucket.tokens)
+                self.bucket.tokens -= self._credit
+            return True
+        self._over_limit += 1
+        phase = (self._over_limit - 1) % self.sample_every
+        if phase == 0:
+            self.counters['sampled'] += 1
+        else:
+            self.counters['dropped'] += 1
+            self._summary_dropped += 1
+        # 至少每RECHECK_LINES行查一次令牌桶，避免采样间隔很大时补充的令牌长时间用不上
+        self._skip = min(self.sample_every - 1 - phase, self.RECHECK_LINES)
+        self._flush_summary(now)
+        return phase == 0
+        
+    def _flush_summary(self, now: float):
+        """定期汇总丢弃的行数"""
+        if self._summary_dropped and now - self._summary_at >= self.SUMMARY_INTERVAL:
+            logger.warning(f"控制台输出过多，已丢弃 {self._summary_dropped} 行（每 {self.sample_every} 行采样1行）")
+            self._summary_dropped = 0
+            self._summary_at = now
+
+class ConsoleRingBuffer:
+    """控制台环形缓冲区：按行保存console output原始帧（不截取、不解码），读取时再还原
+
+    行和时间戳成对存放在定长deque中，超出行数时由deque自动淘汰最旧的行；
+    内容大小按保存的帧长度累计，超出容量时从最旧的行开始淘汰，每次写入只做常数次记账。
+    """
+    
+    def __init__(self, capacity_bytes: int = 32768, max_lines: int = 512):
+        self.capacity = max(256, capacity_bytes)
+        self.max_lines = max(1, max_lines)
+        # 单行最多占用缓冲区的1/4，避免一行超长输出冲掉全部历史
+        self.max_line_bytes = min(65535, self.capacity // 4)
+        self._lines: deque = deque(maxlen=self.max_lines)
+        self._size = 0
+        # 累计写入的行数，调用方据此找出某个时刻之后新写入的行
+        self.appended = 0
+        
+    def __len__(self) -> int:
+        return len(self._lines)
+        
+    @property
+    def nbytes(self) -> int:
+        """当前保存的行内容大小"""
+        return self._size
+        
+    def append(self, line, timestamp: float):
+        """写入一行（原始帧、文本或字节）"""
+        if len(line) > self.max_line_bytes:
+            line = line[:self.max_line_bytes]
+        lines = self._lines
+        if len(lines) == self.max_lines:
+            self._size -= len(lines[0][1])
+        lines.append((timestamp, line))
+        self._size += len(line)
+        self.appended += 1
+        while self._size > self.capacity:
+            self._size -= len(lines.popleft()[1])
+            
+    def tail(self, n: int) -> List[Tuple[float, Any]]:
+        """最近n行，按时间顺序"""
+        n = max(0, min(n, len(self._lines)))
+        return list(itertools.islice(self._lines, len(self._lines) - n, None))
+        
+    def since(self, timestamp: float) -> List[Tuple[float, Any]]:
+        """指定时间之后的行，按时间顺序"""
+        entries = []
+        for entry in reversed(self._lines):
+            if entry[0] < timestamp:
+                break
+            entries.append(entry)
+        entries.reverse()
+        return entries
+
+def _console_payload(frame: str) -> Optional[str]:
+    """从console output原始帧中截取args[0]的JSON转义文本，不解码"""
+    start = frame.find('["')
+    end = frame.rfind('"]')
+    if start == -1 or end <= start:
+        return None
+    return frame[start + 2:end]
+
+def _decode_console_frame(frame: str) -> str:
+    """还原缓冲区中保存的console output原始帧（可能被截断）的文本"""
+    payload = _console_payload(frame)
+    if payload is None:
+        start = frame.find('["')
+        payload = frame[start + 2:] if start != -1 else frame
+    return _decode_console_payload(payload)
+
+def _decode_console_payload(data) -> str:
+    """还原缓冲区或归档中保存的JSON转义文本"""
+    text = data.decode('utf-8', 'replace') if isinstance(data, bytes) else data
+    try:
+        return json.loads(f'"{text}"')
+    except ValueError:
+        pass
+    # 超长行被截断在转义序列中间时去掉不完整的转义再解码，仍失败则按原样返回
+    cut = text.rfind('\\', max(0, len(text) - 6))
+    try:
+        return json.loads(f'"{text[:cut]}"') if cut != -1 else text
+    except ValueError:
+        return text
+
+# 归档索引记录: 块内首行时间、末行时间、块在段文件中的偏移、压缩后长度
+ARCHIVE_INDEX_RECORD = struct.Struct('<ddQI')
+
+class ConsoleArchive:
+    """控制台滚动压缩归档
+    
+    每个服务器一个目录，按段文件滚动保存。行以"时间\t转义文本"格式攒成块后用zlib压缩追加到
+    .seg文件，同时向同名.idx文件追加一条定长索引记录，查询时只解压时间范围内的块。
+    """
+    MAX_PENDING_BLOCKS = 4
+    
+    def __init__(self, directory: str, block_bytes: int = 65536, segment_bytes: int = 64 * 1024 * 1024,
+                 max_segments: int = 16, flush_interval: float = 60.0):
+        self.directory = directory
+        self.block_bytes = block_bytes
+        self.segment_bytes = segment_bytes
+        self.max_segments = max(1, max_segments)
+        self.flush_interval = flush_interval
+        self.counters = {'lines': 0, 'blocks': 0, 'bytes_in': 0, 'bytes_out': 0, 'errors': 0, 'dropped_bytes': 0}
+        self._pending = bytearray()
+        self._first_ts = 0.0
+        self._last_ts = 0.0
+        self._pending_since = 0.0
+        os.makedirs(directory, exist_ok=True)
+        segments = self.segments(directory)
+        self._segment = segments[-1] if segments else 0
+        
+    @staticmethod
+    def segments(directory: str) -> List[int]:
+        """目录中已有的段编号，从旧到新"""
+        if not os.path.isdir(directory):
+            return []
+        return sorted(int(name[:-4]) for name in os.listdir(directory)
+                      if name.endswith('.seg') and name[:-4].isdigit())
+        
+    @staticmethod
+    def _paths(directory: str, segment: int) -> Tuple[str, str]:
+        base = os.path.join(directory, f"{segment:08d}")
+        return base + '.seg', base + '.idx'
+        
+    def append(self, data: bytes, timestamp: float):
+        """追加一行（JSON转义后的文本，不含换行）"""
+        if not self._pending:
+            self._first_ts = timestamp
+            self._pending_since = timestamp
+        self._pending += f"{timestamp:.3f}\t".encode() + data + b"\n"
+        self._last_ts = timestamp
+        self.counters['lines'] += 1
+        if len(self._pending) >= self.block_bytes:
+            self.flush()
+        else:
+            self.flush_if_due(timestamp)
+            
+    def flush_if_due(self, now: float) -> float:
+        """缓存的行超过flush_interval时写入，返回距下一次需要检查的秒数"""
+        if not self._pending:
+            return self.flush_interval
+        age = now - self._pending_since
+        if age < self.flush_interval:
+            return self.flush_interval - age
+        self.flush()
+        return self.flush_interval
+            
+    def flush(self):
+        """把缓存的行压缩成一个块写入当前段，写入失败时保留缓存的行，下次再试"""
+        if not self._pending:
+            return
+        seg_path, idx_path = self._paths(self.directory, self._segment)
+        rolled = os.path.exists(seg_path) and os.path.getsize(seg_path) >= self.segment_bytes
+        if rolled:
+            self._segment += 1
+            seg_path, idx_path = self._paths(self.directory, self._segment)
+        block = zlib.compress(bytes(self._pending), 6)
+        try:
+            with open(seg_path, 'ab') as f:
+                offset = f.tell()
+                f.write(block)
+            # 先写数据后写索引，崩溃时段文件末尾最多多出一个无索引的块
+            with open(idx_path, 'ab') as f:
+                f.write(ARCHIVE_INDEX_RECORD.pack(self._first_ts, self._last_ts, offset, len(block)))
+        except OSError as e:
+            logger.error(f"❌ 写入控制台归档失败: {e}")
+            self.counters['errors'] += 1
+            # 按缓存时长重新计时，避免之后每一行都重试；磁盘一直不可写时只保留最近的若干块
+            self._pending_since = self._last_ts
+            if len(self._pending) > self.MAX_PENDING_BLOCKS * self.block_bytes:
+                self.counters['dropped_bytes'] += len(self._pending)
+                self._pending.clear()
+            return
+        self.counters['bytes_in'] += len(self._pending)
+        self._pending.clear()
+        self.counters['blocks'] += 1
+        self.counters['bytes_out'] += len(block)
+        if rolled:
+            self._prune()
+        
+    def _prune(self):
+        """删除超出保留数量的最旧段"""
+        for segment in self.segments(self.directory)[:-self.max_segments]:
+            for path in self._paths(self.directory, segment):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                    
+    @classmethod
+    def read_index(cls, directory: str, segment: int) -> List[Tuple[float, float, int, int]]:
+        """读取段的块索引"""
+        _, idx_path = cls._paths(directory, segment)
+        try:
+            with open(idx_path, 'rb') as f:
+                raw = f.read()
+        except OSError:
+            return []
+        usable = len(raw) - len(raw) % ARCHIVE_INDEX_RECORD.size
+        return list(ARCHIVE_INDEX_RECORD.iter_unpack(raw[:usable]))
+        
+    @classmethod
+    def query(cls, directory: str, start: float = 0.0, end: float = float('inf')):
+        """按时间范围读取归档，逐块解压，生成(时间, 行)"""
+        for segment in cls.segments(directory):
+            index = cls.read_index(directory, segment)
+            if not index or index[-1][1] < start or index[0][0] > end:
+                continue
+            seg_path, _ = cls._paths(directory, segment)
+            with open(seg_path, 'rb') as f:
+                for first_ts, last_ts, offset, length in index:
+                    if last_ts < start or first_ts > end:
+                        continue
+                    f.seek(offset)
+                    for raw in zlib.decompress(f.read(length)).split(b"\n"):
+                        stamp, _, data = raw.partition(b"\t")
+                        if not stamp:
+                            continue
+                        timestamp = float(stamp)
+                        if start <= timestamp <= end:
+                            yield timestamp, _decode_console_payload(data)
+
+# stats中记录的数值字段
+STATS_FIELDS = ('cpu_absolute', 'memory_bytes', 'memory_limit_bytes', 'disk_bytes',
+                'network_rx_bytes', 'network_tx_bytes', 'uptime')
+# 聚合层额外记录桶内最大值的字段
+STATS_MAX_FIELDS = ('cpu_absolute', 'memory_bytes')
+_STATS_MAX_INDEXES = tuple(STATS_FIELDS.index(name) for name in STATS_MAX_FIELDS)
+# 从StatsMessage按STATS_FIELDS顺序一次取出全部字段
+_stats_row = operator.attrgetter(*STATS_FIELDS)
+
+class TimeSeriesRing:
+    """定长时间序列：时间戳为float64数组，各列为float32数组，随写入增长，写满后覆盖最旧的点"""
+    
+    def __init__(self, capacity: int, columns: Tuple[str, ...]):
+        self.capacity = max(1, capacity)
+        self.columns = columns
+        self._times = array('d')
+        self._values = {name: array('f') for name in columns}
+        self._columns = list(self._values.values())
+        self._head = 0
+        self._count = 0
+        
+    def __len__(self) -> int:
+        return self._count
+        
+    def __getitem__(self, i: int) -> float:
+        """第i个点（0为最旧）的时间戳，供bisect在环上二分查找"""
+        return self._times[(self._head + i) % self.capacity]
+        
+    @property
+    def nbytes(self) -> int:
+        """已分配的数组大小，写满后不再增长"""
+        return (8 + 4 * len(self.columns)) * len(self._times)
+        
+    def append(self, timestamp: float, values: Dict[str, float]):
+        self.append_row(timestamp, [values.get(name, 0.0) for name in self.columns])
+        
+    def append_row(self, timestamp: float, row: Sequence[float]):
+        """按columns顺序写入一个点"""
+        if self._count < self.capacity:
+            # 未写满时_head始终为0，新点追加在数组末尾
+            self._count += 1
+            self._times.append(timestamp)
+            for column, value in zip(self._columns, row):
+                column.append(value)
+            return
+        index = self._head
+        self._head = (self._head + 1) % self.capacity
+        self._times[index] = timestamp
+        for column, value in zip(self._columns, row):
+            column[index] = value
+            
+    def range(self, column: str, start: float, end: float) -> List[Tuple[float, float]]:
+        """时间在[start, end]内的点"""
+        values = self._values[column]
+        first = bisect.bisect_left(self, start)
+        last = bisect.bisect_right(self, end)
+        result = []
+        for i in range(first, last):
+            index = (self._head + i) % self.capacity
+            result.append((self._times[index], values[index]))
+        return result
+        
+    def oldest(self) -> Optional[float]:
+        return self[0] if self._count else None
+        
+    def _tail(self, values: array, n: int) -> array:
+        """按时间顺序取最后n个点，只做数组切片"""
+        n = min(n, self._count)
+        end = (self._head + self._count) % self.capacity or self.capacity
+        if end >= n:
+            return values[end - n:end]
+        return values[self.capacity - (n - end):] + values[:end]
+        
+    def tail(self, column: str, n: int) -> Tuple[array, array]:
+        """最后n个点的(时间数组, 值数组)"""
+        return self._tail(self._times, n), self._tail(self._values[column], n)
+
+class _Downsampler:
+    """把细粒度的点累加到固定时长的桶，桶结束时输出均值和最大值"""
+    
+    def __init__(self, resolution: float):
+        self.resolution = resolution
+        self.bucket: Optional[float] = None
+        # 按STATS_FIELDS和STATS_MAX_FIELDS顺序排列的累加值和最大值
+        self.sums = [0.0] * len(STATS_FIELDS)
+        self.maxes = [0.0] * len(STATS_MAX_FIELDS)
+        self.weight = 0
+        
+    def add(self, timestamp: float, row: Sequence[float], weight: int = 1,
+            maxes: Optional[Sequence[float]] = None) -> Optional[Tuple[float, Dict[str, float], int]]:
+        """加入一个点（按STATS_FIELDS顺序的值）；跨入新桶时返回上一个桶的(桶开始时间, 聚合值, 点数)"""
+        bucket = timestamp - timestamp % self.resolution
+        completed = None
+        if bucket != self.bucket:
+            if self.bucket is not None:
+                completed = self.flush()
+            self.bucket = bucket
+        if weight == 1:
+            self.sums = list(map(operator.add, self.sums, row))
+        else:
+            self.sums = [total + value * weight for total, value in zip(self.sums, row)]
+        if maxes is None:
+            maxes = [row[i] for i in _STATS_MAX_INDEXES]
+        self.maxes = list(map(max, self.maxes, maxes)) if self.weight else list(maxes)
+        self.weight += weight
+        return completed
+        
+    def flush(self) -> Optional[Tuple[float, Dict[str, float], int]]:
+        if self.bucket is None or not self.weight:
+            return None
+        result = {name: total / self.weight for name, total in zip(STATS_FIELDS, self.sums)}
+        for name, peak in zip(STATS_MAX_FIELDS, self.maxes):
+            result[f'{name}_max'] = peak
+        completed = (self.bucket, result, self.weight)
+        self.bucket = None
+        self.sums = [0.0] * len(STATS_FIELDS)
+        self.weight = 0
+        return completed
+
+class StatsStore:
+    """单台服务器的stats时间序列：原始点、1分钟聚合、1小时聚合三层，各层写满后内存不再增长"""
+    
+    TIERS = ('raw', '1m', '1h')
+    RESOLUTIONS = {'raw': 0.0, '1m': 60.0, '1h': 3600.0}
+    
+    def __init__(self, raw_points: int = 600, minute_points: int = 720, hour_points: int = 720):
+        aggregated = STATS_FIELDS + tuple(f'{name}_max' for name in STATS_MAX_FIELDS)
+        self.tiers = {
+            'raw': TimeSeriesRing(raw_points, STATS_FIELDS),
+            '1m': TimeSeriesRing(minute_points, aggregated),
+            '1h': TimeSeriesRing(hour_points, aggregated),
+        }
+        self._minute = _Downsampler(60)
+        self._hour = _Downsampler(3600)
+        self._latest: Sequence[float] = ()
+        self.latest_time = 0.0
+        
+    @property
+    def nbytes(self) -> int:
+        return sum(tier.nbytes for tier in self.tiers.values())
+        
+    @property
+    def latest(self) -> Dict[str, float]:
+        """最近一个原始点"""
+        return dict(zip(STATS_FIELDS, self._latest))
+        
+    def add(self, timestamp: float, values: Dict[str, float]):
+        """写入一个原始点，并滚动更新聚合层"""
+        self.add_row(timestamp, [values.get(name, 0.0) for name in STATS_FIELDS])
+        
+    def add_row(self, timestamp: float, row: Sequence[float]):
+        """按STATS_FIELDS顺序写入一个原始点（stats事件的热路径，不构造字典）"""
+        self.tiers['raw'].append_row(timestamp, row)
+        self._latest = row
+        self.latest_time = timestamp
+        minute = self._minute.add(timestamp, row)
+        if minute:
+            self._add_minute(*minute)
+            
+    def _add_minute(self, bucket: float, values: Dict[str, float], weight: int):
+        self.tiers['1m'].append(bucket, values)
+        row = [values[name] for name in STATS_FIELDS]
+        maxes = [values[f'{name}_max'] for name in STATS_MAX_FIELDS]
+        hour = self._hour.add(bucket, row, weight, maxes)
+        if hour:
+            self.tiers['1h'].append(hour[0], hour[1])
+            
+    def _covered_from(self, tier: str) -> float:
+        return self.tiers[tier].oldest() + self.RESOLUTIONS[tier]
+        
+    def query(self, field: str, start: float, end: Optional[float] = None,
+              tier: Optional[str] = None) -> Tuple[str, List[Tuple[float, float]]]:
+        """范围查询，未指定层时选择仍覆盖start的最细层；字段可加_max后缀读取聚合层的最大值"""
+        if end is None:
+            end = float('inf')
+        if tier is None:
+            # 没有层能覆盖start时（刚启动），选历史最长的层。聚合点的时间是桶的开始时间，
+            # 桶内的第一个原始点可能晚得多，按桶结束时间保守估计该层的覆盖范围
+            candidates = [name for name in self.TIERS
+                          if field in self.tiers[name].columns and len(self.tiers[name])]
+            tier = candidates[0] if candidates else self.TIERS[0]
+            for name in candidates:
+                if self._covered_from(name) <= start:
+                    tier = name
+                    break
+                if self._covered_from(name) < self._covered_from(tier):
+                    tier = name
+        if tier not in self.tiers:
+            raise ValueError(f"未知的时间序列层: {tier}")
+        if field not in self.tiers[tier].columns:
+            raise ValueError(f"未知的stats字段: {field}")
+        return tier, self.tiers[tier].range(field, start, end)
+
+@dataclass
+class Anomaly:
+    """一次异常检测结果"""
+    server: str
+    kind: str  # cpu_spike / memory_spike / memory_leak / memory_saturation / cpu_saturation
+    value: float
+    detail: str = ""
+
+class AnomalyDetector:
+    """对所有服务器的最近窗口一次性计算z-score、内存增长斜率和饱和度
+    
+    输入是按服务器排列的矩阵（每行一个服务器、每列一个采样点），安装numpy时整批向量化计算，
+    否则逐行计算同样的公式。
+    """
+    
+    # 饱和度取最后几个点的均值，避免单点毛刺
+    SATURATION_POINTS = 5
+    # 内存增长与时间的相关系数下限，低于该值视为正常波动而不是泄漏
+    LEAK_MIN_CORRELATION = 0.9
+    
+    def __init__(self, zscore: float = 4.0, leak_rate: float = 0.2,
+                 memory_saturation: float = 0.95, cpu_saturation: float = 95.0):
+        self.zscore = zscore
+        self.leak_rate = leak_rate
+        self.memory_saturation = memory_saturation
+        self.cpu_saturation = cpu_saturation
+        
+    def analyze(self, servers: List[str], times, cpu, memory, limits,
+                cpu_limits: Optional[List[float]] = None, trend=None) -> List[Anomaly]:
+        """times/cpu/memory为形状相同的二维数据，limits为每台服务器最新的内存上限
+        
+        cpu_limits为每台服务器的CPU限制（%，100为一个核心，0为未知），cpu_absolute按核心累加，
+        只有已知限制时才换算成占限制的百分比判断CPU饱和。trend为(时间行, 内存行)，用于判断泄漏，
+        行为None的服务器不判断泄漏；不提供时用times/memory。
+        """
+        if not servers:
+            return []
+        if cpu_limits is None:
+            cpu_limits = [0.0] * len(servers)
+        trend_times, trend_memory = trend if trend is not None else (times, memory)
+        rows = [i for i, row in enumerate(trend_memory) if row is not None and len(row) > 1]
+        growth = [0.0] * len(servers)
+        correlation = [0.0] * len(servers)
+        if numpy is not None:
+            scores = self._scores_numpy(times, cpu, memory, limits)
+            trends = self._trend_numpy([trend_times[i] for i in rows], [trend_memory[i] for i in rows],
+                                       [limits[i] for i in rows]) if rows else ([], [])
+        else:
+            scores = self._scores_python(times, cpu, memory, limits)
+            trends = self._trend_python([trend_times[i] for i in rows], [trend_memory[i] for i in rows],
+                                        [limits[i] for i in rows])
+        for i, row_growth, row_correlation in zip(rows, *trends):
+            growth[i] = row_growth
+            correlation[i] = row_correlation
+        return self._judge(servers, *scores, growth, correlation, cpu_limits)
+        
+    @staticmethod
+    def _matrix(rows):
+        # 行是等长的array时把底层字节整体拼接后一次转换，不逐行、逐元素转换
+        if isinstance(rows[0], array):
+            dtype = 'f4' if rows[0].typecode == 'f' else 'f8'
+            flat = numpy.frombuffer(b''.join(rows), dtype=dtype)
+            return flat.reshape(len(rows), -1).astype(numpy.float64)
+        return numpy.asarray(rows, dtype=numpy.float64)
+        
+    def _scores_numpy(self, times, cpu, memory, limits):
+        """返回(cpu_z, memory_z, 内存饱和度, cpu均值)，每项一维"""
+        cpu = self._matrix(cpu)
+        memory = self._matrix(memory)
+        limits = numpy.asarray(limits, dtype=numpy.float64)
+        
+        def zscores(matrix):
+            history = matrix[:, :-1]
+            std = history.std(axis=1)
+            z = (matrix[:, -1] - history.mean(axis=1)) / numpy.where(std > 0, std, 1.0)
+            return numpy.where(std > 0, z, 0.0)
+            
+        safe_limits = numpy.where(limits > 0, limits, numpy.inf)
+        recent = self.SATURATION_POINTS
+        saturation = memory[:, -recent:].mean(axis=1) / safe_limits
+        # 转成列表后判定阶段按下标取值不必逐个构造numpy标量
+        return tuple(column.tolist() for column in (
+            zscores(cpu), zscores(memory), saturation, cpu[:, -recent:].mean(axis=1)
+        ))
+        
+    def _trend_numpy(self, times, memory, limits):
+        """返回(每小时增长占上限比例, 相关系数)，每项一维"""
+        times = self._matrix(times)
+        memory = self._matrix(memory)
+        limits = numpy.asarray(limits, dtype=numpy.float64)
+        t = times - times.mean(axis=1, keepdims=True)
+        m = memory - memory.mean(axis=1, keepdims=True)
+        var_t = (t * t).sum(axis=1)
+        var_m = (m * m).sum(axis=1)
+        cov = (t * m).sum(axis=1)
+        slope = cov / numpy.where(var_t > 0, var_t, 1.0)
+        denominator = numpy.sqrt(var_t * var_m)
+        correlation = numpy.where(denominator > 0, cov / numpy.where(denominator > 0, denominator, 1.0), 0.0)
+        growth = slope * 3600 / numpy.where(limits > 0, limits, numpy.inf)
+        return growth.tolist(), correlation.tolist()
+                
+    def _scores_python(self, times, cpu, memory, limits):
+        """无numpy时逐行计算，公式与_scores_numpy一致"""
+        def zscore(row):
+            history = row[:-1]
+            mean = sum(history) / len(history)
+            std = (sum((x - mean) ** 2 for x in history) / len(history)) ** 0.5
+            return (row[-1] - mean) / std if std > 0 else 0.0
+            
+        columns = ([], [], [], [])
+        recent = self.SATURATION_POINTS
+        for c_row, m_row, limit in zip(cpu, memory, limits):
+            safe_limit = limit if limit > 0 else float('inf')
+            tail = m_row[-recent:]
+            cpu_tail = c_row[-recent:]
+            for column, value in zip(columns, (
+                zscore(c_row), zscore(m_row),
+                sum(tail) / len(tail) / safe_limit, sum(cpu_tail) / len(cpu_tail),
+            )):
+                column.append(value)
+        return columns
+        
+    def _trend_python(self, times, memory, limits):
+        """无numpy时逐行计算，公式与_trend_numpy一致"""
+        growth, correlation = [], []
+        for t_row, m_row, limit in zip(times, memory, limits):
+            t_mean = sum(t_row) / len(t_row)
+            m_mean = sum(m_row) / len(m_row)
+            var_t = sum((t - t_mean) ** 2 for t in t_row)
+            var_m = sum((m - m_mean) ** 2 for m in m_row)
+            cov = sum((t - t_mean) * (m - m_mean) for t, m in zip(t_row, m_row))
+            slope = cov / var_t if var_t > 0 else 0.0
+            denominator = (var_t * var_m) ** 0.5
+            growth.append(slope * 3600 / (limit if limit > 0 else float('inf')))
+            correlation.append(cov / denominator if denominator > 0 else 0.0)
+        return growth, correlation
+        
+    def _judge(self, servers, cpu_z, memory_z, saturation, cpu_recent, growth, correlation,
+               cpu_limits) -> List[Anomaly]:
+        """按阈值挑出异常，这一步只遍历结果向量"""
+        anomalies = []
+        for i, server in enumerate(servers):
+            if saturation[i] >= self.memory_saturation:
+                anomalies.append(Anomaly(server, 'memory_saturation', float(saturation[i]),
+                                         f"内存使用率 {saturation[i]:.1%}"))
+            elif growth[i] >= self.leak_rate and correlation[i] >= self.LEAK_MIN_CORRELATION:
+                anomalies.append(Anomaly(server, 'memory_leak', float(growth[i]),
+                                         f"内存持续增长 每小时{growth[i]:.1%}上限"))
+            elif memory_z[i] >= self.zscore:
+                anomalies.append(Anomaly(server, 'memory_spike', float(memory_z[i]),
+                                         f"内存突增 z={memory_z[i]:.1f}"))
+            usage = cpu_recent[i] * 100 / cpu_limits[i] if cpu_limits[i] > 0 else 0.0
+            if usage >= self.cpu_saturation:
+                anomalies.append(Anomaly(server, 'cpu_saturation', float(usage),
+                                         f"CPU持续 {usage:.0f}%（限制 {cpu_limits[i]:.0f}%）"))
+            elif cpu_z[i] >= self.zscore:
+                anomalies.append(Anomaly(server, 'cpu_spike', float(cpu_z[i]), f"CPU突增 z={cpu_z[i]:.1f}"))
+        return anomalies
+
+class FleetAnalyzer:
+    """进程内所有监控器的周期性资源异常检测"""
+    
+    def __init__(self, detector: AnomalyDetector, window: int = 120, interval: float = 60.0,
+                 clock: Optional[Clock] = None, leak_window: int = 30):
+        self.detector = detector
+        self.clock = clock or REAL_CLOCK
+        self.window = max(self.detector.SATURATION_POINTS + 1, window)
+        self.interval = interval
+        # 泄漏按1分钟聚合层最近leak_window个点判断，启动、JVM预热等短时间的内存爬升不会被当成泄漏
+        self.leak_window = max(2, leak_window)
+        # 按服务器UUID登记监控器，弱引用避免阻止监控器回收
+        self.monitors: 'weakref.WeakValueDictionary[str, VPSMonitor]' = weakref.WeakValueDictionary()
+        self.counters = {'runs': 0, 'servers': 0, 'anomalies': 0}
+        
+    def register(self, monitor: 'VPSMonitor'):
+        self.monitors[monitor.config.server_uuid or str(id(monitor))] = monitor
+        
+    def collect(self) -> Tuple[List[str], list, list, list, list, list, Tuple[list, list]]:
+        """取每台服务器最近window个原始点组成矩阵，点数不足的服务器本轮跳过；
+        1分钟聚合层不足leak_window个点的服务器，趋势行为None"""
+        servers, times, cpu, memory, limits, cpu_limits = [], [], [], [], [], []
+        trend_times, trend_memory = [], []
+        for server, monitor in list(self.monitors.items()):
+            raw = monitor.stats_store.tiers['raw']
+            if len(raw) < self.window:
+                continue
+            t, c = raw.tail('cpu_absolute', self.window)
+            _, m = raw.tail('memory_bytes', self.window)
+            servers.append(server)
+            times.append(t)
+            cpu.append(c)
+            memory.append(m)
+            limits.append(monitor.stats_store.latest.get('memory_limit_bytes', 0.0))
+            cpu_limits.append(monitor.config.server_cpu_limit)
+            minute = monitor.stats_store.tiers['1m']
+            if len(minute) >= self.leak_window:
+                t, m = minute.tail('memory_bytes', self.leak_window)
+            else:
+                t = m = None
+            trend_times.append(t)
+            trend_memory.append(m)
+        return servers, times, cpu, memory, limits, cpu_limits, (trend_times, trend_memory)
+        
+    async def analyze_once(self) -> List[Anomaly]:
+        """执行一轮检测并交给对应监控器处理"""
+        servers, *series = self.collect()
+        anomalies = self.detector.analyze(servers, *series)
+        self.counters['runs'] += 1
+        self.counters['servers'] = len(servers)
+        self.counters['anomalies'] += len(anomalies)
+        for anomaly in anomalies:
+            monitor = self.monitors.get(anomaly.server)
+            if monitor is not None:
+                await monitor.handle_anomaly(anomaly)
+        return anomalies
+        
+    async def run(self):
+        """周期运行，直到被取消"""
+        while True:
+            await self.clock.sleep(self.interval)
+            try:
+                await self.analyze_once()
+            except Exception as e:
+                logger.error(f"异常检测失败: {e}")
+
+def parse_maintenance_window(text: str) -> Tuple[int, int]:
+    """解析"HH:MM-HH:MM"格式的维护窗口，返回(开始分钟, 结束分钟)，允许跨午夜"""
+    match = re.fullmatch(r'\s*(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})\s*', text)
+    if not match:
+        raise ValueError(f"维护窗口格式错误: {text}")
+    start_h, start_m, end_h, end_m = (int(part) for part in match.groups())
+    if start_h > 23 or end_h > 24 or start_m > 59 or end_m > 59:
+        raise ValueError(f"维护窗口格式错误: {text}")
+    return start_h * 60 + start_m, end_h * 60 + end_m
+
+def next_window_start(now: float, window: Tuple[int, int]) -> float:
+    """now之后最近一次维护窗口的开始时间；当前已在窗口内时返回now"""
+    start, end = window
+    local = time.localtime(now)
+    minute = local.tm_hour * 60 + local.tm_min
+    inside = start <= minute < end if start < end else (minute >= start or minute < end)
+    if inside:
+        return now
+    midnight = time.mktime((local.tm_year, local.tm_mon, local.tm_mday, 0, 0, 0, 0, 0, -1))
+    candidate = midnight + start * 60
+    if candidate <= now:
+        candidate = time.mktime((local.tm_year, local.tm_mon, local.tm_mday + 1, 0, 0, 0, 0, 0, -1)) + start * 60
+    return candidate
+
+@dataclass
+class RestartPlan:
+    """一次预防性重启计划"""
+    at: float  # 计划重启时间
+    oom_at: float  # 预计OOM时间
+    reason: str
+
+class RestartPlanner:
+    """根据内存增长趋势预测OOM，在维护窗口或OOM之前安排重启"""
+    
+    # 样本点下限和线性拟合相关系数下限，波动的内存曲线不做预测
+    MIN_POINTS = 10
+    MIN_CORRELATION = 0.9
+    
+    def __init__(self, window: Tuple[int, int], horizon: float = 86400, margin: float = 900,
+                 oom_ratio: float = 0.98):
+        self.window = window
+        self.horizon = horizon
+        self.margin = margin
+        self.oom_ratio = oom_ratio
+        
+    @staticmethod
+    def fit(points: List[Tuple[float, float]]) -> Tuple[float, float]:
+        """最小二乘拟合，返回(斜率 字节/秒, 相关系数)"""
+        n = len(points)
+        t_mean = sum(t for t, _ in points) / n
+        m_mean = sum(m for _, m in points) / n
+        var_t = sum((t - t_mean) ** 2 for t, _ in points)
+        var_m = sum((m - m_mean) ** 2 for _, m in points)
+        cov = sum((t - t_mean) * (m - m_mean) for t, m in points)
+        if var_t <= 0 or var_m <= 0:
+            return 0.0, 0.0
+        return cov / var_t, cov / (var_t * var_m) ** 0.5
+        
+    def plan(self, now: float, points: List[Tuple[float, float]], limit: float) -> Optional[RestartPlan]:
+        """points为(时间, 内存字节)；不需要重启时返回None"""
+        if limit <= 0 or len(points) < self.MIN_POINTS:
+            return None
+        slope, correlation = self.fit(points)
+        if slope <= 0 or correlation < self.MIN_CORRELATION:
+            return None
+        current = points[-1][1]
+        oom_at = now + max(0.0, (limit * self.oom_ratio - current) / slope)
+        if oom_at - now > self.horizon:
+            return None
+        deadline = oom_at - self.margin
+        window_at = next_window_start(now, self.window)
+        if window_at <= deadline:
+            return RestartPlan(window_at, oom_at, "维护窗口")
+        # 维护窗口来不及，在OOM之前尽早重启
+        return RestartPlan(max(now, deadline), oom_at, "OOM前")
+
+def jwt_expiry(token: str) -> Optional[float]:
+    """读取JWT的exp字段（不校验签名），无法解析时返回None"""
+    try:
+        payload = token.split('.')[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+        return float(claims['exp'])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+def write_checkpoint(path: str, state: Dict[str, Any]):
+    """原子写入检查点：先写同目录临时文件并落盘，再替换正式文件"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def read_checkpoint(path: str) -> Optional[Dict[str, Any]]:
+    """读取检查点，不存在或损坏时返回None"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"读取检查点失败: {e}")
+        return None
+    return state if isinstance(state, dict) else None
+
+# 事件日志中的服务器状态，索引中按下标存储；unknown表示监控器未运行、状态未知
+JOURNAL_STATES = ('unknown', 'offline', 'starting', 'running', 'stopping')
+# 索引检查点: 时间、下一条记录的文件偏移、该时刻状态、累计运行秒数、累计离线秒数、累计掉线次数
+JOURNAL_CHECKPOINT = struct.Struct('<dQBddI')
+
+class EventJournal:
+    """服务器状态变化和电源操作的追加式JSONL日志
+    
+    每N条记录向同名.idx文件追加一个检查点，保存到该时刻为止的累计运行/离线时间和掉线次数。
+    查询任意时刻的累计值只需二分找到前一个检查点，再读取其后不超过N条记录。
+    """
+    
+    def __init__(self, path: str, checkpoint_every: int = 256, clock: Optional[Clock] = None):
+        self.clock = clock or REAL_CLOCK
+        self.path = path
+        self.index_path = path + '.idx'
+        self.checkpoint_every = max(1, checkpoint_every)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._checkpoints = self._load_checkpoints()
+        self._checkpoint_times = [checkpoint[0] for checkpoint in self._checkpoints]
+        # 恢复写入状态：从最后一个检查点向后重放
+        self.state, self.since, self.uptime, self.downtime, self.flaps, self._uncheckpointed = self._replay(
+            self._checkpoints[-1] if self._checkpoints else None, float('inf')
+        )
+        self._file = open(path, 'ab')
+        
+    def _load_checkpoints(self) -> List[Tuple[float, int, int, float, float, int]]:
+        try:
+            with open(self.index_path, 'rb') as f:
+                raw = f.read()
+        except OSError:
+            return []
+        usable = len(raw) - len(raw) % JOURNAL_CHECKPOINT.size
+        return list(JOURNAL_CHECKPOINT.iter_unpack(raw[:usable]))
+        
+    @staticmethod
+    def _advance(totals: list, timestamp: float):
+        """把[state, since, uptime, downtime, flaps]推进到timestamp"""
+        state, since = totals[0], totals[1]
+        if since is not None and timestamp > since:
+            if state == 'running':
+                totals[2] += timestamp - since
+            elif state == 'offline':
+                totals[3] += timestamp - since
+        totals[1] = timestamp
+        
+    @classmethod
+    def _apply(cls, totals: list, record: Dict[str, Any]):
+        """按一条记录更新累计值"""
+        if record.get('type') not in ('status', 'monitor'):
+            return
+        cls._advance(totals, record['t'])
+        state = record.get('state', 'unknown')
+        if totals[0] == 'running' and state != 'running' and record['type'] == 'status':
+            totals[4] += 1
+        totals[0] = state
+        
+    def _replay(self, checkpoint, until: float):
+        """从检查点（或文件开头）重放到until之前，返回(状态, 状态开始时间, 运行秒数, 离线秒数, 掉线次数, 重放记录数)"""
+        if checkpoint:
+            timestamp, offset, state, uptime, downtime, flaps = checkpoint
+            totals = [JOURNAL_STATES[state], timestamp, uptime, downtime, flaps]
+        else:
+            offset = 0
+            totals = ['unknown', None, 0.0, 0.0, 0]
+        records = 0
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(offset)
+                for raw in f:
+                    try:
+                        record = json.loads(raw)
+                    except ValueError:
+                        # 崩溃时可能留下半行
+                        continue
+                    if record['t'] > until:
+                        break
+                    self._apply(totals, record)
+                    records += 1
+        except OSError:
+            pass
+        return (*totals, records)
+        
+    def append(self, record: Dict[str, Any]):
+        """追加一条记录，需要时写检查点"""
+        self._apply_live(record)
+        self._file.write(json.dumps(record, ensure_ascii=False).encode() + b"\n")
+        self._file.flush()
+        self._uncheckpointed += 1
+        if self._uncheckpointed >= self.checkpoint_every:
+            state = JOURNAL_STATES.index(self.state) if self.state in JOURNAL_STATES else 0
+            # 累计值只算到最后一条状态记录，检查点记录的是record['t']时刻，需先推进到该时刻，
+            # 否则检查点落在电源操作等记录上时，其间的运行/离线时间会在重放时丢失
+            totals = [self.state, self.since, self.uptime, self.downtime, self.flaps]
+            self._advance(totals, record['t'])
+            checkpoint = (record['t'], self._file.tell(), state, totals[2], totals[3], self.flaps)
+            with open(self.index_path, 'ab') as f:
+                f.write(JOURNAL_CHECKPOINT.pack(*checkpoint))
+            self._checkpoints.append(checkpoint)
+            self._checkpoint_times.append(record['t'])
+            self._uncheckpointed = 0
+            
+    def _apply_live(self, record: Dict[str, Any]):
+        totals = [self.state, self.since, self.uptime, self.downtime, self.flaps]
+        self._apply(totals, record)
+        self.state, self.since, self.uptime, self.downtime, self.flaps = totals
+        
+    def record_status(self, state: str, timestamp: Optional[float] = None):
+        self.append({'t': self.clock.time() if timestamp is None else timestamp, 'type': 'status', 'state': state})
+        
+    def record_power(self, action: str, ok: bool, timestamp: Optional[float] = None):
+        self.append({'t': self.clock.time() if timestamp is None else timestamp, 'type': 'power', 'action': action, 'ok': ok})
+        
+    def record_monitor(self, event: str, timestamp: Optional[float] = None):
+        """监控器启停；停止后状态记为unknown，不计入运行或离线时间"""
+        self.append({'t': self.clock.time() if timestamp is None else timestamp, 'type': 'monitor', 'event': event, 'state': 'unknown'})
+        
+    def totals_at(self, timestamp: float) -> Tuple[float, float, int]:
+        """截至timestamp的(累计运行秒数, 累计离线秒数, 累计掉线次数)"""
+        position = bisect.bisect_right(self._checkpoint_times, timestamp)
+        checkpoint = self._checkpoints[position - 1] if position else None
+        state, since, uptime, downtime, flaps, _ = self._replay(checkpoint, timestamp)
+        totals = [state, since, uptime, downtime, flaps]
+        self._advance(totals, timestamp)
+        return totals[2], totals[3], totals[4]
+        
+    def availability(self, start: float, end: Optional[float] = None) -> Dict[str, float]:
+        """时间窗口内的可用率、运行/离线时长和掉线次数；可用率只按状态已知的时间计算"""
+        end = self.clock.time() if end is None else end
+        up_start, down_start, flaps_start = self.totals_at(start)
+        up_end, down_end, flaps_end = self.totals_at(end)
+        uptime = up_end - up_start
+        downtime = down_end - down_start
+        known = uptime + downtime
+        return {
+            'availability': uptime / known if known > 0 else 1.0,
+            'uptime': uptime,
+            'downtime': downtime,
+            'flaps': flaps_end - flaps_start,
+        }
+        
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+WS_CAPTURE_MAGIC = b'WSCAP1\n'
+WS_CAPTURE_RECORD = struct.Struct('<dI')
+WS_CAPTURE_BINARY = 0x80000000
+
+class WebSocketCapture:
+    """录制WebSocket原始帧，供ws_replay.py离线回放
+
+    文件以WS_CAPTURE_MAGIC开头，每帧一条记录：<接收时间 double><长度 uint32><帧内容>，
+    长度最高位标记二进制帧。达到大小上限后停止录制，不会写满磁盘。
+    """
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'ab')
+        if self._file.tell() == 0:
+            self._file.write(WS_CAPTURE_MAGIC)
+        self.counters = {'frames': 0, 'bytes': self._file.tell(), 'dropped': 0}
+
+    def write(self, message, timestamp: Optional[float] = None):
+        if isinstance(message, str):
+            data, flag = message.encode('utf-8'), 0
+        else:
+            data, flag = bytes(message), WS_CAPTURE_BINARY
+        size = WS_CAPTURE_RECORD.size + len(data)
+        if self._file.closed or self.counters['bytes'] + size > self.max_bytes:
+            self.counters['dropped'] += 1
+            return
+        self._file.write(WS_CAPTURE_RECORD.pack(time.time() if timestamp is None else timestamp, len(data) | flag))
+        self._file.write(data)
+        self.counters['frames'] += 1
+        self.counters['bytes'] += size
+
+    def flush(self):
+        if not self._file.closed:
+            self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    @staticmethod
+    def read(path: str):
+        """按顺序产出(接收时间, 帧)；文本帧为str，二进制帧为bytes，末尾不完整的记录被忽略"""
+        with open(path, 'rb') as f:
+            if f.read(len(WS_CAPTURE_MAGIC)) != WS_CAPTURE_MAGIC:
+                raise ValueError(f"不是WebSocket录制文件: {path}")
+            while True:
+                header = f.read(WS_CAPTURE_RECORD.size)
+                if len(header) < WS_CAPTURE_RECORD.size:
+                    return
+                timestamp, length = WS_CAPTURE_RECORD.unpack(header)
+                data = f.read(length & ~WS_CAPTURE_BINARY)
+                if len(data) < length & ~WS_CAPTURE_BINARY:
+                    return
+                yield timestamp, data if length & WS_CAPTURE_BINARY else data.decode('utf-8')
+
+LOOP_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+class LoopLagMonitor:
+    """事件循环延迟采样和阻塞检测
+    
+    采样协程每interval秒醒来一次，比预期晚醒的时间即为循环延迟，计入直方图，超过warn_threshold时告警。
+    看门狗线程在采样协程迟迟没有醒来时抓取事件循环线程的调用栈：延迟告警会附带阻塞位置，
+    阻塞超过stall_threshold时事件循环无法输出日志，由看门狗线程直接打印调用栈。
+    """
+    
+    STACK_DEPTH = 12
+    
+    def __init__(self, interval: float = 0.5, warn_threshold: float = 0.1, stall_threshold: float = 1.0,
+                 buckets: Tuple[float, ...] = LOOP_LAG_BUCKETS):
+        self.interval = interval
+        self.warn_threshold = warn_threshold
+        self.stall_threshold = max(stall_threshold, warn_threshold)
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.samples = 0
+        self.total = 0.0
+        self.max_lag = 0.0
+        self.counters = {'warnings': 0, 'stalls': 0}
+        self.last_stack: Optional[str] = None
+        self._heartbeat = time.monotonic()
+        self._captured: Optional[Tuple[float, str]] = None
+        self._dumped: Optional[float] = None
+        self._loop_thread: Optional[int] = None
+        self._stop = threading.Event()
+        
+    def observe(self, lag: float):
+        """记录一次延迟；超出最大桶的只计入总数（+Inf）"""
+        self.samples += 1
+        self.total += lag
+        self.max_lag = max(self.max_lag, lag)
+        index = bisect.bisect_left(self.buckets, lag)
+        if index < len(self.counts):
+            self.counts[index] += 1
+            
+    def metrics(self) -> Dict[str, float]:
+        """Prometheus直方图格式的累计计数"""
+        metrics = {}
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            metrics[f'loop_lag_seconds_bucket{{le="{bound}"}}'] = cumulative
+        metrics['loop_lag_seconds_bucket{le="+Inf"}'] = self.samples
+        metrics['loop_lag_seconds_sum'] = round(self.total, 6)
+        metrics['loop_lag_seconds_count'] = self.samples
+        metrics['loop_lag_max_seconds'] = round(self.max_lag, 6)
+        metrics['loop_lag_warnings'] = self.counters['warnings']
+        metrics['loop_stalls'] = self.counters['stalls']
+        return metrics
+        
+    def _loop_stack(self) -> Optional[str]:
+        frame = sys._current_frames().get(self._loop_thread)
+        if frame is None:
+            return None
+        return ''.join(traceback.format_list(traceback.extract_stack(frame)[-self.STACK_DEPTH:]))
+        
+    def _watchdog(self):
+        """看门狗线程：采样协程超时未醒时抓取调用栈"""
+        poll = max(0.01, self.warn_threshold / 2)
+        while not self._stop.wait(poll):
+            beat = self._heartbeat
+            stale = time.monotonic() - beat - self.interval
+            if stale >= self.warn_threshold and (self._captured is None or self._captured[0] != beat):
+                stack = self._loop_stack()
+                if stack:
+                    self._captured = (beat, stack)
+            captured = self._captured
+            if stale >= self.stall_threshold and self._dumped != beat and captured and captured[0] == beat:
+                self._dumped = beat
+                self.counters['stalls'] += 1
+                self.last_stack = captured[1]
+                logger.warning(f"🧊 事件循环已阻塞 {stale:.1f} 秒，阻塞位置:\n{self.last_stack}")
+                
+    async def run(self):
+        """周期采样，直到被取消"""
+        self._loop_thread = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        watchdog = threading.Thread(target=self._watchdog, name="loop-watchdog", daemon=True)
+        watchdog.start()
+        try:
+            while True:
+                expected = time.monotonic() + self.interval
+                await asyncio.sleep(self.interval)
+                now = time.monotonic()
+                previous, self._heartbeat = self._heartbeat, now
+                lag = max(0.0, now - expected)
+                self.observe(lag)
+                if lag >= self.warn_threshold:
+                    self.counters['warnings'] += 1
+                    captured = self._captured
+                    if captured and captured[0] == previous and self._dumped != previous:
+                        self.last_stack = captured[1]
+                        logger.warning(f"⏱️ 事件循环延迟 {lag * 1000:.0f}ms，阻塞位置:\n{captured[1]}")
+                    elif captured and captured[0] == previous:
+                        logger.warning(f"⏱️ 事件循环延迟 {lag * 1000:.0f}ms（阻塞位置见上方调用栈）")
+                    else:
+                        logger.warning(f"⏱️ 事件循环延迟 {lag * 1000:.0f}ms")
+        finally:
+            self._stop.set()
+
+def _await_chain(coro) -> Tuple[list, Any]:
+    """沿cr_await/ag_await/gi_yieldfrom向下，返回(各层协程的帧, 最内层等待的对象)"""
+    frames = []
+    current = coro
+    while current is not None:
+        frame = (getattr(current, 'cr_frame', None) or getattr(current, 'ag_frame', None)
+                 or getattr(current, 'gi_frame', None))
+        if frame is None:
+            return frames, current
+        frames.append(frame)
+        inner = (getattr(current, 'cr_await', None) or getattr(current, 'ag_await', None)
+                 or getattr(current, 'gi_yieldfrom', None))
+        if inner is None:
+            return frames, None
+        current = inner
+    return frames, None
+
+def dump_asyncio_tasks(loop: Optional[asyncio.AbstractEventLoop] = None) -> str:
+    """事件循环中所有任务的快照：状态、正在等待的对象和逐层的await调用栈"""
+    tasks = sorted(asyncio.all_tasks(loop), key=lambda task: task.get_name())
+    lines = [f"共 {len(tasks)} 个任务"]
+    for task in tasks:
+        coro = task.get_coro()
+        frames, leaf = _await_chain(coro)
+        state = 'cancelling' if task.cancelling() else 'pending'
+        # 最内层通常是Future的迭代器，Task._fut_waiter才是实际等待的Future
+        leaf = getattr(task, '_fut_waiter', None) or leaf
+        waiting = repr(leaf)[:200] if leaf is not None else '-'
+        lines.append(f"任务 {task.get_name()} [{state}] {getattr(coro, '__qualname__', coro)} 等待: {waiting}")
+        for frame in frames:
+            lines.append(f'  File "{frame.f_code.co_filename}", line {frame.f_lineno}, in {frame.f_code.co_name}')
+    return '\n'.join(lines) + '\n'
+
+class SamplingProfiler:
+    """采样分析器：后台线程定期读取所有线程的调用栈，结果为折叠栈格式（flamegraph.pl、speedscope可直接打开）"""
+    
+    def __init__(self, directory: str = "profiles", interval: float = 0.005):
+        self.directory = directory
+        self.interval = interval
+        self.running = False
+        
+    @staticmethod
+    def _frame_name(frame) -> str:
+        code = frame.f_code
+        return f"{os.path.basename(code.co_filename)}:{getattr(code, 'co_qualname', code.co_name)}"
+        
+    def sample(self, seconds: float) -> Dict[str, int]:
+        """阻塞采样seconds秒，返回{折叠栈: 样本数}；在调用线程中运行，不采样自身"""
+        me = threading.get_ident()
+        counts: Dict[str, int] = {}
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._frame_name(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                key = ';'.join(reversed(stack))
+                counts[key] = counts.get(key, 0) + 1
+            time.sleep(self.interval)
+        return counts
+        
+    @staticmethod
+    def folded(counts: Dict[str, int]) -> str:
+        return ''.join(f"{stack} {count}\n" for stack, count in sorted(counts.items(), key=lambda item: -item[1]))
+        
+    async def profile(self, seconds: float) -> Tuple[str, str]:
+        """在线程中采样并写入文件，返回(文件路径, 折叠栈文本)；同一时间只允许一次采样"""
+        if self.running:
+            raise RuntimeError("已有采样正在进行")
+        self.running = True
+        try:
+            counts = await asyncio.to_thread(self.sample, seconds)
+        finally:
+            self.running = False
+        text = self.folded(counts)
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, time.strftime('profile-%Y%m%d-%H%M%S.folded'))
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        logger.info(f"🩺 采样分析已写入 {path}（{sum(counts.values())} 个样本）")
+        return path, text
+
+def format_prometheus(metrics: Dict[str, float], labels: Dict[str, str]) -> str:
+    """把指标转为Prometheus文本格式，指标名中已有的标签与公共标签合并"""
+    common = ','.join(f'{key}="{value}"' for key, value in labels.items())
+    lines = []
+    for name, value in metrics.items():
+        base, _, extra = name.partition('{')
+        extra = extra.rstrip('}')
+        label_text = ','.join(part for part in (common, extra) if part)
+        if label_text:
+            lines.append(f"vps_monitor_{base}{{{label_text}}} {value}")
+        else:
+            lines.append(f"vps_monitor_{base} {value}")
+    return '\n'.join(lines) + '\n'
+
+class ControlServer:
+    """本地控制接口（只监听本机），用于查询运行中的监控器"""
+    
+    def __init__(self, monitors: Dict[str, 'VPSMonitor'], host: str = "127.0.0.1", port: int = 0,
+                 loop_monitor: Optional[LoopLagMonitor] = None, profiler: Optional[SamplingProfiler] = None):
+        self.monitors = monitors
+        self.loop_monitor = loop_monitor
+        self.profiler = profiler or SamplingProfiler()
+        self.host = host
+        self.port = port
+        self.app = web.Application()
+        self.app.router.add_get('/console', self.handle_console)
+        self.app.router.add_get('/metrics', self.handle_metrics)
+        self.app.router.add_get('/stats', self.handle_stats)
+        self.app.router.add_get('/availability', self.handle_availability)
+        self.app.router.add_get('/debug/tasks', self.handle_debug_tasks)
+        self.app.router.add_get('/debug/profile', self.handle_debug_profile)
+        self._runner: Optional[web.AppRunner] = None
+        
+    async def start(self):
+        """启动控制接口"""
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        logger.info(f"控制接口已启动: http://{self.host}:{self.port}")
+        
+    async def stop(self):
+        """停止控制接口"""
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+            
+    def _get_monitor(self, request: web.Request) -> 'VPSMonitor':
+        """按server参数选择监控器，只有一个时可省略"""
+        server = request.query.get('server')
+        if server:
+            if server not in self.monitors:
+                raise web.HTTPNotFound(text=f"未知服务器: {server}")
+            return self.monitors[server]
+        if len(self.monitors) != 1:
+            raise web.HTTPBadRequest(text="需要指定server参数")
+        return next(iter(self.monitors.values()))
+        
+    async def handle_console(self, request: web.Request) -> web.Response:
+        """GET /console?lines=N 或 ?since=时间戳"""
+        monitor = self._get_monitor(request)
+        try:
+            since = request.query.get('since')
+            if since is not None:
+                lines = monitor.get_console_lines(since=float(since))
+            else:
+                lines = monitor.get_console_lines(last=int(request.query.get('lines', "100")))
+        except ValueError:
+            raise web.HTTPBadRequest(text="lines/since参数无效")
+        return web.json_response({
+            'server': monitor.config.server_uuid,
+            'lines': [{'time': timestamp, 'line': line} for timestamp, line in lines],
+        })
+        
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        """GET /stats?field=cpu_absolute&since=时间戳[&until=时间戳&tier=raw|1m|1h]"""
+        monitor = self._get_monitor(request)
+        try:
+            since = float(request.query.get('since', monitor.clock.time() - 3600))
+            until = request.query.get('until')
+            tier, points = monitor.get_stats(
+                request.query.get('field', 'cpu_absolute'), since,
+                float(until) if until is not None else None, request.query.get('tier')
+            )
+        except ValueError as e:
+            raise web.HTTPBadRequest(text=str(e))
+        return web.json_response({
+            'server': monitor.config.server_uuid,
+            'tier': tier,
+            'points': points,
+        })
+        
+    async def handle_availability(self, request: web.Request) -> web.Response:
+        """GET /availability?since=时间戳[&until=时间戳]，默认最近24小时"""
+        monitor = self._get_monitor(request)
+        try:
+            since = float(request.query.get('since', monitor.clock.time() - 86400))
+            until = request.query.get('until')
+            result = monitor.get_availability(since, float(until) if until is not None else None)
+        except ValueError as e:
+            raise web.HTTPBadRequest(text=str(e))
+        return web.json_response({'server': monitor.config.server_uuid, **result})
+        
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        """GET /metrics，Prometheus文本格式"""
+        text = ''.join(
+            format_prometheus(monitor.get_metrics(), {'server': server})
+            for server, monitor in self.monitors.items()
+        )
+        shared = {}
+        for monitor in self.monitors.values():
+            shared[id(monitor.scheduler)] = monitor.scheduler
+            if monitor.http_pool:
+                shared[id(monitor.http_pool)] = monitor.http_pool
+        for component in shared.values():
+            text += format_prometheus(component.metrics(), {})
+        if self.loop_monitor:
+            text += format_prometheus(self.loop_monitor.metrics(), {})
+        return web.Response(text=text, content_type='text/plain')
+        
+    async def handle_debug_tasks(self, request: web.Request) -> web.Response:
+        """GET /debug/tasks，所有asyncio任务及其等待的对象"""
+        return web.Response(text=dump_asyncio_tasks(), content_type='text/plain')
+        
+    async def handle_debug_profile(self, request: web.Request) -> web.Response:
+        """GET /debug/profile?seconds=N，采样N秒（最长300秒），返回折叠栈并写入文件"""
+        try:
+            seconds = min(300.0, float(request.query.get('seconds', 10)))
+        except ValueError as e:
+            raise web.HTTPBadRequest(text=str(e))
+        try:
+            path, text = await self.profiler.profile(seconds)
+        except RuntimeError as e:
+            raise web.HTTPConflict(text=str(e))
+        return web.Response(text=text, content_type='text/plain', headers={'X-Profile-Path': path})
+
+# 高频事件，收到时只记录调试日志
+QUIET_EVENTS = {'stats'}
+
+# 事件处理器: 接收类型化消息；预过滤器: 接收原始帧，返回False时跳过该处理器
+EventHandler = Callable[[WingsMessage], Awaitable[None]]
+FramePrefilter = Callable[[str], bool]
+
+# 只定位顶层"event"字段的正则，字符串内的引号均已转义，不会误匹配args内容
+_EVENT_NAME_PATTERN = re.compile(r'"event"\s*:\s*"([^"\\]*)"')
+
+def peek_event_name(message: str) -> Optional[str]:
+    """不解码整个帧，快速读取事件名；无法确定时返回None"""
+    if not isinstance(message, str):
+        return None
+    # Wings发出的帧总是以"event"字段开头，命中时直接截取事件名，不含转义字符才可信
+    if message.startswith('{"event":"'):
+        start = 10
+    elif message.startswith('{"event": "'):
+        start = 11
+    else:
+        start = 0
+    if start:
+        end = message.find('"', start)
+        name = message[start:end]
+        if end != -1 and '\\' not in name:
+            return name
+    match = _EVENT_NAME_PATTERN.search(message)
+    return match.group(1) if match else None
+
+def _event_head(message: str, event: str) -> Optional[str]:
+    """帧开头到事件名结束引号的部分，以此开头的帧事件名一定相同；帧不以"event"字段开头时返回None"""
+    for prefix in ('{"event":"', '{"event": "'):
+        head = f'{prefix}{event}"'
+        if message.startswith(head):
+            return head
+    return None
+
+class HTTPPool:
+    """进程内共享的面板HTTP连接池
+
+    所有监控器共用一个TCPConnector：空闲连接保持复用、DNS结果缓存、按主机限制连接数，
+    重连风暴时请求排队等待已建立的连接而不是各自新建；每个监控器仍使用自己的ClientSession
+    """
+    _pools: Dict[Tuple, 'HTTPPool'] = {}
+
+    def __init__(self, limit: int = 100, limit_per_host: int = 32, keepalive: float = 60.0,
+                 dns_ttl: int = 300, connect_timeout: float = 10.0, timeout: float = 30.0):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive = keepalive
+        self.dns_ttl = dns_ttl
+        self.timeout = aiohttp.ClientTimeout(total=timeout, sock_connect=connect_timeout)
+        self.connector: Optional[aiohttp.TCPConnector] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.sessions = 0
+        self.counters = {'connections_opened': 0, 'connections_reused': 0, 'queued': 0,
+                         'dns_cache_hits': 0, 'dns_cache_misses': 0}
+        self.queue_seconds = 0.0
+        self.trace = aiohttp.TraceConfig()
+        self.trace.on_connection_create_end.append(self._counter('connections_opened'))
+        self.trace.on_connection_reuseconn.append(self._counter('connections_reused'))
+        self.trace.on_dns_cache_hit.append(self._counter('dns_cache_hits'))
+        self.trace.on_dns_cache_miss.append(self._counter('dns_cache_misses'))
+        self.trace.on_connection_queued_start.append(self._on_queued_start)
+        self.trace.on_connection_queued_end.append(self._on_queued_end)
+
+    @classmethod
+    def for_config(cls, config: VPSConfig) -> 'HTTPPool':
+        """返回与配置对应的共享连接池"""
+        key = (config.http_pool_limit, config.http_pool_per_host, config.http_keepalive,
+               config.http_dns_ttl, config.http_connect_timeout, config.http_timeout)
+        pool = cls._pools.get(key)
+        if pool is None:
+            pool = cls._pools[key] = cls(*key)
+        return pool
+
+    def _counter(self, name: str):
+        async def count(session, context, params):
+            self.counters[name] += 1
+        return count
+
+    async def _on_queued_start(self, session, context, params):
+        self.counters['queued'] += 1
+        context.queued_at = time.monotonic()
+
+    async def _on_queued_end(self, session, context, params):
+        self.queue_seconds += time.monotonic() - context.queued_at
+
+    def session(self) -> ClientSession:
+        """创建使用共享连接的会话，用完后调用release"""
+        loop = asyncio.get_running_loop()
+        if self.connector is None or self.connector.closed or self._loop is not loop:
+            self.connector = aiohttp.TCPConnector(
+                ssl=False, limit=self.limit, limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive, use_dns_cache=True, ttl_dns_cache=self.dns_ttl
+            )
+            self._loop = loop
+            self.sessions = 0
+        self.sessions += 1
+        return ClientSession(connector=self.connector, connector_owner=False,
+                             timeout=self.timeout, trace_configs=[self.trace])
+
+    async def release(self):
+        """会话关闭后调用，最后一个会话释放时关闭连接池"""
+        self.sessions = max(0, self.sessions - 1)
+        if self.sessions == 0 and self.connector:
+            await self.connector.close()
+            self.connector = None
+
+    @staticmethod
+    def _connector_count(connector, name: str) -> int:
+        """读取连接器内部容器的大小；aiohttp没有公开这些统计，属性缺失或类型变化时按0处理"""
+        value = getattr(connector, name, None)
+        try:
+            if isinstance(value, dict):
+                return sum(len(items) for items in value.values())
+            return len(value) if value is not None else 0
+        except TypeError:
+            return 0
+            
+    def metrics(self) -> Dict[str, float]:
+        """连接池使用情况"""
+        connector = self.connector
+        # 已借出的连接、按主机空闲的连接、排队等待连接的请求（均为aiohttp私有属性）
+        in_use = self._connector_count(connector, '_acquired')
+        idle = self._connector_count(connector, '_conns')
+        waiting = self._connector_count(connector, '_waiters')
+        metrics = {
+            'http_pool_limit': self.limit,
+            'http_pool_sessions': self.sessions,
+            'http_pool_in_use': in_use,
+            'http_pool_idle': idle,
+            'http_pool_waiting': waiting,
+            'http_pool_utilization': round(in_use / self.limit, 4) if self.limit else 0,
+            'http_pool_queue_seconds': round(self.queue_seconds, 6),
+        }
+        metrics.update({f'http_pool_{name}': value for name, value in self.counters.items()})
+        return metrics
+
+# 面板请求优先级：数值越小越先发出
+PANEL_PRIORITY_CRITICAL = 0  # 登录、重连时获取token等恢复路径上的请求
+PANEL_PRIORITY_NORMAL = 1
+PANEL_PRIORITY_BACKGROUND = 2  # token续期等可以推迟的请求
+PANEL_PRIORITY_NAMES = ('critical', 'normal', 'background')
+
+def _header_number(headers, name: str) -> Optional[float]:
+    """读取数值响应头，缺失或格式不对时返回None"""
+    try:
+        value = headers.get(name)
+        return float(value) if isinstance(value, (str, int, float)) else None
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+class PanelRequestScheduler:
+    """面板请求调度：同一账号的所有请求共用一个令牌桶
+
+    面板按用户限流，服务器多时登录检查、token获取会一起撞上429。请求先按优先级排队取令牌，
+    响应中的X-RateLimit-Limit/Remaining用于收紧速率和剩余额度，429时按Retry-After暂停后重新排队
+    """
+    _accounts: 'weakref.WeakValueDictionary' = weakref.WeakValueDictionary()
+
+    def __init__(self, rate: float = 10.0, burst: int = 20, window: float = 60.0, retries: int = 2,
+                 clock: Optional[Clock] = None):
+        self.clock = clock or REAL_CLOCK
+        self.rate = rate
+        self.window = window
+        self.retries = retries
+        self.bucket = TokenBucket(rate, max(1, burst), clock=self.clock)
+        self._blocked_until = 0.0
+        self._queue: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = 0
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.counters = {'requests': 0, 'queued': 0, 'rate_limited': 0, 'retried': 0}
+        self.queue_seconds = [0.0] * len(PANEL_PRIORITY_NAMES)
+        self.queue_counts = [0] * len(PANEL_PRIORITY_NAMES)
+        self.queue_max = [0.0] * len(PANEL_PRIORITY_NAMES)
+
+    @classmethod
+    def for_config(cls, config: VPSConfig, clock: Optional[Clock] = None) -> 'PanelRequestScheduler':
+        """返回该面板账号共享的调度器"""
+        clock = clock or REAL_CLOCK
+        key = (config.panel_url.rstrip('/'), config.username, id(clock))
+        scheduler = cls._accounts.get(key)
+        if scheduler is None:
+            scheduler = cls(config.panel_rate_limit, config.panel_rate_burst, config.panel_rate_window,
+                            config.panel_rate_retries, clock)
+            cls._accounts[key] = scheduler
+        return scheduler
+
+    def _try_take(self, now: float) -> bool:
+        if now < self._blocked_until:
+            return False
+        return self.rate <= 0 or self.bucket.consume(1, now)
+
+    def _wait_time(self, now: float) -> float:
+        wait = self._blocked_until - now
+        if self.rate > 0:
+            wait = max(wait, (1 - self.bucket.tokens) / self.bucket.rate)
+        return max(wait, 0.001)
+
+    async def acquire(self, priority: int = PANEL_PRIORITY_NORMAL) -> float:
+        """等待发出请求的许可，返回排队时间（秒）"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._queue.clear()
+            self._dispatcher = None
+        start = self.clock.monotonic()
+        self.counters['requests'] += 1
+        if self._queue or not self._try_take(start):
+            self.counters['queued'] += 1
+            self._seq += 1
+            future = loop.create_future()
+            heapq.heappush(self._queue, (priority, self._seq, future))
+            if self._dispatcher is None or self._dispatcher.done():
+                self._dispatcher = asyncio.ensure_future(self._dispatch())
+            await future
+        waited = self.clock.monotonic() - start
+        self.queue_seconds[priority] += waited
+        self.queue_counts[priority] += 1
+        self.queue_max[priority] = max(self.queue_max[priority], waited)
+        return waited
+
+    async def _dispatch(self):
+        """按优先级依次放行排队的请求"""
+        while self._queue:
+            if self._queue[0][2].done():
+                heapq.heappop(self._queue)
+                continue
+            now = self.clock.monotonic()
+            if self._try_take(now):
+                heapq.heappop(self._queue)[2].set_result(None)
+            else:
+                await self.clock.sleep(self._wait_time(now))
+
+    def observe(self, status: int, headers):
+        """根据响应状态和限流头调整令牌桶"""
+        now = self.clock.monotonic()
+        limit = _header_number(headers, 'X-RateLimit-Limit')
+        remaining = _header_number(headers, 'X-RateLimit-Remaining')
+        if limit and self.window > 0 and self.rate > 0:
+            self.bucket.rate = min(self.rate, limit / self.window)
+        if remaining is not None:
+            self.bucket.tokens = min(self.bucket.tokens, max(0.0, remaining))
+        if status == 429:
+            self.counters['rate_limited'] += 1
+            delay = _header_number(headers, 'Retry-After')
+            reset = _header_number(headers, 'X-RateLimit-Reset')
+            if delay is None and reset is not None:
+                delay = reset - self.clock.time()
+            if delay is None:
+                delay = 1.0 / self.bucket.rate if self.rate > 0 else 1.0
+            self._blocked_until = max(self._blocked_until, now + max(0.0, delay))
+            logger.warning(f"⚠️ 面板请求被限流(429)，{max(0.0, delay):.1f} 秒后继续")
+
+    @contextlib.asynccontextmanager
+    async def request(self, session: ClientSession, method: str, url: str,
+                      priority: int = PANEL_PRIORITY_NORMAL, **kwargs):
+        """排队后发出请求：async with scheduler.request(session, 'get', url) as response"""
+        attempt = 0
+        while True:
+            await self.acquire(priority)
+            async with getattr(session, method)(url, **kwargs) as response:
+                self.observe(response.status, response.headers)
+                if response.status != 429 or attempt >= self.retries:
+                    yield response
+                    return
+            attempt += 1
+            self.counters['retried'] += 1
+
+    def metrics(self) -> Dict[str, float]:
+        """排队延迟和限流统计"""
+        metrics = {f'panel_{name}': value for name, value in self.counters.items()}
+        metrics['panel_queue_depth'] = sum(1 for _, _, future in self._queue if not future.done())
+        metrics['panel_rate'] = round(self.bucket.rate, 4)
+        for index, name in enumerate(PANEL_PRIORITY_NAMES):
+            metrics[f'panel_queue_seconds_sum{{priority="{name}"}}'] = round(self.queue_seconds[index], 6)
+            metrics[f'panel_queue_seconds_count{{priority="{name}"}}'] = self.queue_counts[index]
+            metrics[f'panel_queue_max_seconds{{priority="{name}"}}'] = round(self.queue_max[index], 6)
+        return metrics
+
+class SharedAuth:
+    """面板账号的登录状态
+
+    同一面板同一账号下的多台服务器引用同一个实例，只需登录一次；
+    generation在每次登录成功后加一，用来判断其他服务器是否已经刷新过会话
+    """
+    __slots__ = ('panel_url', 'username', 'csrf_token', 'session_cookie', 'xsrf_token',
+                 'generation', '_lock', '_loop', '__weakref__')
+    _accounts: 'weakref.WeakValueDictionary' = weakref.WeakValueDictionary()
+
+    def __init__(self, panel_url: str = "", username: str = ""):
+        self.panel_url = panel_url
+        self.username = username
         self.csrf_token: Optional[str] = None
         self.session_cookie: Optional[str] = None
         self.xsrf_token: Optional[str] = None
+        self.generation = 0
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def lock(self) -> asyncio.Lock:
+        """登录锁，按事件循环创建（与HTTPPool的连接器一样，实例可能跨事件循环存活）"""
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._loop is not loop:
+            self._lock = asyncio.Lock()
+            self._loop = loop
+        return self._lock
+
+    @classmethod
+    def for_account(cls, panel_url: str, username: str) -> 'SharedAuth':
+        """返回该账号共享的登录状态，没有服务器引用时自动释放"""
+        key = (panel_url.rstrip('/'), username)
+        auth = cls._accounts.get(key)
+        if auth is None:
+            auth = cls(*key)
+            cls._accounts[key] = auth
+        return auth
+
+def reset_shared_state():
+    """清空进程内按账号/配置共享的登录状态、面板调度器和HTTP连接池
+
+    已创建的监控器仍引用原来的实例，之后创建的监控器重新建立；用于测试之间的隔离
+    """
+    SharedAuth._accounts.clear()
+    PanelRequestScheduler._accounts.clear()
+    HTTPPool._pools.clear()
+
+class ServerState:
+    """单台服务器的运行状态"""
+    __slots__ = ('session', 'ws_connection', 'is_running', 'current_status', 'sshx_link',
+                 'token_expires_at', 'last_power')
+
+    def __init__(self):
+        self.session: Optional[ClientSession] = None
+        self.ws_connection = None
         self.is_running = False
-        self.ws_connection: Optional[websockets.WebSocketServerProtocol] = None
         self.current_status: Optional[str] = None
         self.sshx_link: Optional[str] = None
+        self.token_expires_at: Optional[float] = None
+        self.last_power: Optional[Dict[str, Any]] = None
+
+def _delegate(record: str, name: str) -> property:
+    """把属性读写转发到状态记录，保留原有的属性名"""
+    def setter(self, value):
+        setattr(getattr(self, record), name, value)
+    return property(operator.attrgetter(f"{record}.{name}"), setter, doc=f"{record}.{name}")
+
+class VPSMonitor:
+    """VPS监控器"""
+
+    # 运行状态和登录状态分别存放在 self.state 和 self.auth 中
+    session = _delegate('state', 'session')
+    ws_connection = _delegate('state', 'ws_connection')
+    is_running = _delegate('state', 'is_running')
+    current_status = _delegate('state', 'current_status')
+    sshx_link = _delegate('state', 'sshx_link')
+    token_expires_at = _delegate('state', 'token_expires_at')
+    last_power = _delegate('state', 'last_power')
+    csrf_token = _delegate('auth', 'csrf_token')
+    session_cookie = _delegate('auth', 'session_cookie')
+    xsrf_token = _delegate('auth', 'xsrf_token')
+    
+    def __init__(self, config: VPSConfig, clock: Optional[Clock] = None, auth: Optional[SharedAuth] = None):
+        self.config = config
+        self.clock = clock or REAL_CLOCK
+        self.state = ServerState()
+        self.auth = auth or SharedAuth.for_account(config.panel_url, config.username)
+        self.http_pool: Optional[HTTPPool] = None
+        self.scheduler = PanelRequestScheduler.for_config(config, self.clock)
         self.dingtalk_webhook_url = config.dingtalk_webhook_url
+        self.codec = get_codec(config.json_codec)
+        self.writer: Optional[CommandWriter] = None
+        self.governor = self._new_governor()
+        self.console_index = ConsoleDedupeIndex(config.console_dedupe_size)
+        # 回放窗口结束的单调时间，0表示不在窗口内；_console_indexed是已写入去重索引的缓冲区累计行数
+        self._replay_until = 0.0
+        self._console_indexed = 0
+        self.console_counters = {'lines': 0, 'replay_skipped': 0}
+        self.sshx_extractor = SSHXLinkExtractor()
+        self._sshx_flush: Optional[asyncio.Task] = None
+        self._archive_flush: Optional[asyncio.Task] = None
+        self.console_buffer = ConsoleRingBuffer(config.console_buffer_bytes, config.console_buffer_lines)
+        self.stats_store = StatsStore(config.stats_raw_points, config.stats_minute_points,
+                                      config.stats_hour_points)
+        self.journal = None
+        if config.event_journal_dir:
+            self.journal = EventJournal(
+                os.path.join(config.event_journal_dir, f"{config.server_uuid or 'default'}.jsonl"),
+                config.event_journal_checkpoint, self.clock
+            )
+        self.restart_planner = self._new_restart_planner()
+        self.restart_plan: Optional[RestartPlan] = None
+        self._plan_checked_at = 0.0
+        self._planned_restart_at = 0.0
+        self.anomaly_counters: Dict[str, int] = {}
+        self._anomaly_fired_at: Dict[str, float] = {}
+        self.console_archive = None
+        if config.console_archive_dir:
+            self.console_archive = ConsoleArchive(
+                os.path.join(config.console_archive_dir, config.server_uuid or 'default'),
+                config.console_archive_block_kb * 1024, config.console_archive_segment_mb * 1024 * 1024,
+                config.console_archive_segments, config.console_archive_flush
+            )
+        self.flood_control = ConsoleFloodControl(
+            config.console_rate_limit, config.console_burst, config.console_sample_every, self.clock
+        )
+        self.rule_engine = ConsoleRuleEngine(self._load_console_rules())
+        self.rule_counters: Dict[str, int] = {}
+        self._rule_fired_at: Dict[str, float] = {}
+        self._event_handlers: Dict[str, List[Tuple[EventHandler, Optional[FramePrefilter]]]] = {}
+        self.dispatch_counters = {'frames': 0, 'decoded': 0, 'skipped': 0}
+        # 上一次预读到的(帧头, 事件名)，帧头是帧开头到事件名结束引号的部分
+        self._event_head = ('{"event":"console output"', 'console output')
+        self._checkpoint_at = 0.0
+        self.ws_capture = None
+        if config.ws_capture_file:
+            self.ws_capture = WebSocketCapture(config.ws_capture_file, config.ws_capture_max_mb * 1024 * 1024)
+        self._register_default_handlers()
+        if config.state_checkpoint_file:
+            self.load_checkpoint()
+        
+    def _load_console_rules(self) -> List[ConsoleRule]:
+        """加载控制台触发规则，规则文件无效时回退到内置规则"""
+        if not self.config.console_rules_file:
+            return list(DEFAULT_CONSOLE_RULES)
+        try:
+            rules = load_console_rules(self.config.console_rules_file)
+            logger.info(f"已加载 {len(rules)} 条控制台触发规则")
+            return rules
+        except Exception as e:
+            logger.error(f"加载控制台触发规则失败，使用内置规则: {e}")
+            return list(DEFAULT_CONSOLE_RULES)
         
     async def __aenter__(self):
         await self.start_session()
@@ -68,15 +2557,34 @@ class VPSMonitor:
         
     async def start_session(self):
         """启动HTTP会话"""
-        connector = aiohttp.TCPConnector(ssl=False)
-        self.session = ClientSession(connector=connector)
+        self.http_pool = HTTPPool.for_config(self.config)
+        self.session = self.http_pool.session()
         
     async def close(self):
         """关闭连接"""
+        if self.writer:
+            self.writer.close()
+            self.writer = None
+        if self.console_archive:
+            self.console_archive.flush()
+        self.save_checkpoint()
+        if self.journal:
+            self.journal.record_monitor('stop', self.clock.time())
+            self.journal.close()
+            self.journal = None
+        if self.ws_capture:
+            self.ws_capture.close()
+        if self._sshx_flush:
+            self._sshx_flush.cancel()
+        if self._archive_flush:
+            self._archive_flush.cancel()
         if self.ws_connection:
             await self.ws_connection.close()
         if self.session:
             await self.session.close()
+        if self.http_pool:
+            await self.http_pool.release()
+            self.http_pool = None
             
     async def get_csrf_token(self) -> bool:
         """获取CSRF Token"""
@@ -91,7 +2599,8 @@ class VPSMonitor:
             logger.info(f"请求URL: {url1}")
             logger.info(f"请求头: {headers1}")
             
-            async with self.session.get(url1, headers=headers1) as response:
+            async with self.scheduler.request(self.session, 'get', url1, PANEL_PRIORITY_CRITICAL,
+                                              headers=headers1) as response:
                 logger.info(f"响应状态: {response.status}")
                 logger.info(f"响应头: {dict(response.headers)}")
                 
@@ -139,7 +2648,8 @@ class VPSMonitor:
             logger.info(f"请求URL: {url2}")
             logger.info(f"请求头: {headers2}")
             
-            async with self.session.get(url2, headers=headers2) as response:
+            async with self.scheduler.request(self.session, 'get', url2, PANEL_PRIORITY_CRITICAL,
+                                              headers=headers2) as response:
                 logger.info(f"响应状态: {response.status}")
                 logger.info(f"响应头: {dict(response.headers)}")
                 
@@ -170,6 +2680,18 @@ class VPSMonitor:
             return False
             
     async def login(self) -> bool:
+        """登录认证；共享登录状态的服务器同一时间只有一台在登录，其余等待后直接复用"""
+        generation = self.auth.generation
+        async with self.auth.lock:
+            if self.auth.generation != generation and self.auth.session_cookie:
+                logger.info("同账号的其他服务器已完成登录，复用会话")
+                return True
+            if await self._login():
+                self.auth.generation += 1
+                return True
+            return False
+
+    async def _login(self) -> bool:
         """登录认证"""
         if not self.xsrf_token:
             if not await self.get_csrf_token():
@@ -208,7 +2730,8 @@ class VPSMonitor:
             logger.info(f"当前CSRF Token: {self.xsrf_token}")
             logger.info(f"当前Session: {self.session_cookie}")
             
-            async with self.session.post(url, json=login_data, headers=headers) as response:
+            async with self.scheduler.request(self.session, 'post', url, PANEL_PRIORITY_CRITICAL,
+                                              json=login_data, headers=headers) as response:
                 logger.info(f"响应状态: {response.status}")
                 logger.info(f"响应头: {dict(response.headers)}")
                 
@@ -272,7 +2795,7 @@ class VPSMonitor:
                         logger.info("准备重新获取Token并重试...")
                         self.xsrf_token = None
                         self.session_cookie = None
-                        return await self.login()  # 重试一次
+                        return await self._login()  # 重试一次
                     return False
         except Exception as e:
             logger.error(f"登录异常: {e}")
@@ -301,7 +2824,7 @@ class VPSMonitor:
             logger.info(f"使用的Session: {self.session_cookie}")
             logger.info(f"使用的CSRF Token: {self.xsrf_token}")
             
-            async with self.session.get(url, headers=headers) as response:
+            async with self.scheduler.request(self.session, 'get', url, headers=headers) as response:
                 logger.info(f"响应状态: {response.status}")
                 logger.info(f"响应头: {dict(response.headers)}")
                 
@@ -330,8 +2853,8 @@ class VPSMonitor:
             logger.error(f"检查登录状态异常: {e}")
             return False
             
-    async def get_websocket_token(self) -> Optional[str]:
-        """获取WebSocket认证用的JWT token"""
+    async def get_websocket_token(self, priority: int = PANEL_PRIORITY_CRITICAL) -> Optional[str]:
+        """获取WebSocket认证用的JWT token；续期时以后台优先级排队"""
         try:
             # 构建请求头，包含cookie
             headers = {
@@ -352,7 +2875,7 @@ class VPSMonitor:
             logger.info(f"=== 获取WebSocket Token ===")
             logger.info(f"请求URL: {url}")
             
-            async with self.session.get(url, headers=headers) as response:
+            async with self.scheduler.request(self.session, 'get', url, priority, headers=headers) as response:
                 logger.info(f"响应状态: {response.status}")
                 
                 if response.status == 200:
@@ -383,9 +2906,11 @@ class VPSMonitor:
             if not jwt_token:
                 logger.error("无法获取JWT token，WebSocket连接失败")
                 return False
+            self.token_expires_at = jwt_expiry(jwt_token)
             
             # 构建WebSocket URL
-            ws_url = f"wss://{self.config.node_host}:{self.config.ws_port}/api/servers/{self.config.server_uuid}/ws"
+            ws_url = (f"{self.config.ws_scheme}://{self.config.node_host}:{self.config.ws_port}"
+                      f"/api/servers/{self.config.server_uuid}/ws")
             
             # 准备cookies
             cookies = {
@@ -403,6 +2928,7 @@ class VPSMonitor:
             }
             
             self.ws_connection = await websockets.connect(ws_url, extra_headers=headers)
+            self.governor = self._new_governor()
             logger.info("WebSocket连接成功")
             
             # 发送认证命令
@@ -422,18 +2948,28 @@ class VPSMonitor:
             logger.error(f"WebSocket连接失败: {e}")
             return False
             
+    def _new_governor(self) -> RequestGovernor:
+        """为新连接创建应答限流器"""
+        return RequestGovernor(self.config.reply_min_interval, self.config.echo_window, self.clock)
+        
+    def _get_writer(self) -> CommandWriter:
+        """获取当前连接的写者，连接变化时重建"""
+        if self.writer is None or self.writer.ws is not self.ws_connection:
+            if self.writer:
+                self.writer.close()
+            self.writer = CommandWriter(self.ws_connection, self.codec, self.config.send_queue_size)
+        return self.writer
+        
+    @property
+    def send_queue_depth(self) -> int:
+        """发送队列深度"""
+        return self.writer.depth if self.writer else 0
+        
     async def send_command(self, command: Dict[str, Any]) -> bool:
-        """发送WebSocket命令"""
+        """发送WebSocket命令（经由单写者队列）"""
         if not self.ws_connection:
             return False
-            
-        try:
-            await self.ws_connection.send(json.dumps(command))
-            logger.info(f"发送命令: {command}")
-            return True
-        except Exception as e:
-            logger.error(f"发送命令失败: {e}")
-            return False
+        return await self._get_writer().submit(command)
             
     async def start_server(self, max_retries: int = 3) -> bool:
         """启动服务器"""
@@ -442,39 +2978,72 @@ class VPSMonitor:
             
             if await self.send_command(command):
                 logger.info(f"✅ 启动命令发送成功 (尝试 {attempt + 1}/{max_retries})")
+                self._record_power('start', True)
                 return True
             else:
                 logger.warning(f"启动命令发送失败 (尝试 {attempt + 1}/{max_retries})")
+                self._record_power('start', False)
                 
                 # 如果不是最后一次尝试，等待一段时间后重试
                 if attempt < max_retries - 1:
                     wait_time = 10 * (attempt + 1)  # 10s, 20s, 30s
                     logger.info(f"等待 {wait_time} 秒后重试...")
-                    await asyncio.sleep(wait_time)
+                    await self.clock.sleep(wait_time)
         
         logger.error(f"❌ 启动服务器失败，已重试 {max_retries} 次")
         return False
         
+    async def restart_server(self) -> bool:
+        """重启服务器"""
+        if await self.send_command({"event": "set state", "args": ["restart"]}):
+            logger.info("✅ 重启命令发送成功")
+            self._record_power('restart', True)
+            return True
+        logger.error("❌ 重启命令发送失败")
+        self._record_power('restart', False)
+        return False
+        
+    def _record_power(self, action: str, ok: bool):
+        """记录电源命令及发送结果"""
+        self.last_power = {'action': action, 'ok': ok, 'at': self.clock.time()}
+        if self.journal:
+            self.journal.record_power(action, ok, self.clock.time())
+        self.save_checkpoint()
+            
+    def get_availability(self, since: float, until: Optional[float] = None) -> Dict[str, float]:
+        """时间窗口内的可用率、运行/离线时长和掉线次数"""
+        if not self.journal:
+            raise ValueError("未启用事件日志（EVENT_JOURNAL_DIR）")
+        return self.journal.availability(since, self.clock.time() if until is None else until)
+        
     def extract_sshx_link(self, message: str) -> Optional[str]:
         """提取SSHX链接"""
-        # 匹配SSHX链接的正则表达式
-        pattern = r'https://sshx\.io/s/[a-zA-Z0-9]+#[a-zA-Z0-9]+'
-        match = re.search(pattern, message)
+        match = SSHX_LINK_PATTERN.search(message)
         return match.group(0) if match else None
         
     async def send_dingtalk_notification(self, sshx_link: str):
         """发送钉钉通知"""
+        await self.send_dingtalk_message(
+            f"🔗 SSHX链接已更新\n\n新的SSHX链接: {sshx_link}\n\n请及时访问以连接到服务器。"
+        )
+        
+    async def send_dingtalk_message(self, content: str):
+        """发送钉钉文本消息"""
+        if not self.dingtalk_webhook_url:
+            logger.warning("未配置钉钉webhook，跳过通知")
+            return
         try:
             # 构建消息内容
             message = {
                 "msgtype": "text",
                 "text": {
-                    "content": f"🔗 SSHX链接已更新\n\n新的SSHX链接: {sshx_link}\n\n请及时访问以连接到服务器。"
+                    "content": content
                 }
             }
             
-            # 发送HTTP请求
-            response = requests.post(
+            # requests是同步库，放到线程中执行，避免网络慢时阻塞事件循环上的所有连接
+            response = await asyncio.to_thread(
+                requests.post,
                 self.dingtalk_webhook_url,
                 json=message,
                 timeout=10
@@ -494,122 +3063,463 @@ class VPSMonitor:
         
     async def send_server_logs(self):
         """发送服务器日志响应"""
-        try:
-            if self.ws_connection and not self.ws_connection.closed:
-                # 发送日志命令
-                logs_command = {"event": "send logs"}
-                await self.ws_connection.send(json.dumps(logs_command))
-                logger.info("✅ 已发送服务器日志响应")
-            else:
-                logger.warning("WebSocket连接未建立，无法发送日志响应")
-        except Exception as e:
-            logger.error(f"❌ 发送服务器日志响应异常: {e}")
+        if await self.send_command({"event": "send logs"}):
+            logger.info("✅ 已发送服务器日志响应")
+        else:
+            logger.warning("WebSocket未连接或发送失败，无法发送日志响应")
     
     async def send_server_stats(self):
         """发送服务器统计响应"""
-        try:
-            if self.ws_connection and not self.ws_connection.closed:
-                # 发送统计命令
-                stats_command = {"event": "send stats"}
-                await self.ws_connection.send(json.dumps(stats_command))
-                logger.info("✅ 已发送服务器统计响应")
-            else:
-                logger.warning("WebSocket连接未建立，无法发送统计响应")
-        except Exception as e:
-            logger.error(f"❌ 发送服务器统计响应异常: {e}")
+        if await self.send_command({"event": "send stats"}):
+            logger.info("✅ 已发送服务器统计响应")
+        else:
+            logger.warning("WebSocket未连接或发送失败，无法发送统计响应")
     
     async def request_logs_and_stats(self):
         """认证成功后请求日志和统计信息"""
-        try:
-            if self.ws_connection and not self.ws_connection.closed:
-                # 发送请求日志命令
-                logs_command = {"event": "send logs", "args": [None]}
-                await self.ws_connection.send(json.dumps(logs_command))
-                logger.info("✅ 已发送请求日志命令")
-                
-                # 发送请求统计命令
-                stats_command = {"event": "send stats", "args": [None]}
-                await self.ws_connection.send(json.dumps(stats_command))
-                logger.info("✅ 已发送请求统计命令")
-            else:
-                logger.warning("WebSocket连接未建立，无法请求日志和统计")
-        except Exception as e:
-            logger.error(f"❌ 请求日志和统计异常: {e}")
+        now = self.clock.monotonic()
+        self.governor.note_request('send logs', now)
+        self.governor.note_request('send stats', now)
+        # Wings收到send logs后会回放近期日志，窗口内已见过的行直接跳过
+        self._index_recent_console()
+        self._replay_until = now + self.config.console_replay_window
+        logs_sent, stats_sent = await asyncio.gather(
+            self.send_command({"event": "send logs", "args": [None]}),
+            self.send_command({"event": "send stats", "args": [None]}),
+        )
+        if logs_sent:
+            logger.info("✅ 已发送请求日志命令")
+        if stats_sent:
+            logger.info("✅ 已发送请求统计命令")
+        if not (logs_sent and stats_sent):
+            logger.warning("WebSocket未连接或发送失败，无法请求日志和统计")
+        
+    def register_handler(self, event: str, handler: EventHandler,
+                         prefilter: Optional[FramePrefilter] = None):
+        """订阅事件处理器，可选的预过滤器在解码前对原始帧进行判断"""
+        self._event_handlers.setdefault(event, []).append((handler, prefilter))
+        
+    def unregister_handler(self, event: str, handler: EventHandler):
+        """取消订阅事件处理器"""
+        handlers = self._event_handlers.get(event, [])
+        self._event_handlers[event] = [item for item in handlers if item[0] != handler]
+        if not self._event_handlers[event]:
+            del self._event_handlers[event]
+            
+    def _register_default_handlers(self):
+        """注册内置的事件处理器"""
+        self.register_handler('auth success', self._on_auth_success)
+        self.register_handler('send logs', self._on_send_logs)
+        self.register_handler('send stats', self._on_send_stats)
+        self.register_handler('status', self._on_status)
+        self.register_handler('stats', self._on_stats)
+        self.register_handler('daemon error', self._on_daemon_error)
+        self.register_handler('token expiring', self._on_token_expiring)
+        self.register_handler('token expired', self._on_token_expiring)
+        # 控制台输出量最大，经入口过滤后只有需要处理的帧才解码
+        self.register_handler('console output', self._on_console_output,
+                              prefilter=self._console_frame_filter)
+        
+    def _select_handlers(self, event: Optional[str], message: str) -> List[EventHandler]:
+        """根据事件名和预过滤器挑选需要执行的处理器"""
+        entries = self._event_handlers.get(event)
+        if not entries:
+            return []
+        if len(entries) == 1:
+            handler, prefilter = entries[0]
+            return [handler] if prefilter is None or prefilter(message) else []
+        return [
+            handler for handler, prefilter in entries
+            if prefilter is None or prefilter(message)
+        ]
         
     async def handle_websocket_message(self, message: str):
         """处理WebSocket消息"""
+        self.dispatch_counters['frames'] += 1
         try:
-            data = json.loads(message)
-            event = data.get('event')
-            args = data.get('args', [])
+            # 快速路径：事件名可预读且没有处理器关心该帧时，直接跳过解码；
+            # 相邻的帧大多是同一事件，帧头与上一帧相同时直接沿用事件名，不再预读
+            head, event = self._event_head
+            if not (isinstance(message, str) and message.startswith(head)):
+                event = peek_event_name(message)
+                head = event is not None and _event_head(message, event)
+                if head:
+                    self._event_head = (head, event)
+            handlers = None
+            if event is not None:
+                handlers = self._select_handlers(event, message)
+                if not handlers:
+                    self.dispatch_counters['skipped'] += 1
+                    return
+                    
+            try:
+                msg = self.codec.decode_message(message)
+            except (ValueError, TypeError) as e:
+                logger.error(f"解析WebSocket消息失败: {e}")
+                return
+            self.dispatch_counters['decoded'] += 1
             
-            logger.info(f"收到WebSocket消息: {event} - {args}")
+            # stats每秒都会推送，只在调试级别记录；参数延迟格式化，日志级别关闭时不生成消息文本
+            log = logger.debug if msg.event in QUIET_EVENTS else logger.info
+            log("收到WebSocket消息: %s - %s", msg.event, msg.args)
             
-            if event == 'auth success':
-                logger.info("✅ WebSocket认证成功")
-                # 认证成功后，主动请求日志和统计信息
-                await self.request_logs_and_stats()
+            if handlers is None:
+                handlers = self._select_handlers(msg.event, message)
+            for handler in handlers:
+                await handler(msg)
+                        
+        except Exception as e:
+            logger.error(f"处理WebSocket消息异常: {e}")
+            
+    async def _on_auth_success(self, msg: WingsMessage):
+        """认证成功"""
+        logger.info("✅ WebSocket认证成功")
+        # 认证成功后，主动请求日志和统计信息
+        await self.request_logs_and_stats()
+        
+    async def _on_token_expiring(self, msg: WingsMessage):
+        """token即将过期或已过期：重新获取并在当前连接上重新认证"""
+        logger.info(f"WebSocket token{'已过期' if msg.event == 'token expired' else '即将过期'}，重新认证")
+        priority = PANEL_PRIORITY_CRITICAL if msg.event == 'token expired' else PANEL_PRIORITY_BACKGROUND
+        jwt_token = await self.get_websocket_token(priority)
+        if not jwt_token:
+            logger.error("无法获取新的JWT token")
+            return
+        self.token_expires_at = jwt_expiry(jwt_token)
+        if not await self.send_command({"event": "auth", "args": [jwt_token]}):
+            logger.error("WebSocket重新认证命令发送失败")
+            
+    async def _on_send_logs(self, msg: WingsMessage):
+        """日志请求"""
+        logger.info("收到日志请求")
+        if not self.governor.allow_reply('send logs', self.clock.monotonic()):
+            logger.debug("忽略日志请求（回显或过于频繁）")
+            return
+        # 发送日志响应
+        await self.send_server_logs()
+        
+    async def _on_send_stats(self, msg: WingsMessage):
+        """统计请求"""
+        logger.info("收到统计请求")
+        if not self.governor.allow_reply('send stats', self.clock.monotonic()):
+            logger.debug("忽略统计请求（回显或过于频繁）")
+            return
+        # 发送统计响应
+        await self.send_server_stats()
+        
+    async def _on_stats(self, msg: StatsMessage):
+        """资源统计写入时间序列"""
+        now = self.clock.time()
+        self.stats_store.add_row(now, _stats_row(msg))
+        if self.restart_planner:
+            await self._check_restart_plan(now)
+            
+    def _new_restart_planner(self) -> Optional[RestartPlanner]:
+        """未开启预防性重启或维护窗口配置错误时返回None"""
+        if not self.config.predictive_restart:
+            return None
+        try:
+            window = parse_maintenance_window(self.config.maintenance_window)
+        except ValueError as e:
+            logger.error(f"❌ {e}，预防性重启已关闭")
+            return None
+        return RestartPlanner(window, self.config.predict_horizon, self.config.predict_margin,
+                              self.config.predict_oom_ratio)
+                              
+    async def _check_restart_plan(self, now: float):
+        """到达计划时间则重启；否则每分钟按最新数据重新拟合一次"""
+        if self.restart_plan and now >= self.restart_plan.at:
+            plan, self.restart_plan = self.restart_plan, None
+            self._planned_restart_at = now
+            oom = time.strftime('%H:%M', time.localtime(plan.oom_at))
+            logger.warning(f"🔄 执行预防性重启（{plan.reason}），预计OOM时间 {oom}")
+            await self.send_dingtalk_message(f"🔄 内存持续增长，预计 {oom} OOM，执行预防性重启（{plan.reason}）")
+            await self.restart_server()
+            return
+        if now - self._plan_checked_at < 60:
+            return
+        self._plan_checked_at = now
+        # 只用上次计划重启之后的数据，重启前的增长趋势已经无效
+        since = max(now - self.config.predict_window, self._planned_restart_at)
+        _, points = self.stats_store.query('memory_bytes', since, now)
+        limit = self.stats_store.latest.get('memory_limit_bytes', 0.0)
+        plan = self.restart_planner.plan(now, points, limit)
+        if plan and not self.restart_plan:
+            at = time.strftime('%m-%d %H:%M', time.localtime(plan.at))
+            logger.warning(f"📅 内存持续增长，计划于 {at} 预防性重启（{plan.reason}）")
+        self.restart_plan = plan
+        
+        
+    async def _on_status(self, msg: StatusMessage):
+        """服务器状态变化"""
+        if not msg.state:
+            return
+        new_status = msg.state
+        if new_status != self.current_status:
+            self.current_status = new_status
+            logger.info(f"状态变化: {new_status}")
+            if self.journal:
+                self.journal.record_status(new_status, self.clock.time())
+            self.save_checkpoint()
+            
+            if new_status == 'offline':
+                logger.warning("服务器已关闭，准备启动...")
+                await self.start_server()
                 
-            elif event == 'send logs':
-                logger.info("收到日志请求")
-                # 发送日志响应
-                await self.send_server_logs()
+    async def _on_daemon_error(self, msg: WingsMessage):
+        """守护进程错误"""
+        if not msg.args:
+            return
+        error_message = str(msg.args[0])
+        logger.error(f"守护进程错误: {error_message}")
+        
+        # 检查是否是电源操作冲突错误
+        if 'another power action is currently being processed' in error_message:
+            logger.warning("检测到电源操作冲突，将在30秒后重试启动")
+            # 30秒后重试启动
+            await self.clock.sleep(30)
+            if self.current_status == 'offline':
+                logger.info("重试启动服务器...")
+                await self.start_server()
                 
-            elif event == 'send stats':
-                logger.info("收到统计请求")
-                # 发送统计响应
-                await self.send_server_stats()
+    def _console_frame_filter(self, message: str) -> bool:
+        """控制台帧入口：原始帧写入缓冲区，跳过回放的行，超限时丢弃，并判断是否需要解码"""
+        self.console_counters['lines'] += 1
+        # 只有重连回放窗口内的帧可能与已处理过的行重复，窗口外的帧只写入缓冲区，不计算哈希
+        if self._replay_until and self._is_replayed(message):
+            self.console_counters['replay_skipped'] += 1
+            return False
+        now = self.clock.time()
+        self.console_buffer.append(message, now)
+        if self.console_archive:
+            payload = _console_payload(message)
+            if payload is not None:
+                self.console_archive.append(payload.encode('utf-8', 'surrogatepass'), now)
+        # SSHX链接不受限流影响，其余的行超限后只有采样部分交给触发规则；没有规则时不必限流
+        if self.sshx_extractor.wants(message):
+            return True
+        if not self.rule_engine.rules:
+            return False
+        if not self.flood_control.admit():
+            return False
+        return self.rule_engine.wants(message)
+        
+    def _is_replayed(self, frame: str) -> bool:
+        """回放窗口内判断该帧是否已处理过，没处理过的帧记入索引；窗口过期后返回False"""
+        if self.clock.monotonic() >= self._replay_until:
+            # 窗口外不再查询，计数表（每条记录约100字节）释放掉，下次回放时按环重建
+            self._replay_until = 0.0
+            self.console_index.release()
+            return False
+        # 缓冲区保存截断后的帧，哈希按同样的长度计算，才能与补入索引的帧对上
+        if self.console_index.seen(frame[:self.console_buffer.max_line_bytes]):
+            return True
+        self._console_indexed = self.console_buffer.appended + 1
+        return False
+        
+    def _index_recent_console(self):
+        """把上次索引之后写入缓冲区的帧补进去重索引"""
+        fresh = self.console_buffer.appended - self._console_indexed
+        for _, frame in self.console_buffer.tail(fresh):
+            self.console_index.add_hash(self.console_index.line_hash(frame))
+        self._console_indexed = self.console_buffer.appended
+        
+    async def _on_console_output(self, msg: ConsoleOutputMessage):
+        """控制台输出"""
+        await self._update_sshx_links(self.sshx_extractor.feed(msg.line))
+        if self.sshx_extractor.held and (self._sshx_flush is None or self._sshx_flush.done()):
+            self._sshx_flush = asyncio.ensure_future(self._flush_sshx_link())
+        for rule in self.rule_engine.match(msg.line):
+            await self._apply_console_rule(rule, msg.line)
+            
+    async def _update_sshx_links(self, links: List[str]):
+        for sshx_link in links:
+            if sshx_link != self.sshx_link:
+                self.sshx_link = sshx_link
+                logger.info(f"SSHX链接更新: {sshx_link}")
+                self.save_checkpoint()
+                await self.send_dingtalk_notification(sshx_link)
                 
-            elif event == 'status' and args:
-                new_status = args[0]
-                if new_status != self.current_status:
-                    self.current_status = new_status
-                    logger.info(f"状态变化: {new_status}")
+    async def _flush_sshx_link(self):
+        """链接停在帧末尾且一段时间内没有后续帧时，直接报告"""
+        while self.sshx_extractor.held:
+            held = self.sshx_extractor.held
+            await self.clock.sleep(SSHXLinkExtractor.HOLD_SECONDS)
+            if self.sshx_extractor.held == held:
+                await self._update_sshx_links(self.sshx_extractor.flush())
+            
+    async def _apply_console_rule(self, rule: ConsoleRule, line: str):
+        """执行命中规则的动作"""
+        self.rule_counters[rule.name] = self.rule_counters.get(rule.name, 0) + 1
+        if rule.action == 'metric':
+            return
+        now = self.clock.monotonic()
+        fired_at = self._rule_fired_at.get(rule.name)
+        if fired_at is not None and now - fired_at < rule.cooldown:
+            return
+        self._rule_fired_at[rule.name] = now
+        
+        logger.warning(f"控制台规则触发: {rule.name} ({rule.action}) - {line}")
+        if rule.action == 'notify':
+            await self.send_dingtalk_message(f"⚠️ 控制台规则触发: {rule.name}\n\n{line}")
+        elif rule.action == 'restart':
+            await self.restart_server()
+            
+    async def handle_anomaly(self, anomaly: Anomaly):
+        """处理资源异常：同类异常冷却期内只通知一次，内存饱和时按配置主动重启"""
+        self.anomaly_counters[anomaly.kind] = self.anomaly_counters.get(anomaly.kind, 0) + 1
+        now = self.clock.monotonic()
+        fired_at = self._anomaly_fired_at.get(anomaly.kind)
+        if fired_at is not None and now - fired_at < self.config.anomaly_cooldown:
+            return
+        self._anomaly_fired_at[anomaly.kind] = now
+        
+        logger.warning(f"⚠️ 资源异常: {anomaly.kind} - {anomaly.detail}")
+        if anomaly.kind == 'memory_saturation' and self.config.anomaly_restart:
+            await self.send_dingtalk_message(f"⚠️ 资源异常: {anomaly.detail}，主动重启服务器")
+            await self.restart_server()
+        else:
+            await self.send_dingtalk_message(f"⚠️ 资源异常: {anomaly.detail}")
+            
+    def checkpoint_state(self) -> Dict[str, Any]:
+        """需要跨进程重启保留的状态"""
+        self._index_recent_console()
+        hashes = array('Q', self.console_index.hashes())
+        return {
+            'version': 1,
+            'saved_at': self.clock.time(),
+            'server_uuid': self.config.server_uuid,
+            'status': self.current_status,
+            'sshx_link': self.sshx_link,
+            'power': self.last_power,
+            'token_expires_at': self.token_expires_at,
+            'sshx_reported': self.sshx_extractor.reported,
+            'console_hashes': base64.b64encode(hashes.tobytes()).decode('ascii'),
+        }
+        
+    def restore_state(self, state: Dict[str, Any]):
+        """从检查点恢复；offline状态不恢复，保证首个offline事件仍会触发启动"""
+        if state.get('version') != 1 or state.get('server_uuid') != self.config.server_uuid:
+            logger.warning("检查点与当前服务器不匹配，忽略")
+            return
+        age = self.clock.time() - state.get('saved_at', 0)
+        if age <= self.config.state_checkpoint_max_age and state.get('status') not in (None, 'offline'):
+            self.current_status = state['status']
+        self.sshx_link = state.get('sshx_link') or self.sshx_link
+        self.last_power = state.get('power')
+        self.token_expires_at = state.get('token_expires_at')
+        self.sshx_extractor.mark_reported(state.get('sshx_reported') or [])
+        hashes = array('Q')
+        hashes.frombytes(base64.b64decode(state.get('console_hashes') or ''))
+        for value in hashes:
+            self.console_index.add_hash(value)
+        logger.info(f"已从检查点恢复状态: status={self.current_status}, sshx_link={self.sshx_link}, "
+                    f"控制台去重 {len(hashes)} 行, 检查点 {age:.0f} 秒前")
                     
-                    if new_status == 'offline':
-                        logger.warning("服务器已关闭，准备启动...")
-                        await self.start_server()
-                        
-            elif event == 'daemon error' and args:
-                error_message = args[0]
-                logger.error(f"守护进程错误: {error_message}")
+    def load_checkpoint(self):
+        """启动时读取检查点"""
+        state = read_checkpoint(self.config.state_checkpoint_file)
+        if state:
+            try:
+                self.restore_state(state)
+            except (TypeError, ValueError) as e:
+                logger.warning(f"恢复检查点失败: {e}")
                 
-                # 检查是否是电源操作冲突错误
-                if 'another power action is currently being processed' in error_message:
-                    logger.warning("检测到电源操作冲突，将在30秒后重试启动")
-                    # 30秒后重试启动
-                    await asyncio.sleep(30)
-                    if self.current_status == 'offline':
-                        logger.info("重试启动服务器...")
-                        await self.start_server()
-                        
-            elif event == 'console output' and args:
-                message_text = args[0]
-                if 'Link:' in message_text:
-                    sshx_link = self.extract_sshx_link(message_text)
-                    if sshx_link and sshx_link != self.sshx_link:
-                        self.sshx_link = sshx_link
-                        logger.info(f"SSHX链接更新: {sshx_link}")
-                        await self.send_dingtalk_notification(sshx_link)
-                        
-        except json.JSONDecodeError as e:
-            logger.error(f"解析WebSocket消息失败: {e}")
-        except Exception as e:
-            logger.error(f"处理WebSocket消息异常: {e}")
+    def save_checkpoint(self):
+        """立即写入检查点"""
+        if not self.config.state_checkpoint_file:
+            return
+        try:
+            write_checkpoint(self.config.state_checkpoint_file, self.checkpoint_state())
+            self._checkpoint_at = self.clock.monotonic()
+        except OSError as e:
+            logger.error(f"❌ 写入检查点失败: {e}")
             
+    def _maybe_checkpoint(self):
+        """距上次写入超过间隔时写入检查点（控制台去重索引一直在变化）"""
+        if (self.config.state_checkpoint_file
+                and self.clock.monotonic() - self._checkpoint_at >= self.config.state_checkpoint_interval):
+            self.save_checkpoint()
+            
+    def get_console_lines(self, last: Optional[int] = None,
+                          since: Optional[float] = None) -> List[Tuple[float, str]]:
+        """读取缓冲区中最近的控制台输出：最近last行，或since时间戳之后的行"""
+        if since is not None:
+            entries = self.console_buffer.since(since)
+        else:
+            entries = self.console_buffer.tail(len(self.console_buffer) if last is None else last)
+        return [(timestamp, _decode_console_frame(frame)) for timestamp, frame in entries]
+        
+    def get_stats(self, field: str, since: float, until: Optional[float] = None,
+                  tier: Optional[str] = None) -> Tuple[str, List[Tuple[float, float]]]:
+        """查询资源统计时间序列，返回(使用的层, [(时间, 值)])"""
+        return self.stats_store.query(field, since, until, tier)
+        
+    def get_metrics(self) -> Dict[str, float]:
+        """汇总监控指标"""
+        metrics: Dict[str, float] = {}
+        for prefix, counters in (
+            ('dispatch', self.dispatch_counters),
+            ('console', self.console_counters),
+            ('console_flood', self.flood_control.counters),
+            ('console_rules', self.rule_engine.counters),
+            ('reply_dropped', self.governor.dropped),
+            ('send', self.writer.counters if self.writer else {}),
+        ):
+            for name, value in counters.items():
+                metrics[f"{prefix}_{name}"] = value
+        for name, value in self.rule_counters.items():
+            metrics[f"console_rule_hits{{rule=\"{name}\"}}"] = value
+        metrics['send_queue_depth'] = self.send_queue_depth
+        metrics['console_buffer_lines'] = len(self.console_buffer)
+        for name, value in self.stats_store.latest.items():
+            metrics[f'stats_{name}'] = value
+        if self.restart_plan:
+            metrics['restart_planned_at'] = self.restart_plan.at
+            metrics['restart_projected_oom_at'] = self.restart_plan.oom_at
+        for kind, count in self.anomaly_counters.items():
+            metrics[f'anomalies{{kind="{kind}"}}'] = count
+        if self.console_archive:
+            for name, value in self.console_archive.counters.items():
+                metrics[f'console_archive_{name}'] = value
+        if self.ws_capture:
+            for name, value in self.ws_capture.counters.items():
+                metrics[f'ws_capture_{name}'] = value
+        return metrics
+        
     async def monitor_websocket(self):
         """监控WebSocket消息"""
         try:
+            received = 0
+            capture = self.ws_capture
             async for message in self.ws_connection:
+                if capture:
+                    capture.write(message)
                 await self.handle_websocket_message(message)
+                received += 1
+                # 消息积压时websockets不会让出事件循环，定期让出避免饿死同进程的其他连接
+                if received % 64 == 0:
+                    self._maybe_checkpoint()
+                    if capture:
+                        capture.flush()
+                    await asyncio.sleep(0)
         except websockets.exceptions.ConnectionClosed:
             logger.warning("WebSocket连接关闭")
         except Exception as e:
             logger.error(f"WebSocket监控异常: {e}")
             
+    async def _flush_archive(self):
+        """控制台长时间没有新行时，按缓存时长把未满的归档块落盘"""
+        delay = self.console_archive.flush_interval
+        while True:
+            await self.clock.sleep(delay)
+            delay = self.console_archive.flush_if_due(self.clock.time())
+            
     async def run_monitor(self):
         """运行监控"""
         logger.info("启动VPS监控...")
+        if self.console_archive and (self._archive_flush is None or self._archive_flush.done()):
+            self._archive_flush = asyncio.ensure_future(self._flush_archive())
         
         while self.is_running:
             try:
@@ -618,14 +3528,14 @@ class VPSMonitor:
                     logger.info("重新登录...")
                     if not await self.login():
                         logger.error("登录失败，等待重试...")
-                        await asyncio.sleep(self.config.check_interval)
+                        await self.clock.sleep(self.config.check_interval)
                         continue
                         
                 # 连接WebSocket
                 if not self.ws_connection or self.ws_connection.closed:
                     if not await self.connect_websocket():
                         logger.error("WebSocket连接失败，等待重试...")
-                        await asyncio.sleep(self.config.check_interval)
+                        await self.clock.sleep(self.config.check_interval)
                         continue
                         
                 # 开始监控
@@ -635,14 +3545,21 @@ class VPSMonitor:
             except Exception as e:
                 logger.error(f"监控异常: {e}")
                 
+            # 连接断开期间没有新行触发写入，先把缓存的归档块落盘
+            if self.console_archive:
+                self.console_archive.flush()
+            self._maybe_checkpoint()
+                
             # 如果连接断开，等待后重试
             if self.is_running:
                 logger.info(f"等待 {self.config.check_interval} 秒后重试...")
-                await asyncio.sleep(self.config.check_interval)
+                await self.clock.sleep(self.config.check_interval)
                 
     async def start(self):
         """启动监控"""
         self.is_running = True
+        if self.journal:
+            self.journal.record_monitor('start', self.clock.time())
         
         # 初始登录
         if not await self.login():
@@ -662,14 +3579,62 @@ async def main():
     config = VPSConfig()
     
     async with VPSMonitor(config) as monitor:
+        loop_monitor = None
+        loop_task = None
+        if config.loop_lag_interval > 0:
+            loop_monitor = LoopLagMonitor(config.loop_lag_interval, config.loop_lag_warn, config.loop_stall_dump)
+            loop_task = asyncio.create_task(loop_monitor.run())
+        profiler = SamplingProfiler(config.profile_dir, config.profile_interval_ms / 1000)
+        control = None
+        if config.control_port:
+            control = ControlServer({config.server_uuid: monitor}, config.control_host, config.control_port,
+                                    loop_monitor, profiler)
+            await control.start()
+        analyzer_task = None
+        if config.anomaly_interval > 0:
+            analyzer = FleetAnalyzer(
+                AnomalyDetector(config.anomaly_zscore, config.anomaly_leak_rate,
+                                config.anomaly_memory_saturation, config.anomaly_cpu_saturation),
+                config.anomaly_window, config.anomaly_interval, leak_window=config.anomaly_leak_window
+            )
+            analyzer.register(monitor)
+            analyzer_task = asyncio.create_task(analyzer.run())
+        # SIGTERM（docker stop）时取消主任务，退出async with时由close()写入最终检查点
+        main_task = asyncio.current_task()
+        loop = asyncio.get_running_loop()
+        background = set()
+        
+        def on_sigusr1():
+            # 不重启即可诊断：打印任务快照，并在后台采样一段时间
+            logger.warning(f"🩺 收到SIGUSR1，任务快照:\n{dump_asyncio_tasks()}")
+            if not profiler.running and not background:
+                task = asyncio.ensure_future(profiler.profile(config.profile_seconds))
+                background.add(task)
+                task.add_done_callback(background.discard)
+                
+        try:
+            loop.add_signal_handler(signal.SIGTERM, main_task.cancel)
+            loop.add_signal_handler(signal.SIGUSR1, on_sigusr1)
+        except (NotImplementedError, RuntimeError, AttributeError):
+            pass
         try:
             await monitor.start()
+        except asyncio.CancelledError:
+            logger.info("收到SIGTERM，正在停止...")
+            monitor.stop()
         except KeyboardInterrupt:
             logger.info("收到停止信号")
             monitor.stop()
         except Exception as e:
             logger.error(f"程序异常: {e}")
             monitor.stop()
+        finally:
+            if analyzer_task:
+                analyzer_task.cancel()
+            if loop_task:
+                loop_task.cancel()
+            if control:
+                await control.stop()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+WebSocket录制回放工具
+把WS_CAPTURE_FILE录制的原始帧直接送入handle_websocket_message，不经过网络，
+可按实际速度、N倍速或最快速度回放，用于测量处理函数的CPU开销和发现性能回退。
+"""
+
+import argparse
+import asyncio
+import cProfile
+import json
+import logging
+import pstats
+import sys
+import time
+from typing import List, Tuple
+
+from vps_monitor import VPSMonitor, VPSConfig, WebSocketCapture, logger
+
+
+class OfflineMonitor(VPSMonitor):
+    """去掉所有网络副作用的监控器：命令、通知、启动只计数不发送"""
+
+    def __init__(self, config: VPSConfig):
+        super().__init__(config)
+        self.actions = {'commands': 0, 'notifications': 0, 'starts': 0, 'restarts': 0}
+
+    async def send_command(self, command, *args, **kwargs) -> bool:
+        self.actions['commands'] += 1
+        return True
+
+    async def send_dingtalk_message(self, *args, **kwargs):
+        self.actions['notifications'] += 1
+
+    async def start_server(self, *args, **kwargs) -> bool:
+        self.actions['starts'] += 1
+        return True
+
+    async def restart_server(self, *args, **kwargs) -> bool:
+        self.actions['restarts'] += 1
+        return True
+
+    async def get_websocket_token(self, *args, **kwargs):
+        return None
+
+
+def offline_config(**overrides) -> VPSConfig:
+    """回放用配置：关闭所有会写盘或联网的功能"""
+    settings = dict(panel_url="http://replay.invalid", server_uuid="replay", ws_capture_file="",
+                    console_archive_dir="", event_journal_dir="", state_checkpoint_file="",
+                    predictive_restart=False)
+    settings.update(overrides)
+    return VPSConfig(**settings)
+
+
+async def replay(monitor: VPSMonitor, frames: List[Tuple[float, object]], speed: float = 0.0) -> dict:
+    """按录制时间间隔除以speed回放；speed<=0时不等待。返回吞吐和单帧处理耗时"""
+    durations = []
+    if not frames:
+        return {'frames': 0, 'elapsed': 0.0, 'frames_per_sec': 0.0, 'handler_us': {}}
+    first = frames[0][0]
+    started = time.perf_counter()
+    for timestamp, message in frames:
+        if speed > 0:
+            delay = started + (timestamp - first) / speed - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        begin = time.perf_counter()
+        await monitor.handle_websocket_message(message)
+        durations.append(time.perf_counter() - begin)
+    elapsed = time.perf_counter() - started
+    durations.sort()
+
+    def pick(q):
+        return round(durations[min(len(durations) - 1, int(q * len(durations)))] * 1e6, 2)
+    return {
+        'frames': len(frames),
+        'elapsed': round(elapsed, 4),
+        'frames_per_sec': round(len(frames) / elapsed, 1) if elapsed > 0 else 0.0,
+        'handler_total_s': round(sum(durations), 4),
+        'handler_us': {'p50': pick(0.5), 'p99': pick(0.99), 'max': round(durations[-1] * 1e6, 2)},
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="回放WebSocket录制文件")
+    parser.add_argument("capture", help="WS_CAPTURE_FILE录制的文件")
+    parser.add_argument("--speed", type=float, default=0.0, help="回放倍速：1为实际速度，0为最快速度（默认）")
+    parser.add_argument("--repeat", type=int, default=1, help="重复回放次数")
+    parser.add_argument("--profile", metavar="FILE", help="用cProfile采样并把结果写入FILE")
+    parser.add_argument("--output", help="把结果写入JSON文件，便于和基线比较")
+    args = parser.parse_args()
+
+    try:
+        # 预先读入内存，避免磁盘读取计入处理耗时
+        frames = list(WebSocketCapture.read(args.capture))
+    except (OSError, ValueError) as e:
+        print(f"❌ 读取录制文件失败: {e}", file=sys.stderr)
+        sys.exit(1)
+    if not frames:
+        print("❌ 录制文件中没有帧", file=sys.stderr)
+        sys.exit(1)
+
+    logger.setLevel(logging.ERROR)
+    monitor = OfflineMonitor(offline_config())
+    span = frames[-1][0] - frames[0][0]
+    print(f"📼 {len(frames)} 帧，录制时长 {span:.1f} 秒，倍速 {args.speed or '最快'}")
+
+    profiler = cProfile.Profile() if args.profile else None
+    results = []
+    for _ in range(args.repeat):
+        if profiler:
+            profiler.enable()
+        results.append(await replay(monitor, frames, args.speed))
+        if profiler:
+            profiler.disable()
+
+    for i, result in enumerate(results, 1):
+        print(f"第{i}轮: {result['frames_per_sec']:.0f} 帧/秒, 处理耗时 p50 {result['handler_us']['p50']}us "
+              f"p99 {result['handler_us']['p99']}us max {result['handler_us']['max']}us")
+    print(f"分发统计: {monitor.dispatch_counters}，模拟动作: {monitor.actions}")
+
+    if profiler:
+        profiler.dump_stats(args.profile)
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(15)
+        print(f"cProfile结果已写入 {args.profile}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'capture': args.capture, 'speed': args.speed, 'runs': results,
+                       'dispatch': monitor.dispatch_counters, 'actions': monitor.actions}, f, indent=2)
+    await monitor.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())